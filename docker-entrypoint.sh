@@ -1,4 +1,46 @@
 #!/usr/bin/env sh
 set -e
 : "${PORT:=8080}"
-exec uvicorn src.service_app:app --host 0.0.0.0 --port "${PORT}"
+
+# ---------- size workers from container limits ----------
+# CPUs: cgroup v2 cpu.max quota, then v1 cfs quota, else nproc
+cpus=""
+if [ -r /sys/fs/cgroup/cpu.max ]; then
+  read -r quota period < /sys/fs/cgroup/cpu.max
+  [ "$quota" != "max" ] && cpus=$(( (quota + period - 1) / period ))
+elif [ -r /sys/fs/cgroup/cpu/cpu.cfs_quota_us ]; then
+  quota=$(cat /sys/fs/cgroup/cpu/cpu.cfs_quota_us); period=$(cat /sys/fs/cgroup/cpu/cpu.cfs_period_us)
+  [ "$quota" -gt 0 ] && cpus=$(( (quota + period - 1) / period ))
+fi
+[ -n "$cpus" ] || cpus=$(nproc 2>/dev/null || echo 1)
+[ "$cpus" -ge 1 ] || cpus=1
+
+# memory (MiB): cgroup v2 memory.max, then v1 limit, else MemTotal
+mem_mib=""
+if [ -r /sys/fs/cgroup/memory.max ] && [ "$(cat /sys/fs/cgroup/memory.max)" != "max" ]; then
+  mem_mib=$(( $(cat /sys/fs/cgroup/memory.max) / 1048576 ))
+elif [ -r /sys/fs/cgroup/memory/memory.limit_in_bytes ]; then
+  mem_mib=$(( $(cat /sys/fs/cgroup/memory/memory.limit_in_bytes) / 1048576 ))
+fi
+if [ -z "$mem_mib" ] || [ "$mem_mib" -gt 1048576 ]; then
+  mem_mib=$(( $(awk '/MemTotal/ {print $2}' /proc/meminfo) / 1024 ))
+fi
+
+# one uvicorn worker per CPU, but no more than memory allows at QLX_WORKER_MIB each;
+# the CPUs and the KDF memory budget are split between them
+: "${QLX_WORKER_MIB:=512}"
+by_mem=$(( mem_mib / QLX_WORKER_MIB ))
+[ "$by_mem" -ge 1 ] || by_mem=1
+web=$(( cpus < by_mem ? cpus : by_mem ))
+: "${WEB_CONCURRENCY:=$web}"
+per_cpu=$(( cpus / WEB_CONCURRENCY ))
+: "${QLX_POOL_WORKERS:=$(( per_cpu > 0 ? per_cpu : 1 ))}"
+# ...but never below one default Argon2id call, or every /key request would be refused
+: "${ARGON2_MEMORY_KIB:=65536}"
+kdf_floor=$(( (ARGON2_MEMORY_KIB + 1023) / 1024 ))
+kdf_budget=$(( mem_mib / 2 / WEB_CONCURRENCY ))
+: "${QLX_KDF_MEMORY_BUDGET_MIB:=$(( kdf_budget > kdf_floor ? kdf_budget : kdf_floor ))}"
+export QLX_POOL_WORKERS QLX_KDF_MEMORY_BUDGET_MIB
+
+echo "entrypoint: cpus=${cpus} mem=${mem_mib}MiB uvicorn_workers=${WEB_CONCURRENCY} pool_workers=${QLX_POOL_WORKERS} kdf_budget=${QLX_KDF_MEMORY_BUDGET_MIB}MiB"
+exec uvicorn src.service_app:app --host 0.0.0.0 --port "${PORT}" --workers "${WEB_CONCURRENCY}"
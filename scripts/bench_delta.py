@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Size and throughput of delta envelopes against full envelopes for small retunes."""
+import json, argparse, time, copy, pathlib, random
+from qlx_hfp_prototype import assemble_hfp
+from qlx_photonic_control import photonic_map, make_envelope, envelope_codes, canonical_json, PARAM_RANGES, _codes_to_values
+from qlx_keyring import Keyring
+from qlx_delta import make_delta, apply_delta
+
+def nudge(env, n_changes, rng):
+    out = copy.deepcopy(env); out.pop("signing", None)
+    L, bits = env["band_count"], env["dac"]["width_bits"]
+    slots = rng.sample([(b, k) for k in PARAM_RANGES for b in range(L)], n_changes)
+    for band, k in slots:
+        lo, hi = PARAM_RANGES[k]
+        code = int(envelope_codes(env, [k])[band]) + rng.choice([-2, -1, 1, 2])
+        code = min(max(code, 1), (1 << bits) - 2)
+        out["params"][k][band] = float(_codes_to_values(code, lo, hi, bits))
+    return out
+
+def rate(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n): fn()
+    return n / (time.perf_counter() - t0)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seed", default="qlx-demo-seed-phi369")
+    ap.add_argument("--levels", type=int, default=10)
+    ap.add_argument("--changes", default="1,2,4,8")
+    ap.add_argument("--iters", type=int, default=2000)
+    ap.add_argument("--out", default="artifacts/bench_delta.json")
+    args = ap.parse_args()
+
+    rng = random.Random(1234)
+    kr = Keyring(); kr.add_hmac("ctrl-01", b"bench-key")
+    h = assemble_hfp(args.seed, levels=args.levels)
+    base = kr.sign(make_envelope(h, photonic_map(h["band_stats"])))
+    full_size = len(canonical_json(base))
+
+    rows = []
+    for n in [int(x) for x in args.changes.split(",")]:
+        target = nudge(base, n, rng)
+        delta = kr.sign(make_delta(base, target))
+        rows.append({
+            "changes": n,
+            "full_bytes": full_size,
+            "delta_bytes": len(canonical_json(delta)),
+            "ratio": round(len(canonical_json(delta)) / full_size, 3),
+            "full_sign_per_s": round(rate(lambda: kr.sign(target), args.iters)),
+            "delta_make_sign_per_s": round(rate(lambda: kr.sign(make_delta(base, target)), args.iters)),
+            "full_verify_per_s": round(rate(lambda: kr.verify(base), args.iters)),
+            "delta_apply_verify_per_s": round(rate(lambda: apply_delta(base, delta, keyring=kr), args.iters)),
+        })
+
+    report = {"seed": args.seed, "levels": args.levels, "band_count": base["band_count"], "results": rows}
+    out = pathlib.Path(args.out); out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
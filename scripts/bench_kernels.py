@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Kernel microbenchmarks: run, compare against the stored baseline, optionally update it."""
+import sys, json, argparse, pathlib
+from qlx_bench import run, compare, format_rows
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--filter", default=None, help="regex on case names, e.g. 'dwt|sts_'")
+    ap.add_argument("--quick", action="store_true", help="smaller sizes, for CI smoke runs")
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--min-time", type=float, default=0.05, help="seconds per sample")
+    ap.add_argument("--baseline", default="benchmarks/baseline.json")
+    ap.add_argument("--update-baseline", action="store_true", help="merge this run into the baseline")
+    ap.add_argument("--rel-tol", type=float, default=0.25, help="relative change ignored as noise")
+    ap.add_argument("--mad-k", type=float, default=3.0, help="MAD multiples ignored as noise")
+    ap.add_argument("--retries", type=int, default=1, help="re-measure flagged cases this many times")
+    ap.add_argument("--no-fail", action="store_true", help="exit 0 even on regressions")
+    ap.add_argument("--out", default="artifacts/bench_kernels.json")
+    args = ap.parse_args()
+
+    current = run(args.filter, quick=args.quick, repeat=args.repeat, min_time=args.min_time,
+                  log=lambda s: print(s, file=sys.stderr))
+    base_path = pathlib.Path(args.baseline)
+    baseline = json.loads(base_path.read_text()) if base_path.exists() else {"results": {}}
+    if baseline.get("machine") and baseline["machine"] != current["machine"]:
+        print(f"warning: baseline recorded on {baseline['machine']}", file=sys.stderr)
+    rows = compare(baseline, current, rel_tol=args.rel_tol, mad_k=args.mad_k)
+    # re-measure flagged cases; a regression must reproduce to count
+    for _ in range(args.retries):
+        flagged = {r["case"] for r in rows if r["status"] == "regression"}
+        if not flagged:
+            break
+        print(f"re-measuring {len(flagged)} flagged case(s)", file=sys.stderr)
+        again = run(quick=args.quick, repeat=args.repeat, min_time=args.min_time, names=flagged)
+        for name, r in again["results"].items():
+            if r["median_s"] < current["results"][name]["median_s"]:
+                current["results"][name] = r
+        rows = compare(baseline, current, rel_tol=args.rel_tol, mad_k=args.mad_k)
+    print(format_rows(rows))
+
+    report = dict(current, comparison=rows, baseline=str(base_path))
+    out = pathlib.Path(args.out); out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    if args.update_baseline:
+        merged = dict(current, results={**baseline.get("results", {}), **current["results"]})
+        base_path.parent.mkdir(parents=True, exist_ok=True)
+        base_path.write_text(json.dumps(merged, indent=2, sort_keys=True))
+        print(f"baseline updated: {base_path}", file=sys.stderr)
+    regressions = [r["case"] for r in rows if r["status"] == "regression"]
+    if regressions and not args.no_fail and not args.update_baseline:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
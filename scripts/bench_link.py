@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Controller-link throughput and ack latency: pipelined window vs stop-and-wait vs a connection per envelope."""
+import json, argparse, time, copy, uuid, pathlib, asyncio
+from qlx_hfp_prototype import assemble_hfp
+from qlx_photonic_control import photonic_map, make_envelope
+from qlx_keyring import Keyring
+from qlx_link import StandInController, ControllerLink
+
+def fleet_envelopes(kr, h, n):
+    base = make_envelope(h, photonic_map(h["band_stats"]))
+    envs = []
+    for _ in range(n):
+        e = copy.deepcopy(base); e["session_id"] = str(uuid.uuid4())
+        envs.append(e)
+    return kr.sign_batch(envs)
+
+async def run_mode(mode, ctrls, per_device, window):
+    async def device(c, envs):
+        if mode == "per-connection":
+            lat = []
+            for e in envs:
+                t0 = time.perf_counter()
+                link = await ControllerLink("127.0.0.1", c.port, window=1).connect()
+                await (await link.send(e))
+                await link.close()
+                lat.append(time.perf_counter() - t0)
+            return lat
+        link = await ControllerLink("127.0.0.1", c.port, window=1 if mode == "stop-and-wait" else window).connect()
+        await link.push(envs)
+        await link.close()
+        return link.latencies
+    t0 = time.perf_counter()
+    lats = await asyncio.gather(*[device(c, envs) for c, envs in zip(ctrls, per_device)])
+    dt = time.perf_counter() - t0
+    lat = sorted(x for l in lats for x in l)
+    n = len(lat)
+    return {"mode": mode, "devices": len(ctrls), "envelopes": n, "window": 1 if mode != "pipelined" else window,
+            "env_per_s": round(n / dt), "p50_ms": round(lat[n // 2] * 1e3, 3), "p99_ms": round(lat[int(n * 0.99)] * 1e3, 3)}
+
+async def main_async(args):
+    kr = Keyring(); kr.add_hmac("ctrl-01", b"bench-key")
+    h = assemble_hfp(args.seed, levels=args.levels)
+    rows = []
+    for mode in ("pipelined", "stop-and-wait", "per-connection"):
+        ctrls = [StandInController(keyring=kr, require_sig=True) for _ in range(args.devices)]
+        for c in ctrls: await c.serve()
+        n = args.envelopes if mode != "per-connection" else max(1, args.envelopes // 4)
+        per_device = [fleet_envelopes(kr, h, n) for _ in ctrls]
+        rows.append(await run_mode(mode, ctrls, per_device, args.window))
+        assert all(c.applied == n for c in ctrls), [c.stats() for c in ctrls]
+        for c in ctrls: await c.close()
+        print(json.dumps(rows[-1]))
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seed", default="qlx-demo-seed-phi369")
+    ap.add_argument("--levels", type=int, default=5)
+    ap.add_argument("--devices", type=int, default=8)
+    ap.add_argument("--envelopes", type=int, default=500, help="per device")
+    ap.add_argument("--window", type=int, default=64)
+    ap.add_argument("--out", default="artifacts/bench_link.json")
+    args = ap.parse_args()
+    rows = asyncio.run(main_async(args))
+    pathlib.Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    pathlib.Path(args.out).write_text(json.dumps(rows, indent=2))
+    print("wrote:", args.out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Session store at N concurrent sessions: timing wheel vs a linear expiry scan, with churn (expired sessions are replaced)."""
+import json, argparse, time, pathlib, random, resource, uuid, datetime
+from qlx_sessions import SessionStore
+
+T0_MS = 1_700_000_000_000
+
+def iso(ms):
+    return datetime.datetime.fromtimestamp(ms // 1000, datetime.UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def make_env(rng, now_ms, hashes):
+    # only the fields the store reads; the payload itself is carried by reference
+    return {"session_id": str(uuid.UUID(int=rng.getrandbits(128))), "hfp_hash": rng.choice(hashes),
+            "apply": {"at": iso(now_ms + rng.randrange(0, 5000)), "ramp_ms": 10, "hold_ms": rng.choice([500, 2000, 5000]),
+                      "ttl_ms": rng.randrange(10_000, 60_000)}}
+
+class LinearStore:
+    """Baseline: every session checked on every tick."""
+    def __init__(self):
+        self.sessions = {}
+    def put(self, env, now_ms):
+        a = env["apply"]
+        at = int(datetime.datetime.strptime(a["at"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=datetime.UTC).timestamp() * 1000)
+        self.sessions[env["session_id"]] = [at, at + a["ramp_ms"] + a["hold_ms"], at + a["ttl_ms"], 0]
+    def advance(self, now_ms):
+        events, dead = [], []
+        for sid, s in self.sessions.items():
+            while s[3] < 3 and s[s[3]] <= now_ms:
+                events.append((s[s[3]], s[3], sid)); s[3] += 1
+            if s[3] == 3:
+                dead.append(sid)
+        for sid in dead:
+            del self.sessions[sid]
+        return events
+
+def run(kind, n, sim_s, step_ms, seed):
+    rng = random.Random(seed)
+    hashes = [f"{i:0128x}" for i in range(max(1, n // 100))]
+    st = SessionStore(now_ms=T0_MS) if kind == "wheel" else LinearStore()
+    envs = [make_env(rng, T0_MS, hashes) for _ in range(n)]
+    t = time.perf_counter()
+    for e in envs:
+        st.put(e, T0_MS)
+    put_s = time.perf_counter() - t
+    del envs
+    steps, lat, fired, churn_s = int(sim_s * 1000 // step_ms), [], 0, 0.0
+    for i in range(1, steps + 1):
+        now = T0_MS + i * step_ms
+        t = time.perf_counter()
+        events = st.advance(now)
+        lat.append(time.perf_counter() - t)
+        fired += len(events)
+        new = [make_env(rng, now, hashes) for ev in events if ev[1] in ("expire", 2)]  # keep N sessions live
+        t = time.perf_counter()
+        for e in new:
+            st.put(e, now)
+        churn_s += time.perf_counter() - t
+    lat.sort()
+    total = sum(lat)
+    return {"store": kind, "sessions": n, "sim_s": sim_s, "step_ms": step_ms, "puts_per_s": round(n / put_s),
+            "events": fired, "events_per_s": round(fired / total), "advance_p50_us": round(lat[len(lat) // 2] * 1e6, 1),
+            "advance_p99_us": round(lat[int(len(lat) * 0.99)] * 1e6, 1), "advance_max_ms": round(lat[-1] * 1e3, 2),
+            "wall_s": round(total + churn_s, 3),
+            "live": len(st.sessions), "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", default="10000,100000", help="comma-separated concurrent session counts")
+    ap.add_argument("--sim-s", type=float, default=120.0, help="simulated seconds per run")
+    ap.add_argument("--step-ms", type=int, default=10, help="advance() interval")
+    ap.add_argument("--linear-sim-s", type=float, default=5.0, help="simulated seconds for the linear-scan baseline")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default="artifacts/bench_sessions.json")
+    args = ap.parse_args()
+    rows = []
+    for n in map(int, args.sessions.split(",")):
+        rows.append(run("wheel", n, args.sim_s, args.step_ms, args.seed)); print(json.dumps(rows[-1]))
+        if args.linear_sim_s:
+            rows.append(run("linear", n, args.linear_sim_s, args.step_ms, args.seed)); print(json.dumps(rows[-1]))
+    pathlib.Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    pathlib.Path(args.out).write_text(json.dumps(rows, indent=2))
+    print("wrote:", args.out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Cold-start timings of the API: import, first /readyz and first request, each in a fresh interpreter."""
+import os, sys, json, argparse, pathlib, statistics, subprocess
+
+HEAVY = ("numpy", "cryptography", "argon2", "qlx_sts_min", "qlx_hfp_prototype")
+
+# Runs in a fresh interpreter; prints one JSON line of timings in ms.
+CHILD = r"""
+import sys, time, json, asyncio
+t0 = time.perf_counter()
+import service_app
+t_import = time.perf_counter()
+heavy = [m for m in HEAVY if m in sys.modules]
+import httpx
+
+async def main():
+    transport = httpx.ASGITransport(app=service_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+        if WARMUP:
+            await service_app.warmup()
+        r = await c.get("/readyz"); assert r.status_code == 200, r.text
+        t_ready = time.perf_counter()
+        r = await c.post(ROUTE, json=BODY); assert r.status_code == 200, r.text
+        t_first = time.perf_counter()
+        r = await c.post(ROUTE, json=BODY); assert r.status_code == 200, r.text
+        t_second = time.perf_counter()
+    service_app.get_executor().shutdown()
+    return t_ready, t_first, t_second
+
+t_ready, t_first, t_second = asyncio.run(main())
+print(json.dumps({"import_ms": (t_import - t0)*1e3, "ready_ms": (t_ready - t0)*1e3,
+                  "first_response_ms": (t_first - t0)*1e3, "second_request_ms": (t_second - t_first)*1e3,
+                  "heavy_at_import": heavy}))
+"""
+
+def run_once(route, body, warmup, workers):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, ["src", os.environ.get("PYTHONPATH")])),
+               QLX_POOL_WORKERS=str(workers), QLX_METRICS=os.environ.get("QLX_METRICS", "1"))
+    prelude = f"HEAVY={HEAVY!r}\nWARMUP={warmup!r}\nROUTE={route!r}\nBODY={body!r}\n"
+    out = subprocess.run([sys.executable, "-c", prelude + CHILD], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--route", default="/envelope", choices=["/hfp", "/key", "/envelope", "/sts"])
+    ap.add_argument("--workers", type=int, default=1, help="QLX_POOL_WORKERS for the child (0 = threads)")
+    ap.add_argument("--warmup", action="store_true", help="run the startup warm-up before the first request")
+    ap.add_argument("--max-import-ms", type=float, default=None, help="fail if median import time exceeds this")
+    ap.add_argument("--max-first-ms", type=float, default=None, help="fail if median import-to-first-response exceeds this")
+    ap.add_argument("--out", default="artifacts/bench_startup.json")
+    args = ap.parse_args()
+
+    body = {"seed": "bench-startup"}
+    if args.route == "/key": body["kdf"] = "hkdf"
+    if args.route == "/sts": body["n_bits"] = 20_000
+    runs = [run_once(args.route, body, args.warmup, args.workers) for _ in range(args.runs)]
+    med = {k: round(statistics.median(r[k] for r in runs), 1)
+           for k in ("import_ms", "ready_ms", "first_response_ms", "second_request_ms")}
+    report = {"route": args.route, "workers": args.workers, "warmup": args.warmup, "runs": args.runs,
+              "median": med, "heavy_at_import": sorted({m for r in runs for m in r["heavy_at_import"]})}
+
+    failures = []
+    if report["heavy_at_import"]:
+        failures.append(f"heavy modules loaded at import: {report['heavy_at_import']}")
+    if args.max_import_ms is not None and med["import_ms"] > args.max_import_ms:
+        failures.append(f"import {med['import_ms']}ms > {args.max_import_ms}ms")
+    if args.max_first_ms is not None and med["first_response_ms"] > args.max_first_ms:
+        failures.append(f"first response {med['first_response_ms']}ms > {args.max_first_ms}ms")
+    report["failures"] = failures
+
+    out = pathlib.Path(args.out); out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from qlx_photonic_control import (
     sign_envelope_hmac, sign_envelope_ed25519,
     canonical_json,
 )
+from qlx_store import ArtifactStore, HFP_CORE_KEYS
 
 def canonical(obj) -> bytes:
     return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
@@ -19,32 +20,44 @@ def main():
     ap.add_argument("--sample-gsa", type=int, default=64)
     ap.add_argument("--quant", choices=["nearest","floor","stochastic"], default="nearest")
     ap.add_argument("--out", type=str, default="artifacts")
+    ap.add_argument("--store", type=str, default="", help="write to this artifact store instead of fixed files in --out")
+    ap.add_argument("--codec", choices=["gzip","lzma","none"], default="gzip")
 
     # signing options
     ap.add_argument("--sig-alg", choices=["hmac","ed25519"], default="hmac")
     ap.add_argument("--key", type=str, default="test-key")  # HMAC
     ap.add_argument("--ed25519-priv-hex", type=str, default=os.environ.get("ED25519_PRIV_HEX",""))
     ap.add_argument("--ed25519-key-id", type=str, default="ctrl-ed25519")
+    ap.add_argument("--keyring", type=str, default=os.environ.get("QLX_KEYRING",""), help="keyring JSON (overrides --sig-alg)")
+    ap.add_argument("--key-id", type=str, default="", help="keyring key_id (default: primary active key)")
     args = ap.parse_args()
 
-    out = Path(args.out); out.mkdir(exist_ok=True)
-
     # build HFP and envelope
     hfp = assemble_hfp(args.seed, levels=args.levels)
     params = photonic_map(hfp["band_stats"])
     env = make_envelope(hfp, params, dac_bits=args.dac_bits, sample_rate_GSa=args.sample_gsa, quant_mode=args.quant)
 
     # sign
-    if args.sig_alg == "hmac":
+    if args.keyring:
+        from qlx_keyring import Keyring
+        signed = Keyring.from_file(args.keyring).sign(env, key_id=args.key_id or None)
+    elif args.sig_alg == "hmac":
         signed = sign_envelope_hmac(env, key=args.key.encode(), key_id="ctrl-01")
     else:
         if not args.ed25519_priv_hex:
             raise SystemExit("ed25519 requires --ed25519-priv-hex or ED25519_PRIV_HEX")
         signed = sign_envelope_ed25519(env, priv_hex=args.ed25519_priv_hex, key_id=args.ed25519_key_id)
 
+    if args.store:
+        # content-addressed: reruns of the same seed add only the new envelope
+        with ArtifactStore(args.store, codec=args.codec) as st, st.batch():
+            print("hfp:", st.put_hfp(hfp))
+            print("envelope:", st.put_envelope(signed))
+        return
+
     # write artifacts (canonical)
-    core_keys = ["version","wavelet_basis","levels","seed_harmonics","phi","chaos","mixer","band_stats"]
-    (out/"hfp_core.json").write_bytes(canonical({k: hfp[k] for k in core_keys}))
+    out = Path(args.out); out.mkdir(exist_ok=True)
+    (out/"hfp_core.json").write_bytes(canonical({k: hfp[k] for k in HFP_CORE_KEYS}))
     (out/"hfp_full.json").write_bytes(canonical(hfp))
     (out/"photonic_env_signed.json").write_bytes(canonical(signed))
 
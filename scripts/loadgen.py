@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Closed-loop load generator for the API. Drives the ASGI app in-process (default),
+a local uvicorn it starts (--uvicorn), or any running instance (--url), with a
+weighted route mix at one or more concurrency levels. Writes per-route latency
+percentiles, throughput and error rates as JSON.
+"""
+import os, sys, json, math, time, socket, random, asyncio, argparse, pathlib, subprocess
+import httpx
+
+ROUTES = ("hfp", "key", "envelope", "sts")
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, _, w = part.partition("=")
+        name = name.strip().lstrip("/")
+        if name not in ROUTES:
+            raise SystemExit(f"unknown route in --mix: {name!r}")
+        mix[name] = float(w or 1)
+    return mix
+
+def body_for(route, i, args):
+    seed = f"load-{i}"
+    if route == "key": return {"seed": seed, "kdf": args.kdf}
+    if route == "sts": return {"seed": seed, "n_bits": args.sts_bits, "whiten": "sha512"}
+    return {"seed": seed, "levels": args.levels}
+
+def pct(xs, q):
+    # nearest-rank percentile on a sorted list
+    if not xs: return None
+    return xs[max(0, math.ceil(q / 100 * len(xs)) - 1)]
+
+def summarize(samples, elapsed):
+    out = {}
+    for route in sorted({s[0] for s in samples}) + ["all"]:
+        rows = samples if route == "all" else [s for s in samples if s[0] == route]
+        lat = sorted(s[2] for s in rows if s[1] == 200)
+        errors = {}
+        for _, status, _ in rows:
+            if status != 200: errors[str(status)] = errors.get(str(status), 0) + 1
+        out[route] = {
+            "requests": len(rows), "ok": len(lat), "errors": errors,
+            "error_rate": round(1 - len(lat) / len(rows), 4) if rows else 0.0,
+            "throughput_rps": round(len(lat) / elapsed, 2) if elapsed > 0 else None,
+            "p50_ms": _ms(pct(lat, 50)), "p95_ms": _ms(pct(lat, 95)), "p99_ms": _ms(pct(lat, 99)),
+            "max_ms": _ms(lat[-1] if lat else None),
+        }
+    return out
+
+def _ms(s):
+    return None if s is None else round(s * 1e3, 2)
+
+async def run_level(client, mix, concurrency, args, rng):
+    names, weights = list(mix), list(mix.values())
+    samples, counter = [], iter(range(10**12))
+    deadline = time.perf_counter() + args.duration if args.requests is None else None
+    budget = [args.requests]
+
+    def more():
+        if deadline is not None:
+            return time.perf_counter() < deadline
+        if budget[0] <= 0: return False
+        budget[0] -= 1
+        return True
+
+    async def worker():
+        while more():
+            route = rng.choices(names, weights)[0]
+            i = next(counter)
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(f"/{route}", json=body_for(route, i, args))
+                status = r.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            samples.append((route, status, time.perf_counter() - t0))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - t0
+    return {"concurrency": concurrency, "elapsed_s": round(elapsed, 3), "routes": summarize(samples, elapsed)}
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_uvicorn(workers):
+    port = _free_port()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, ["src", os.environ.get("PYTHONPATH")])))
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "service_app:app", "--port", str(port),
+                             "--workers", str(workers), "--log-level", "warning"], env=env)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            if httpx.get(url + "/readyz", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise SystemExit("uvicorn did not become ready")
+
+async def main_async(args):
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    proc = None
+    if args.uvicorn:
+        proc, url = start_uvicorn(args.uvicorn)
+        client = httpx.AsyncClient(base_url=url, timeout=args.timeout)
+        target = url
+    elif args.url:
+        client = httpx.AsyncClient(base_url=args.url.rstrip("/"), timeout=args.timeout,
+                                   headers={"Authorization": f"Bearer {args.token}"} if args.token else None)
+        target = args.url
+    else:
+        import service_app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=service_app.app),
+                                   base_url="http://inproc", timeout=args.timeout)
+        target = "in-process"
+    try:
+        if args.warmup:
+            await run_level(client, mix, 1, argparse.Namespace(**{**vars(args), "requests": args.warmup}), rng)
+        levels = [await run_level(client, mix, int(c), args, rng) for c in args.concurrency.split(",")]
+    finally:
+        await client.aclose()
+        if proc is not None:
+            proc.terminate(); proc.wait()
+        elif target == "in-process":
+            import service_app
+            service_app.get_executor().shutdown()
+    return {"target": target, "mix": mix, "duration_s": args.duration, "requests_per_level": args.requests,
+            "pool_workers": os.environ.get("QLX_POOL_WORKERS"), "levels": levels}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mix", default="hfp=5,envelope=3,key=1,sts=1", help="route=weight,...")
+    ap.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    ap.add_argument("--requests", type=int, default=None, help="fixed request count per level instead of --duration")
+    ap.add_argument("--warmup", type=int, default=10, help="untimed requests before the first level")
+    ap.add_argument("--url", default=None, help="target a running instance instead of in-process")
+    ap.add_argument("--token", default=os.environ.get("IDTOK"), help="bearer token for --url")
+    ap.add_argument("--uvicorn", type=int, default=0, metavar="WORKERS", help="start a local uvicorn with N workers")
+    ap.add_argument("--kdf", default="argon2id", choices=["argon2id", "scrypt", "hkdf"])
+    ap.add_argument("--levels", type=int, default=5)
+    ap.add_argument("--sts-bits", type=int, default=20_000)
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--out", default="artifacts/loadgen.json")
+    args = ap.parse_args()
+
+    report = asyncio.run(main_async(args))
+    out = pathlib.Path(args.out); out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    for lvl in report["levels"]:
+        a = lvl["routes"]["all"]
+        print(f"c={lvl['concurrency']:>3}  {a['throughput_rps']:>8} rps  p50 {a['p50_ms']} ms  "
+              f"p95 {a['p95_ms']} ms  p99 {a['p99_ms']} ms  errors {a['error_rate']:.2%}")
+    print(f"wrote {out}")
+
+if __name__ == "__main__":
+    main()
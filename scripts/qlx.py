@@ -15,13 +15,12 @@ except Exception:
 from qlx_photonic_control import (
     photonic_map,
     make_envelope,
-    sign_envelope_hmac,
     canonical_json,
 )
 
 # optional STS
 try:
-    from qlx_sts_min import default_stream, stream_to_bits, run_suite
+    from qlx_sts_min import make_stream, stream_to_bits, run_suite, run_suite_file, add_bits_file_args
     HAVE_STS = True
 except Exception:
     HAVE_STS = False
@@ -52,22 +51,44 @@ def cmd_key(args):
         print("unknown kdf", file=sys.stderr); sys.exit(2)
     print(key.hex())
 
+def _signing_keyring(args):
+    """(Keyring, key_id) for export and sign-batch; an unknown --key-id exits instead of signing with another key."""
+    from qlx_keyring import Keyring
+    if args.keyring:
+        kr = Keyring.from_file(args.keyring)
+        if args.key_id is not None and args.key_id not in kr:
+            raise SystemExit(f"unknown --key-id {args.key_id!r} in {args.keyring}")
+        return kr, args.key_id
+    kr = Keyring()
+    if args.sig_alg == "hmac":
+        key_id = args.key_id or "ctrl-01"
+        kr.add_hmac(key_id, args.key.encode())
+        return kr, key_id
+    priv_hex = args.ed25519_priv_hex or os.environ.get("ED25519_PRIV_HEX", "")
+    if not priv_hex:
+        raise SystemExit("ed25519 requires --ed25519-priv-hex or ED25519_PRIV_HEX")
+    kr.add_ed25519(args.ed25519_key_id, priv_hex=priv_hex)
+    return kr, args.ed25519_key_id
+
 def cmd_export(args):
+    kr, key_id = _signing_keyring(args)
     hfp = assemble_hfp(args.seed, levels=args.levels)
     params = photonic_map(hfp["band_stats"])
     env = make_envelope(hfp, params, dac_bits=args.dac_bits, sample_rate_GSa=args.sample_gsa, quant_mode=args.quant)
-    if args.sig_alg == "hmac":
-        signed = sign_envelope_hmac(env, key=args.key.encode(), key_id=args.key_id)
-    else:
-        if not args.ed25519-priv-hex:
-            raise SystemExit("ed25519 requires --ed25519-priv-hex or ED25519_PRIV_HEX")
-        from qlx_photonic_control import sign_envelope_ed25519
-        signed = sign_envelope_ed25519(env, priv_hex=(args.ed25519-priv-hex or os.environ.get("ED25519_PRIV_HEX","")), key_id=args.key_id)
+    signed = kr.sign(env, key_id=key_id)
+
+    if args.store:
+        from qlx_store import ArtifactStore
+        with ArtifactStore(args.store, codec=args.codec) as st, st.batch():
+            fp, digest = st.put_hfp(hfp), st.put_envelope(signed)
+        print("hfp:", fp)
+        print("envelope:", digest)
+        return
 
     out = args.out
     os.makedirs(out, exist_ok=True)
-    core_keys = ["version","wavelet_basis","levels","seed_harmonics","phi","chaos","mixer","band_stats"]
-    core = {k: hfp[k] for k in core_keys}
+    from qlx_store import HFP_CORE_KEYS
+    core = {k: hfp[k] for k in HFP_CORE_KEYS}
     open(os.path.join(out, "hfp_core.json"), "wb").write(canonical_json(core))
     open(os.path.join(out, "hfp_full.json"), "wb").write(canonical_json(hfp))
     open(os.path.join(out, "photonic_env_signed.json"), "wb").write(canonical_json(signed))
@@ -79,19 +100,273 @@ def cmd_sts(args):
     if not HAVE_STS:
         print("STS not available - ensure qlx_sts_min.py is in PYTHONPATH", file=sys.stderr)
         sys.exit(2)
-    if args.whiten == "sha512":
-        chunk_in, chunk_out = 4096, 512
-        need_chunks = (args.n_bits + chunk_out - 1)//chunk_out
-        n = need_chunks*chunk_in
+    if args.bits_file:
+        report = run_suite_file(args.bits_file, args.format, args.offset, args.n_bits, args.bitorder, alpha=args.alpha,
+                                block_M=args.block, dft_max_bits=args.dft_max_bits, chunk_bits=args.chunk_bits)
+        meta = {"source": os.path.basename(args.bits_file)}
     else:
-        n = args.n_bits
-    stream = default_stream(args.seed, n=n)
-    bits = stream_to_bits(stream, whiten=args.whiten)[:args.n_bits]
-    report = run_suite(bits, alpha=args.alpha, block_M=args.block)
+        n_bits = 200000 if args.n_bits is None else args.n_bits
+        if args.whiten == "sha512":
+            chunk_in, chunk_out = 4096, 512
+            need_chunks = (n_bits + chunk_out - 1)//chunk_out
+            n = need_chunks*chunk_in
+        else:
+            n = n_bits
+        stream = make_stream(args.seed, n, args.generator)
+        bits = stream_to_bits(stream, whiten=args.whiten)[:n_bits]
+        report = run_suite(bits, alpha=args.alpha, block_M=args.block)
+        report["generator"] = args.generator
+        meta = {"seed": args.seed, "whiten": args.whiten, "source": "qlx sts"}
+    if args.history:
+        from qlx_sts_history import History
+        with History(args.history) as h:
+            h.ingest(report, **meta)
     print(json.dumps(report, indent=2))
     sys.exit(0 if report["summary"]["all_pass"] else 2)
 
-def main():
+def cmd_sts_history(args):
+    from qlx_sts_history import History, render_text, render_html
+    import time
+    meta = {"seed": args.seed or None, "whiten": args.whiten or None, "workflow": args.workflow or None}
+    with History(args.db) as h:
+        for path in args.ingest:
+            try:
+                run_id = h.ingest_file(path, git_sha=args.git_sha or None, run_id=args.run_id or None, **meta)
+            except ValueError as e:  # also json.JSONDecodeError
+                print(f"skipped: {path}: {e}", file=sys.stderr)
+                continue
+            print(f"{'ingested' if run_id else 'already in history'}: {path}", file=sys.stderr)
+        since = time.time() - args.days * 86400 if args.days else None
+        if args.test:
+            for ts, p in h.trend(args.test, since=since, **meta):
+                print(f"{time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(ts))} {p:.6f}")
+            return
+        s = h.summary(since=since, window_s=args.window_days * 86400, recent=args.recent, alpha=args.alpha, **meta)
+    if args.html:
+        os.makedirs(os.path.dirname(args.html) or ".", exist_ok=True)
+        with open(args.html, "w") as f:
+            f.write(render_html(s))
+        print("wrote:", args.html, file=sys.stderr)
+    print(json.dumps(s, indent=2) if args.json else render_text(s))
+    if args.fail_on_drift and any(d["drift"] for d in s["drift"].values()):
+        sys.exit(2)
+
+def cmd_verify_batch(args):
+    from qlx_verify_batch import verify_batch, load_keys, default_keys
+    keys = load_keys(args.keys) if args.keys else {}
+    (keys["keys"] if isinstance(keys.get("keys"), dict) else keys).update(
+        default_keys(args.ed25519_pub_hex, args.hmac_key_hex))
+    if args.out == "-":
+        summary = verify_batch(args.paths, keys=keys, workers=args.workers, chunk=args.chunk,
+                               out=sys.stdout, require_sig=args.require_sig)
+        print(json.dumps(summary), file=sys.stderr)
+    else:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            summary = verify_batch(args.paths, keys=keys, workers=args.workers, chunk=args.chunk,
+                                   out=f, require_sig=args.require_sig)
+        print(json.dumps(summary, indent=2))
+    sys.exit(0 if summary["failed"] == 0 else 2)
+
+def cmd_sign_batch(args):
+    from qlx_verify_batch import iter_envelopes
+    envs = [json.loads(text) for _, text in iter_envelopes(args.paths)]
+    if not envs:
+        raise SystemExit("no envelopes found")
+    kr, key_id = _signing_keyring(args)
+    sign = lambda batch: kr.sign_batch(batch, key_id=key_id)
+    size = args.batch_size or len(envs)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    roots = []
+    with open(args.out, "wb") as f:
+        for i in range(0, len(envs), size):
+            signed = sign(envs[i:i+size])
+            roots.append(signed[0]["signing"]["merkle"]["root"])
+            f.write(b"".join(canonical_json(e) + b"\n" for e in signed))
+    print(json.dumps({"envelopes": len(envs), "signatures": len(roots), "roots": roots, "out": args.out}, indent=2))
+
+def cmd_controller(args):
+    import asyncio
+    from qlx_link import StandInController
+    kr = None
+    if args.keyring:
+        from qlx_keyring import Keyring
+        kr = Keyring.from_file(args.keyring)
+    async def main():
+        ctrl = StandInController(keyring=kr, require_sig=args.require_sig)
+        await ctrl.serve(args.host, args.port)
+        print(f"stand-in controller on {args.host}:{ctrl.port}", file=sys.stderr)
+        try:
+            while True:
+                await asyncio.sleep(args.stats_every)
+                print(json.dumps(ctrl.stats()), file=sys.stderr)
+        finally:
+            await ctrl.close()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+def cmd_push(args):
+    import asyncio
+    from qlx_link import push_fleet
+    from qlx_verify_batch import iter_envelopes
+    envs = [json.loads(text) for _, text in iter_envelopes(args.paths)]
+    targets = {}
+    for t in args.to:
+        host, _, port = t.rpartition(":")
+        targets[(host or "127.0.0.1", int(port))] = envs
+    res = asyncio.run(push_fleet(targets, window=args.window))
+    failed = 0
+    for (host, port), (acks, stats) in res.items():
+        bad = [a for a in acks if not a["ok"]]
+        failed += len(bad)
+        print(json.dumps({"controller": f"{host}:{port}", **stats, "rejected": len(bad),
+                          "errors": [a.get("error") for a in bad[:5]]}))
+    sys.exit(0 if failed == 0 else 2)
+
+def _index_sources(args):
+    # HFP records to index: generated from --seeds, read from --hfp-jsonl, or taken from an artifact store
+    if args.seeds:
+        with open(args.seeds) as f:
+            for line in f:
+                if line.strip():
+                    yield assemble_hfp(line.strip(), levels=args.levels)
+    for path in args.hfp_jsonl:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    rec = rec.get("result", rec) if isinstance(rec.get("result"), dict) else rec
+                    if "band_stats" in rec:
+                        yield rec
+    if args.store:
+        from qlx_store import ArtifactStore
+        with ArtifactStore(args.store) as st:
+            for kind, key in list(st.by_key):
+                if kind == "hfp":
+                    yield st.get_hfp(key)
+
+def cmd_hfp_index(args):
+    import time
+    from qlx_hfp_index import HFPIndex, features
+    idx = HFPIndex.load(args.index) if os.path.exists(args.index) else HFPIndex(args.levels)
+    t0, seen, added, batch = time.perf_counter(), 0, 0, ([], [])
+    def flush():
+        nonlocal added
+        added += idx.add(*batch); batch[0].clear(); batch[1].clear()
+    for h in _index_sources(args):
+        if int(h["levels"]) != idx.levels:
+            continue
+        seen += 1
+        batch[0].append(h["fingerprint_hash"]); batch[1].append(features(h["band_stats"]))
+        if len(batch[0]) >= 65536:
+            flush()
+    if batch[0]:
+        flush()
+    if added:
+        os.makedirs(os.path.dirname(args.index) or ".", exist_ok=True)
+        idx.save(args.index)
+    out = {"index": args.index, "seen": seen, "added": added, **idx.stats(), "build_s": round(time.perf_counter() - t0, 3)}
+    if args.audit:
+        t0 = time.perf_counter()
+        I, J, D = idx.audit(args.radius)
+        out["audit"] = {"radius": args.radius, "pairs": len(D), "seconds": round(time.perf_counter() - t0, 3),
+                        "closest": [{"a": idx.fingerprint(i), "b": idx.fingerprint(j), "distance": round(float(d), 6)}
+                                    for i, j, d in zip(I[:args.top], J[:args.top], D[:args.top])]}
+    print(json.dumps(out, indent=2))
+    if args.audit and args.fail_on_collision and len(out["audit"]["closest"]):
+        sys.exit(2)
+
+def cmd_hfp_nearest(args):
+    from qlx_hfp_index import HFPIndex, features
+    idx = HFPIndex.load(args.index)
+    exclude_self = False
+    if args.fingerprint:
+        i = idx.row(args.fingerprint)
+        if i is None:
+            print(f"not in index: {args.fingerprint}", file=sys.stderr); sys.exit(2)
+        F, query, exclude_self = idx.raw(i), args.fingerprint, True
+    else:
+        h = assemble_hfp(args.seed, levels=idx.levels)
+        F, query = features(h["band_stats"]), h["fingerprint_hash"]
+    if args.radius is not None:
+        D, R = idx.radius(F, args.radius)[0]
+    else:
+        D, R = (a[0] for a in idx.knn(F, k=args.k + exclude_self))
+    hits = [{"fingerprint_hash": idx.fingerprint(r), "distance": round(float(d), 6)}
+            for d, r in zip(D, R) if not (exclude_self and idx.fingerprint(r) == query)]
+    print(json.dumps({"query": query, "levels": idx.levels, "neighbours": hits[:args.k] if args.radius is None else hits}, indent=2))
+
+def cmd_batch(args):
+    from qlx_batch import run_batch
+    keys = None
+    if args.keyring:
+        with open(args.keyring) as f:
+            keys = json.load(f)
+    store = None
+    if args.store:
+        from qlx_store import ArtifactStore
+        store = ArtifactStore(args.store, codec=args.codec)
+    try:
+        if args.out == "-":
+            summary = run_batch(args.input, sys.stdout, workers=args.workers, chunk=args.chunk, keys=keys,
+                                resume=False, store=store)
+        else:
+            os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+            resume = not args.no_resume
+            with open(args.out, "a" if resume else "w") as f:
+                summary = run_batch(args.input, f, workers=args.workers, chunk=args.chunk, keys=keys,
+                                    resume=resume, out_path=args.out, store=store)
+        if store is not None:
+            summary["store"] = store.stats()
+    finally:
+        if store is not None:
+            store.close()
+    print(json.dumps(summary), file=sys.stderr)
+    sys.exit(0 if summary["failed"] == 0 else 2)
+
+def cmd_store(args):
+    from qlx_store import ArtifactStore
+    with ArtifactStore(args.root) as st:
+        if not args.get:
+            print(json.dumps(st.stats(), indent=2)); return
+        try:
+            print(json.dumps(st.get(args.get), indent=2))
+        except KeyError:
+            print(f"not found: {args.get}", file=sys.stderr); sys.exit(2)
+
+def cmd_render(args):
+    from qlx_dac_render import render, estimate
+    envs = [json.loads(open(p).read()) for p in args.envelopes]
+    params = args.params.split(",") if args.params else None
+    if args.dry_run:
+        print(json.dumps(estimate(envs, mode=args.mode, rate_GSa=args.rate_gsa, params=params, dtype=args.dtype), indent=2))
+        return
+    meta = render(envs, args.out, mode=args.mode, rate_GSa=args.rate_gsa, params=params,
+                  dtype=args.dtype, dither_lsb=args.dither_lsb, chunk_samples=args.chunk)
+    meta.pop("channels")
+    print(json.dumps(meta, indent=2))
+
+def cmd_profile(args):
+    from qlx_profile import Profiler
+    cmd = args.command[1:] if args.command[:1] == ["--"] else args.command
+    inner = build_parser().parse_args(cmd)
+    if inner.cmd == "profile":
+        print("profile: cannot profile itself", file=sys.stderr)
+        sys.exit(2)
+    code = 0
+    with Profiler(args.out, interval=args.interval, trace_alloc=not args.no_tracemalloc,
+                  alloc_frames=args.alloc_frames, top=args.top) as prof:
+        try:
+            inner.func(inner)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    summary = prof.summary()
+    print(json.dumps({"out": args.out, "exit_code": code, **summary}, indent=2), file=sys.stderr)
+    sys.exit(code)
+
+def build_parser():
     p = argparse.ArgumentParser(prog="qlx")
     sub = p.add_subparsers(dest="cmd", required=True)
 
@@ -122,19 +397,144 @@ def main():
     pe.add_argument("--sample-gsa", type=int, default=64)
     pe.add_argument("--quant", choices=["nearest","floor","stochastic"], default="nearest")
     pe.add_argument("--key", default="test-key")
-    pe.add_argument("--key-id", default="ctrl-01")
+    pe.add_argument("--key-id", default=None, help="HMAC key_id (default ctrl-01), or the --keyring key to sign with")
+    pe.add_argument("--keyring", default="", help="keyring JSON; signs with --key-id (must exist) or its primary active key")
     pe.add_argument("--out", default="artifacts")
+    pe.add_argument("--store", default="", help="write to this artifact store instead of fixed files in --out")
+    pe.add_argument("--codec", choices=["gzip","lzma","none"], default="gzip", help="compression for new store objects")
     pe.set_defaults(func=cmd_export)
 
     ps = sub.add_parser("sts", help="run the mini STS battery")
     ps.add_argument("--seed", default="qlx-demo-seed-phi369")
-    ps.add_argument("--n-bits", type=int, default=200000)
+    ps.add_argument("--n-bits", type=int, default=None, help="default: 200000 generated, or the whole --bits-file")
     ps.add_argument("--alpha", type=float, default=0.01)
     ps.add_argument("--block", type=int, default=256)
-    ps.add_argument("--whiten", choices=["none","vn","sha512"], default="sha512")
+    ps.add_argument("--whiten", choices=["none","vn","sha512"], default="sha512", help="generator only")
+    ps.add_argument("--generator", choices=["logistic-v1","psub-v1"], default="logistic-v1",
+                    help="versioned bit-stream generator; psub-v1 is vectorized and much faster for long runs")
+    ps.add_argument("--history", default="", help="also record the report in this STS history database")
+    if HAVE_STS:
+        add_bits_file_args(ps)
     ps.set_defaults(func=cmd_sts)
 
-    args = p.parse_args()
+    py = sub.add_parser("sts-history", help="ingest STS reports and summarize p-value trends, failure rates and drift")
+    py.add_argument("--db", default=os.environ.get("QLX_STS_HISTORY", "artifacts/sts_history.sqlite"))
+    py.add_argument("--ingest", nargs="*", default=[], help="run_suite report JSON files to add (a file already ingested for the same run is skipped)")
+    py.add_argument("--seed", default="", help="tag ingested reports with this seed, and filter the summary by it")
+    py.add_argument("--whiten", default="", help="tag ingested reports with this whitener, and filter the summary by it")
+    py.add_argument("--workflow", default="", help="tag ingested reports with this workflow, and filter the summary by it")
+    py.add_argument("--git-sha", default=os.environ.get("GITHUB_SHA", ""), help="commit to record with ingested reports")
+    py.add_argument("--run-id", default=os.environ.get("GITHUB_RUN_ID", ""),
+                    help="CI run the reports belong to; with it, runs are keyed by run id + file name instead of file name + mtime")
+    py.add_argument("--days", type=float, default=90, help="summarize runs from the last N days (0 = all)")
+    py.add_argument("--window-days", type=float, default=7, help="failure-rate window")
+    py.add_argument("--recent", type=int, default=100, help="runs per test in the drift checks")
+    py.add_argument("--alpha", type=float, default=0.01)
+    py.add_argument("--test", default="", help="print the p-value trend of one test instead of the summary")
+    py.add_argument("--html", default="", help="also write an HTML summary here")
+    py.add_argument("--json", action="store_true")
+    py.add_argument("--fail-on-drift", action="store_true", help="exit 2 if any test fails the proportion or uniformity check")
+    py.set_defaults(func=cmd_sts_history)
+
+    pv = sub.add_parser("verify-batch", help="verify envelopes from JSONL files or directories in parallel")
+    pv.add_argument("paths", nargs="+", help=".jsonl/.json files or directories")
+    pv.add_argument("--keys", default="", help="keyring JSON mapping key_id to {alg, pub_hex|key_hex}")
+    pv.add_argument("--ed25519-pub-hex", default=os.environ.get("ED25519_PUB_HEX", ""), help="fallback Ed25519 key for any key_id")
+    pv.add_argument("--hmac-key-hex", default="", help="fallback HMAC key for any key_id")
+    pv.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    pv.add_argument("--chunk", type=int, default=256, help="envelopes per worker task")
+    pv.add_argument("--require-sig", action="store_true", help="fail envelopes whose signature was not checked")
+    pv.add_argument("--out", default="artifacts/verify_batch.jsonl", help="JSONL report path, or - for stdout")
+    pv.set_defaults(func=cmd_verify_batch)
+
+    pm = sub.add_parser("sign-batch", help="sign many envelopes with one signature over their merkle root")
+    pm.add_argument("paths", nargs="+", help=".jsonl/.json files or directories of envelopes; existing signing is replaced")
+    pm.add_argument("--sig-alg", choices=["hmac","ed25519"], default="hmac")
+    pm.add_argument("--ed25519-priv-hex", default="")
+    pm.add_argument("--ed25519-key-id", default="ctrl-ed25519")
+    pm.add_argument("--key", default="test-key")
+    pm.add_argument("--key-id", default=None, help="HMAC key_id (default ctrl-01), or the --keyring key to sign with")
+    pm.add_argument("--keyring", default="", help="keyring JSON; signs with --key-id (must exist) or its primary active key")
+    pm.add_argument("--batch-size", type=int, default=0, help="envelopes per root (0 = one root for all)")
+    pm.add_argument("--out", default="artifacts/envelopes_signed.jsonl")
+    pm.set_defaults(func=cmd_sign_batch)
+
+    pc = sub.add_parser("controller", help="run a stand-in controller that verifies and applies pushed envelopes")
+    pc.add_argument("--host", default="127.0.0.1")
+    pc.add_argument("--port", type=int, default=7070)
+    pc.add_argument("--keyring", default="", help="keyring JSON to verify signatures with")
+    pc.add_argument("--require-sig", action="store_true", help="reject envelopes whose signature cannot be checked")
+    pc.add_argument("--stats-every", type=float, default=10.0, help="seconds between stats lines on stderr")
+    pc.set_defaults(func=cmd_controller)
+
+    pp = sub.add_parser("push", help="push envelopes to controllers over persistent pipelined links")
+    pp.add_argument("paths", nargs="+", help=".jsonl/.json files or directories of signed envelopes, sent in order")
+    pp.add_argument("--to", nargs="+", required=True, help="controllers as HOST:PORT; each gets every envelope")
+    pp.add_argument("--window", type=int, default=64, help="unacknowledged envelopes in flight per controller")
+    pp.set_defaults(func=cmd_push)
+
+    pr = sub.add_parser("render", help="render envelopes to memory-mapped DAC sample buffers")
+    pr.add_argument("envelopes", nargs="+", help="signed envelope JSON files, in order")
+    pr.add_argument("--mode", choices=["static","dither","sweep","schedule"], default=None, help="defaults to the first envelope's mode")
+    pr.add_argument("--rate-gsa", type=float, default=None, help="override dac.sample_rate_GSa")
+    pr.add_argument("--params", default="", help="comma-separated subset of params to render")
+    pr.add_argument("--dtype", choices=["uint16","int16"], default="uint16")
+    pr.add_argument("--dither-lsb", type=int, default=1)
+    pr.add_argument("--chunk", type=int, default=1 << 16, help="samples synthesized per chunk")
+    pr.add_argument("--dry-run", action="store_true", help="print sample count and size only")
+    pr.add_argument("--out", default="artifacts/render.npy")
+    pr.set_defaults(func=cmd_render)
+
+    pi = sub.add_parser("hfp-index", help="build or extend a band_stats similarity index; optionally audit it for near-collisions")
+    pi.add_argument("index", help="index file (.npz); created if missing, extended otherwise")
+    pi.add_argument("--seeds", default="", help="text file, one seed per line; HFPs are computed")
+    pi.add_argument("--hfp-jsonl", nargs="*", default=[], help="JSONL of HFP records (or result lines carrying one)")
+    pi.add_argument("--store", default="", help="index every HFP in this artifact store")
+    pi.add_argument("--levels", type=int, default=5, help="levels of a new index; other levels are skipped")
+    pi.add_argument("--audit", action="store_true", help="list all fingerprint pairs within --radius")
+    pi.add_argument("--radius", type=float, default=0.05, help="audit radius in population standard deviations")
+    pi.add_argument("--top", type=int, default=20, help="closest pairs to print")
+    pi.add_argument("--fail-on-collision", action="store_true", help="exit 2 if the audit finds any pair")
+    pi.set_defaults(func=cmd_hfp_index)
+
+    pn = sub.add_parser("hfp-nearest", help="nearest fingerprints in a band_stats index to a seed or indexed fingerprint")
+    pn.add_argument("index", help="index file from hfp-index")
+    g = pn.add_mutually_exclusive_group()
+    g.add_argument("--seed", default="qlx-demo-seed-phi369")
+    g.add_argument("--fingerprint", default="", help="fingerprint_hash already in the index")
+    pn.add_argument("-k", type=int, default=5)
+    pn.add_argument("--radius", type=float, default=None, help="all neighbours within this distance instead of k")
+    pn.set_defaults(func=cmd_hfp_nearest)
+
+    pb = sub.add_parser("batch", help="run a JSONL file of hfp/key/export/sts jobs in one process pool")
+    pb.add_argument("--in", dest="input", required=True, help='jobs JSONL, one {"id","op",...} per line, or - for stdin')
+    pb.add_argument("--out", default="artifacts/batch_results.jsonl", help="results JSONL, or - for stdout")
+    pb.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    pb.add_argument("--chunk", type=int, default=8, help="jobs per worker task; jobs on the same seed share a chunk")
+    pb.add_argument("--keyring", default="", help="keyring JSON for export jobs (default: HMAC test-key as ctrl-01)")
+    pb.add_argument("--no-resume", action="store_true", help="overwrite --out instead of skipping ids already ok in it")
+    pb.add_argument("--store", default="", help="artifact store for envelopes and full HFPs; result lines keep their keys")
+    pb.add_argument("--codec", choices=["gzip","lzma","none"], default="gzip")
+    pb.set_defaults(func=cmd_batch)
+
+    pa = sub.add_parser("store", help="artifact store stats, or one object by fingerprint_hash or envelope digest")
+    pa.add_argument("root", help="store directory")
+    pa.add_argument("--get", default="", help="fingerprint_hash or envelope digest to print")
+    pa.set_defaults(func=cmd_store)
+
+    pp = sub.add_parser("profile", help="run another subcommand under cProfile, stack sampling and tracemalloc")
+    pp.add_argument("--out", default="artifacts/profile", help="report directory")
+    pp.add_argument("--interval", type=float, default=0.005, help="stack/RSS sampling interval in seconds")
+    pp.add_argument("--top", type=int, default=40, help="rows in the hot-function and allocation reports")
+    pp.add_argument("--alloc-frames", type=int, default=1, help="frames kept per allocation; deeper is slower")
+    pp.add_argument("--no-tracemalloc", action="store_true",
+                    help="skip allocation tracking; it slows allocation-heavy Python loops such as logistic_map ~10x")
+    pp.add_argument("command", nargs=argparse.REMAINDER, help="subcommand and its arguments, e.g. sts --n-bits 2000000")
+    pp.set_defaults(func=cmd_profile)
+    return p
+
+def main():
+    args = build_parser().parse_args()
     args.func(args)
 
 if __name__ == "__main__":
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import json, hmac, hashlib, sys
 from pathlib import Path
-from qlx_photonic_control import canonical_json
+from qlx_photonic_control import canonical_json, signed_message
 
 ART = Path("artifacts")
 core_p  = ART / "hfp_core.json"
@@ -21,11 +21,9 @@ def main():
     env = load(env_p)
     sig = env.get("signing", {}).get("sig", "")
     key_id = env.get("signing", {}).get("key_id", "")
-    # remove signing to recreate signed message
-    bare = dict(env)
-    bare.pop("signing", None)
-    mac = hmac.new(b"test-key", canonical_json(bare), hashlib.sha256).hexdigest()
-    hmac_ok = (sig == mac)
+    # canonical envelope without signing, or the batch root when signing carries a merkle proof
+    msg, _ = signed_message(env)
+    hmac_ok = msg is not None and sig == hmac.new(b"test-key", msg, hashlib.sha256).hexdigest()
 
     # 3) array lengths
     L = env["band_count"]
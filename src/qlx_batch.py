@@ -0,0 +1,209 @@
+import os, sys, json, time, functools
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+OPS = ("hfp", "key", "export", "sts")
+
+# ---------- worker state ----------
+# One keyring and one HFP cache per worker process, kept for the whole batch.
+_KEYRING = None
+
+def _init_worker(keyspec):
+    global _KEYRING
+    from qlx_keyring import Keyring
+    if keyspec:
+        _KEYRING = Keyring.from_dict(keyspec)
+    else:
+        _KEYRING = Keyring(); _KEYRING.add_hmac("ctrl-01", b"test-key")
+
+@functools.lru_cache(maxsize=256)
+def _hfp(seed, levels):
+    # shared by every job on the same (seed, levels) in this worker; treat as read-only
+    from qlx_hfp_prototype import assemble_hfp
+    return assemble_hfp(seed, levels=levels)
+
+# ---------- ops ----------
+# Job fields mirror the qlx subcommand flags, with the same defaults.
+def _op_hfp(job):
+    h = _hfp(job.get("seed", "qlx-demo-seed-phi369"), int(job.get("levels", 5)))
+    if job.get("full"):
+        return h
+    return {"fingerprint_hash": h["fingerprint_hash"], "version": h["version"], "levels": h["levels"]}
+
+def _op_key(job):
+    from qlx_hfp_prototype import derive_key_from_hfp, derive_key_scrypt, derive_key_argon2id
+    h = _hfp(job.get("seed", "qlx-demo-seed-phi369"), int(job.get("levels", 5)))
+    pw = job.get("pw", "demo-password").encode()
+    kdf, n = job.get("kdf", "argon2id"), int(job.get("length", 32))
+    if kdf == "hkdf":
+        k = derive_key_from_hfp(pw, h["fingerprint_hash"], key_len=n)
+    elif kdf == "scrypt":
+        k = derive_key_scrypt(pw, h["fingerprint_hash"], key_len=n)
+    elif kdf == "argon2id":
+        k = derive_key_argon2id(pw, h["fingerprint_hash"], key_len=n, time_cost=int(job.get("time_cost", 2)),
+                                memory_cost_kib=int(job.get("memory_kib", 65536)),
+                                parallelism=int(job.get("parallelism", 1)))
+    else:
+        raise ValueError(f"unknown kdf {kdf!r}")
+    return {"fingerprint_hash": h["fingerprint_hash"], "kdf": kdf, "key_hex": k.hex()}
+
+def _op_export(job):
+    from qlx_photonic_control import photonic_map, make_envelope, canonical_json
+    h = _hfp(job.get("seed", "qlx-demo-seed-phi369"), int(job.get("levels", 5)))
+    env = make_envelope(h, photonic_map(h["band_stats"]), dac_bits=int(job.get("dac_bits", 14)),
+                        sample_rate_GSa=int(job.get("sample_gsa", 64)), quant_mode=job.get("quant", "nearest"))
+    signed = _KEYRING.sign(env, key_id=job.get("key_id"))  # an unknown key_id fails the job
+    return {"fingerprint_hash": h["fingerprint_hash"], "envelope": json.loads(canonical_json(signed))}
+
+def _op_sts(job):
+    from qlx_tasks import sts_task, sts_file_task
+    if job.get("bits_file"):
+        n = job.get("n_bits")
+        return sts_file_task(job["bits_file"], job.get("format", "packed"), int(job.get("offset", 0)),
+                             None if n is None else int(n), job.get("bitorder", "big"), float(job.get("alpha", 0.01)),
+                             int(job.get("block", 256)), int(job.get("dft_max_bits", 1 << 22)))
+    return sts_task(job.get("seed", "qlx-demo-seed-phi369"), int(job.get("n_bits", 200000)),
+                    float(job.get("alpha", 0.01)), int(job.get("block", 256)), job.get("whiten", "sha512"),
+                    job.get("generator", "logistic-v1"))
+
+_OPS = {"hfp": _op_hfp, "key": _op_key, "export": _op_export, "sts": _op_sts}
+
+def run_job(job):
+    t0 = time.perf_counter()
+    rec = {"id": job["id"], "op": job.get("op")}
+    try:
+        fn = _OPS.get(job.get("op"))
+        if fn is None:
+            raise ValueError(f"unknown op {job.get('op')!r}; expected one of {', '.join(OPS)}")
+        rec.update(ok=True, result=fn(job))
+    except Exception as e:
+        rec.update(ok=False, error=f"{type(e).__name__}: {e}")
+    rec["elapsed_s"] = round(time.perf_counter() - t0, 6)
+    return rec
+
+def _run_chunk(jobs):
+    return [run_job(j) for j in jobs]
+
+# ---------- input and resume ----------
+def iter_jobs(path):
+    """Yield job dicts; lines that do not parse become failing jobs so they show up in the output."""
+    with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as f:
+        for i, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+                if not isinstance(job, dict):
+                    raise ValueError("job is not an object")
+            except ValueError as e:
+                yield {"id": f"line-{i}", "op": None, "_error": f"parse error: {e}"}
+                continue
+            job.setdefault("id", f"line-{i}")
+            job["id"] = str(job["id"])
+            yield job
+
+def completed_ids(out_path):
+    """Ids with ok results in an existing output file. A torn last line is cut off so appends stay valid JSONL."""
+    done = set()
+    if not out_path or out_path == "-" or not os.path.exists(out_path):
+        return done
+    with open(out_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+        for line in data[:end].splitlines():
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if rec.get("ok"):
+                done.add(str(rec.get("id")))
+    return done
+
+def _chunks_by_seed(jobs, chunk, window):
+    # within each window of pending jobs, put jobs on the same (seed, levels) in the same chunk
+    buf = []
+    def flush():
+        buf.sort(key=lambda j: (str(j.get("seed", "")), str(j.get("levels", ""))))
+        for i in range(0, len(buf), chunk):
+            yield buf[i:i+chunk]
+        buf.clear()
+    for job in jobs:
+        buf.append(job)
+        if len(buf) >= window:
+            yield from flush()
+    if buf:
+        yield from flush()
+
+def _to_store(store, records):
+    # full HFPs and envelopes go to the store; the result line keeps only their keys
+    with store.batch():
+        for r in records:
+            res = r.get("result") if r["ok"] else None
+            if not isinstance(res, dict):
+                continue
+            if "envelope" in res:
+                res["envelope_digest"] = store.put_envelope(res.pop("envelope"))
+            elif r["op"] == "hfp" and "band_stats" in res:
+                store.put_hfp(res)
+                r["result"] = {"fingerprint_hash": res["fingerprint_hash"], "version": res["version"],
+                               "levels": res["levels"], "stored": True}
+
+# ---------- driver ----------
+def run_batch(in_path, out, workers=None, chunk=8, keys=None, resume=True, out_path=None, store=None):
+    """
+    Run a JSONL file of jobs through one process pool and stream one result line per job
+    to `out`, in completion order. With resume, ids already ok in out_path are skipped.
+    With a qlx_store.ArtifactStore, envelopes and full HFPs are written to it with one
+    fsync per finished chunk.
+    """
+    if workers is None: workers = os.cpu_count() or 1
+    done = completed_ids(out_path) if resume else set()
+    summary = {"total": 0, "ok": 0, "failed": 0, "skipped": 0, "duplicates": 0}
+    t0 = time.perf_counter()
+
+    def emit(records):
+        if store is not None:
+            _to_store(store, records)
+        for r in records:
+            summary["total"] += 1
+            summary["ok" if r["ok"] else "failed"] += 1
+            out.write(json.dumps(r, separators=(",", ":")) + "\n")
+        out.flush()
+
+    seen = set()
+    def pending():
+        for job in iter_jobs(in_path):
+            if job["id"] in done:
+                summary["skipped"] += 1; continue
+            if job["id"] in seen:
+                summary["duplicates"] += 1; continue
+            seen.add(job["id"])
+            if "_error" in job:
+                emit([{"id": job["id"], "op": None, "ok": False, "error": job["_error"], "elapsed_s": 0.0}])
+                continue
+            yield job
+
+    chunks = _chunks_by_seed(pending(), chunk, window=max(chunk, 1) * max(workers, 1) * 4)
+    if workers <= 1:
+        _init_worker(keys)
+        for jobs in chunks:
+            emit(_run_chunk(jobs))
+    else:
+        max_inflight = workers * 2
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(keys,)) as ex:
+            inflight = set()
+            for jobs in chunks:
+                inflight.add(ex.submit(_run_chunk, jobs))
+                if len(inflight) >= max_inflight:
+                    finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                    for f in finished: emit(f.result())
+            while inflight:
+                finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for f in finished: emit(f.result())
+
+    elapsed = time.perf_counter() - t0
+    summary["workers"] = workers
+    summary["elapsed_s"] = round(elapsed, 6)
+    summary["per_s"] = round(summary["total"] / elapsed, 1) if elapsed > 0 else None
+    return summary
@@ -0,0 +1,166 @@
+import os, re, gc, time, platform, statistics, functools
+
+# Kernel microbenchmarks with stored baselines and a noise-aware comparison.
+# Each case is (name, setup) where setup() returns a zero-arg callable to time.
+
+# ---------- cases ----------
+def _cases(quick=False):
+    import numpy as np
+    from qlx_hfp_prototype import (logistic_map, harmonic_comb, dwt_haar, compute_band_stats, assemble_hfp,
+                                   assemble_hfp_bundle, derive_key_from_hfp, derive_key_scrypt, HAVE_ARGON2)
+    from qlx_photonic_control import photonic_map, make_envelope, sign_envelope_hmac, sign_envelope_ed25519
+    from qlx_sts_min import default_stream, psub_stream, stream_to_bits, SUITE_TESTS
+
+    big = 1 << 16 if quick else 1 << 20
+    sts_sizes = [200_000] if quick else [200_000, 2_000_000]
+    harmonics = [3., 6., 9., 27., 54., 111., 216.]
+    fp = assemble_hfp("bench", levels=5)["fingerprint_hash"]
+    cases = []
+    add = lambda name, setup: cases.append((name, setup))
+
+    def blend(n):
+        return np.random.default_rng(7).standard_normal(n)
+
+    for n in (8192, 65536):
+        add(f"logistic_map[n={n}]", lambda n=n: lambda: logistic_map(n, x0=0.4, burn=2048))
+    for n in (65536, big):
+        add(f"psub_stream[n={n}]", lambda n=n: lambda: psub_stream("bench", n))
+    for n in (8192, big):
+        add(f"harmonic_comb[n={n}]", lambda n=n: lambda: harmonic_comb(n, harmonics, phase_seed=1))
+    for n, L in ((8192, 5), (big, 10)):
+        add(f"dwt_haar[n={n},L={L}]", lambda n=n, L=L: (lambda x: lambda: dwt_haar(x, levels=L))(blend(n)))
+        add(f"compute_band_stats[n={n},L={L}]",
+            lambda n=n, L=L: (lambda b: lambda: compute_band_stats(b))(dwt_haar(blend(n), levels=L)))
+    for L in (5, 10):
+        add(f"assemble_hfp[L={L}]", lambda L=L: lambda: assemble_hfp("bench", levels=L))
+    add("assemble_hfp_bundle[L=1..10]", lambda: lambda: assemble_hfp_bundle("bench", range(1, 11)))
+
+    add("kdf_hkdf", lambda: lambda: derive_key_from_hfp(b"pw", fp))
+    add("kdf_scrypt[N=2^14,r=8]", lambda: lambda: derive_key_scrypt(b"pw", fp))
+    if HAVE_ARGON2:
+        from qlx_hfp_prototype import derive_key_argon2id
+        mk = 8192 if quick else 65536
+        add(f"kdf_argon2id[m={mk}KiB,t=2]",
+            lambda: lambda: derive_key_argon2id(b"pw", fp, time_cost=2, memory_cost_kib=mk, parallelism=1))
+
+    def env_setup(L):
+        h = assemble_hfp("bench", levels=L)
+        return h, photonic_map(h["band_stats"])
+    for L in (5, 10):
+        add(f"photonic_map[L={L}]", lambda L=L: (lambda h: lambda: photonic_map(h["band_stats"]))(env_setup(L)[0]))
+        add(f"make_envelope[L={L}]", lambda L=L: (lambda hp: lambda: make_envelope(*hp))(env_setup(L)))
+
+    def signed_setup():
+        h, p = env_setup(10)
+        return make_envelope(h, p)
+    add("sign_hmac", lambda: (lambda e: lambda: sign_envelope_hmac(dict(e), b"bench-key"))(signed_setup()))
+    priv = "9d61b19deffd5a60ba844af492ec2cc44449c5697b326919703bac031cae7f60"
+    add("sign_ed25519", lambda: (lambda e: lambda: sign_envelope_ed25519(e, priv))(signed_setup()))
+
+    # the logistic stream is slow to build, so each size is generated once and shared
+    @functools.lru_cache(maxsize=None)
+    def stream(stream_n):
+        return default_stream("bench", n=stream_n)
+
+    for n in sts_sizes:
+        stream_n = (n + 511)//512*4096
+        for w in ("none", "vn", "sha512"):
+            add(f"stream_to_bits[{w},n={stream_n}]",
+                lambda w=w, m=stream_n: (lambda x: lambda: stream_to_bits(x, whiten=w))(stream(m)))
+        def bits_setup(n=n, m=stream_n):
+            return stream_to_bits(stream(m), whiten="sha512")[:n]
+        for name, fn in SUITE_TESTS:
+            add(f"sts_{name}[n={n}]", lambda fn=fn, b=bits_setup: (lambda bits: lambda: fn(bits, 256))(b()))
+    return cases
+
+# ---------- measurement ----------
+def measure(fn, repeat=7, min_time=0.05):
+    """Per-call seconds for `repeat` samples; each sample loops fn until it runs >= min_time."""
+    fn()  # warm caches and lazy imports
+    t0 = time.perf_counter(); fn(); once = time.perf_counter() - t0
+    loops = max(1, int(min_time / once) if once > 0 else 1000)
+    samples = []
+    gc_was = gc.isenabled(); gc.disable()
+    try:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for _ in range(loops): fn()
+            samples.append((time.perf_counter() - t0) / loops)
+    finally:
+        if gc_was: gc.enable()
+    med = statistics.median(samples)
+    mad = statistics.median(abs(s - med) for s in samples)
+    return {"median_s": med, "mad_s": mad, "min_s": min(samples), "loops": loops, "repeat": repeat}
+
+def _reference_work():
+    import numpy as np
+    x = 0.372
+    for _ in range(20000):
+        x = 3.99*x*(1 - x)
+    np.sin(np.arange(65536, dtype=float)).sum()
+    return x
+
+def calibrate(repeat=7):
+    """Median seconds of a fixed Python+NumPy workload; used to factor out machine-wide speed drift."""
+    return measure(_reference_work, repeat=repeat, min_time=0.05)["median_s"]
+
+def machine():
+    import numpy as np
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()}
+
+def run(pattern=None, quick=False, repeat=7, min_time=0.05, log=None, names=None):
+    rx = re.compile(pattern) if pattern else None
+    cal_before = calibrate()
+    results = {}
+    for name, setup in _cases(quick):
+        if (rx and not rx.search(name)) or (names is not None and name not in names):
+            continue
+        results[name] = measure(setup(), repeat=repeat, min_time=min_time)
+        if log:
+            r = results[name]
+            log(f"{name:<44} {_fmt(r['median_s']):>10} ± {_fmt(r['mad_s'])}")
+    cal = (cal_before + calibrate()) / 2
+    return {"machine": machine(), "quick": quick, "created": time.time(), "calibration_s": cal, "results": results}
+
+# ---------- comparison ----------
+def compare(baseline, current, rel_tol=0.25, mad_k=3.0, normalize=True):
+    """
+    Classify each case against the baseline. A change counts only when it exceeds both
+    rel_tol of the baseline median and mad_k times the larger of the two MADs, so noisy
+    kernels need a bigger shift to be flagged. With normalize, baseline times are first
+    scaled by the ratio of the two runs' calibration workloads.
+    """
+    scale = 1.0
+    if normalize and baseline.get("calibration_s") and current.get("calibration_s"):
+        scale = current["calibration_s"] / baseline["calibration_s"]
+    rows = []
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            rows.append({"case": name, "status": "new", "current_s": cur["median_s"]}); continue
+        base_s = base["median_s"] * scale
+        delta = cur["median_s"] - base_s
+        noise = mad_k * max(base["mad_s"] * scale, cur["mad_s"])
+        threshold = max(rel_tol * base_s, noise)
+        status = "ok"
+        if abs(delta) > threshold:
+            status = "regression" if delta > 0 else "improvement"
+        rows.append({"case": name, "status": status, "baseline_s": base_s, "current_s": cur["median_s"],
+                     "ratio": cur["median_s"] / base_s if base_s else None,
+                     "threshold_s": threshold, "scale": scale})
+    return rows
+
+def _fmt(s):
+    if s is None: return "-"
+    if s < 1e-3: return f"{s*1e6:.1f}us"
+    if s < 1: return f"{s*1e3:.2f}ms"
+    return f"{s:.3f}s"
+
+def format_rows(rows):
+    out = []
+    for r in rows:
+        ratio = f"x{r['ratio']:.2f}" if r.get("ratio") else ""
+        out.append(f"{r['status']:<12} {r['case']:<44} {_fmt(r.get('baseline_s')):>10} -> "
+                   f"{_fmt(r['current_s']):>10} {ratio}")
+    return "\n".join(out)
@@ -0,0 +1,101 @@
+import hashlib, uuid
+import numpy as np
+from qlx_photonic_control import PARAM_RANGES, envelope_codes, canonical_json, _codes_to_values
+
+DELTA_VERSION = "PD-0.1"
+PARAM_KEYS = list(PARAM_RANGES)
+
+def state_digest(codes) -> str:
+    """SHA-256 over the canonical list of DAC codes (param-major). Device state is compared in codes."""
+    return hashlib.sha256(canonical_json([int(c) for c in codes])).hexdigest()
+
+def is_delta(env) -> bool:
+    return env.get("type") == "delta"
+
+# ---------- sender ----------
+def make_delta(base, target):
+    """
+    Delta envelope moving a controller from `base` (a full envelope it already holds)
+    to `target` (a full envelope). Carries only the (band, param, code) triples that differ.
+    Sign the result like a full envelope.
+    """
+    L = int(base["band_count"])
+    if int(target["band_count"]) != L:
+        raise ValueError("band_count differs; send a full envelope")
+    if int(target["dac"]["width_bits"]) != int(base["dac"]["width_bits"]):
+        raise ValueError("dac.width_bits differs; send a full envelope")
+    b, t = envelope_codes(base), envelope_codes(target)
+    changes = []
+    for i in np.flatnonzero(b != t):
+        changes.append([int(i % L), PARAM_KEYS[i // L], int(t[i])])
+    return {
+        "version": DELTA_VERSION,
+        "type": "delta",
+        "session_id": target.get("session_id") or str(uuid.uuid4()),
+        "base": {"session_id": base["session_id"], "hfp_hash": base["hfp_hash"]},
+        "hfp_hash": target["hfp_hash"],
+        "band_count": L,
+        "mode": target["mode"],
+        "apply": dict(target["apply"]),
+        "dac": dict(target["dac"]),
+        "changes": changes,
+        "state_digest": state_digest(t),
+    }
+
+# ---------- controller ----------
+def _is_int(v):
+    return isinstance(v, (int, np.integer)) and not isinstance(v, bool)
+
+def apply_delta(base, delta, keyring=None, verify=True):
+    """
+    Reconstruct the full envelope a delta describes on top of `base` and verify it.
+    Both the base and the delta signatures must verify against `keyring`; callers that
+    have already checked them (the stand-in controller) pass verify=False instead.
+    Raises ValueError on any mismatch. The result is unsigned; unchanged params keep
+    the base values exactly, changed ones are mapped back from their codes.
+    """
+    if not is_delta(delta):
+        raise ValueError("not a delta envelope")
+    if verify:
+        if keyring is None:
+            raise ValueError("no keyring to verify the delta with; pass verify=False if its signature was checked")
+        for name, e in (("base", base), ("delta", delta)):
+            ok, err = keyring.check(e)
+            if ok is not True:
+                raise ValueError(f"{name} signature: {err or 'invalid'}")
+    ref = delta.get("base", {})
+    if ref.get("session_id") != base.get("session_id") or ref.get("hfp_hash") != base.get("hfp_hash"):
+        raise ValueError("delta does not reference this base envelope")
+    L = int(base["band_count"])
+    bits = int(base["dac"]["width_bits"])
+    if int(delta["band_count"]) != L or int(delta["dac"]["width_bits"]) != bits:
+        raise ValueError("delta band_count/width_bits do not match base")
+
+    codes = envelope_codes(base)
+    params = {k: list(base["params"][k]) for k in PARAM_KEYS}
+    changes = delta["changes"]
+    if not isinstance(changes, list):
+        raise ValueError("changes must be a list of [band, param, code]")
+    for c in changes:
+        if not isinstance(c, (list, tuple)) or len(c) != 3:
+            raise ValueError(f"bad change {c!r}: expected [band, param, code]")
+        band, k, code = c
+        if (not _is_int(band) or not isinstance(k, str) or not _is_int(code) or k not in PARAM_RANGES
+                or not 0 <= band < L or not 0 <= code <= (1 << bits) - 1):
+            raise ValueError(f"bad change {c!r}")
+        lo, hi = PARAM_RANGES[k]
+        codes[PARAM_KEYS.index(k) * L + band] = code
+        params[k][band] = float(_codes_to_values(code, lo, hi, bits))
+    if state_digest(codes) != delta["state_digest"]:
+        raise ValueError("state digest mismatch after applying delta")
+
+    return {
+        "version": base["version"],
+        "session_id": delta["session_id"],
+        "hfp_hash": delta["hfp_hash"],
+        "band_count": L,
+        "mode": delta["mode"],
+        "apply": dict(delta["apply"]),
+        "params": params,
+        "dac": dict(delta["dac"]),
+    }
@@ -0,0 +1,267 @@
+import os, math, time, asyncio, threading, multiprocessing, collections
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from qlx_metrics import call_captured, merge_stages
+
+def _env_int(key, default):
+    try:
+        return int(os.environ.get(key, default))
+    except Exception:
+        return default
+
+class Saturated(Exception):
+    """A route has no free slot: 429 when its queue is full, 503 when a queued call timed out."""
+    def __init__(self, route, status, retry_after, detail):
+        super().__init__(detail)
+        self.route, self.status, self.retry_after, self.detail = route, status, retry_after, detail
+
+class RouteLimit:
+    def __init__(self, name, concurrency, queue_depth, queue_timeout_s):
+        self.name = name
+        self.concurrency = max(1, int(concurrency))
+        self.queue_depth = max(0, int(queue_depth))
+        self.queue_timeout_s = float(queue_timeout_s)
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.avg_s = 0.0  # EWMA of task duration, drives Retry-After
+        self._sem = None
+
+    @property
+    def sem(self):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.concurrency)
+        return self._sem
+
+    def retry_after(self):
+        per = self.avg_s if self.avg_s > 0 else 1.0
+        return max(1, math.ceil(per * (self.waiting + 1) / self.concurrency))
+
+    def observe(self, dt):
+        self.avg_s = dt if self.avg_s == 0 else 0.8*self.avg_s + 0.2*dt
+
+    def snapshot(self):
+        return {"concurrency": self.concurrency, "queue_depth": self.queue_depth, "running": self.running,
+                "waiting": self.waiting, "rejected": self.rejected, "avg_s": round(self.avg_s, 6)}
+
+def _memory_limit_bytes():
+    """Container memory limit (cgroup v2, then v1), else physical memory, else None."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            v = open(path).read().strip()
+            if v != "max" and int(v) < (1 << 60):
+                return int(v)
+        except (OSError, ValueError):
+            pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+class MemoryBudget:
+    """
+    Weighted semaphore over bytes. Each call holds its real memory cost until it
+    finishes; calls that do not fit wait in FIFO order (so large ones are not starved),
+    up to max_waiters and queue_timeout_s.
+    """
+
+    def __init__(self, total_bytes, max_waiters=64, queue_timeout_s=30.0):
+        self.total = int(total_bytes)
+        self.max_waiters = int(max_waiters)
+        self.queue_timeout_s = float(queue_timeout_s)
+        self.in_use = 0
+        self.rejected = 0
+        self._waiters = collections.deque()  # (nbytes, future)
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def _grant(self):
+        while self._waiters:
+            need, fut = self._waiters[0]
+            if fut.done():
+                self._waiters.popleft(); continue
+            if self.in_use + need > self.total:
+                break
+            self._waiters.popleft()
+            self.in_use += need
+            fut.set_result(None)
+
+    async def acquire(self, route, nbytes):
+        if nbytes < 0:
+            raise ValueError(f"cannot reserve a negative amount ({nbytes} bytes)")
+        if nbytes > self.total:
+            raise ValueError(f"needs {nbytes >> 20} MiB, budget is {self.total >> 20} MiB")
+        if not self._waiters and self.in_use + nbytes <= self.total:
+            self.in_use += nbytes
+            return
+        if len(self._waiters) >= self.max_waiters:
+            self.rejected += 1
+            raise Saturated(route, 429, self._retry_after(), f"{route} saturated: memory budget queue full")
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append((nbytes, fut))
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.queue_timeout_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                self.release(nbytes)  # granted while timing out
+            else:
+                fut.cancel()
+                self._waiters.remove((nbytes, fut))
+                self._grant()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            raise Saturated(route, 503, self._retry_after(), f"{route} saturated: memory budget wait timed out")
+
+    def release(self, nbytes):
+        self.in_use -= nbytes
+        self._grant()
+
+    def _retry_after(self):
+        return max(1, len(self._waiters))
+
+    def snapshot(self):
+        return {"budget_bytes": self.total, "in_use_bytes": self.in_use,
+                "waiting": self.waiting, "rejected": self.rejected}
+
+def _parse_limit(spec, default):
+    # "concurrency:queue_depth", either part optional
+    try:
+        c, _, q = str(spec).partition(":")
+        return (int(c) if c else default[0], int(q) if q else default[1])
+    except Exception:
+        return default
+
+HEAVY_ROUTES = ("key", "sts")
+
+class Executor:
+    """
+    Runs CPU-bound callables in process pools behind per-route concurrency limits and
+    bounded wait queues. Heavy routes (HEAVY_ROUTES) get a pool of their own, so a
+    saturated /key or /sts never holds the workers that /hfp and /envelope run on.
+
+    Config (env):
+      QLX_POOL_WORKERS    pool size for cheap routes (default: CPU count; 0 runs in threads, for tests and dev)
+      QLX_HEAVY_WORKERS   pool size for heavy routes (default: half of QLX_POOL_WORKERS, at least 1)
+      QLX_POOL_START      multiprocessing start method (default: spawn)
+      QLX_LIMIT_<ROUTE>   "concurrency:queue_depth", e.g. QLX_LIMIT_KEY=2:8
+      QLX_QUEUE_TIMEOUT_S max seconds a call waits for a slot before 503 (default: 30)
+      QLX_KDF_MEMORY_BUDGET_MIB  memory shared by concurrent KDF calls (default: half the container limit)
+      QLX_KDF_MEMORY_QUEUE       calls allowed to wait for memory before 429 (default: 64)
+    """
+
+    def __init__(self, workers=None, limits=None, queue_timeout_s=None, start_method=None, memory_budget_mib=None,
+                 heavy_workers=None):
+        self.workers = _env_int("QLX_POOL_WORKERS", os.cpu_count() or 1) if workers is None else int(workers)
+        n = max(1, self.workers)
+        self.heavy_workers = max(1, _env_int("QLX_HEAVY_WORKERS", max(1, n//2)) if heavy_workers is None
+                                 else int(heavy_workers))
+        self.start_method = start_method or os.environ.get("QLX_POOL_START", "spawn")
+        qt = float(os.environ.get("QLX_QUEUE_TIMEOUT_S", 30)) if queue_timeout_s is None else queue_timeout_s
+        h = self.heavy_workers
+        defaults = {"hfp": (n, 4*n), "envelope": (n, 4*n), "key": (h, 2*n), "sts": (h, n)}
+        self.limits = {}
+        for name, d in defaults.items():
+            c, q = _parse_limit(os.environ.get(f"QLX_LIMIT_{name.upper()}", ""), d)
+            self.limits[name] = RouteLimit(name, c, q, qt)
+        for name, (c, q) in (limits or {}).items():
+            self.limits[name] = RouteLimit(name, c, q, qt)
+        if memory_budget_mib is None:
+            limit = _memory_limit_bytes()
+            memory_budget_mib = _env_int("QLX_KDF_MEMORY_BUDGET_MIB", (limit // 2) >> 20 if limit else 512)
+        self.memory = MemoryBudget(int(memory_budget_mib) << 20, _env_int("QLX_KDF_MEMORY_QUEUE", 64), qt)
+        self._pools = {"light": None, "heavy": None}
+        self._lock = threading.Lock()
+
+    def _get_pool(self, kind):
+        pool = self._pools[kind]
+        if pool is None:
+            with self._lock:
+                pool = self._pools[kind]
+                if pool is None:
+                    heavy = kind == "heavy"
+                    if self.workers <= 0:
+                        n = sum(l.concurrency for l in self.limits.values() if (l.name in HEAVY_ROUTES) == heavy)
+                        pool = ThreadPoolExecutor(max_workers=max(1, n))
+                    else:
+                        ctx = multiprocessing.get_context(self.start_method)
+                        pool = ProcessPoolExecutor(max_workers=self.heavy_workers if heavy else self.workers,
+                                                   mp_context=ctx)
+                    self._pools[kind] = pool
+        return pool
+
+    @property
+    def pool(self):
+        """Pool for cheap routes."""
+        return self._get_pool("light")
+
+    @property
+    def heavy_pool(self):
+        return self._get_pool("heavy")
+
+    def pool_for(self, route):
+        return self.heavy_pool if route in HEAVY_ROUTES else self.pool
+
+    def limit(self, route):
+        if route not in self.limits:
+            n = max(1, self.workers)
+            self.limits[route] = RouteLimit(route, n, 4*n, self.limits["hfp"].queue_timeout_s)
+        return self.limits[route]
+
+    async def run(self, route, fn, *args, **kwargs):
+        lim = self.limit(route)
+        if lim.running >= lim.concurrency and lim.waiting >= lim.queue_depth:
+            lim.rejected += 1
+            raise Saturated(route, 429, lim.retry_after(), f"{route} saturated: queue full")
+        lim.waiting += 1
+        try:
+            await asyncio.wait_for(lim.sem.acquire(), lim.queue_timeout_s)
+        except asyncio.TimeoutError:
+            lim.rejected += 1
+            raise Saturated(route, 503, lim.retry_after(), f"{route} saturated: queue wait timed out")
+        finally:
+            lim.waiting -= 1
+        lim.running += 1
+        t0 = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self.pool_for(route)
+            # stage timings recorded in the worker come back with the result and are merged under this route
+            result, stages = await loop.run_in_executor(pool, call_captured, fn, args, kwargs)
+            merge_stages(stages)
+            return result
+        except BrokenProcessPool:
+            self._reset_pool(pool)
+            raise Saturated(route, 503, 1, f"{route} worker pool restarted")
+        finally:
+            lim.observe(time.perf_counter() - t0)
+            lim.running -= 1
+            lim.sem.release()
+
+    async def run_charged(self, route, nbytes, fn, *args, **kwargs):
+        """run() after reserving nbytes from the memory budget; the reservation is held until fn returns."""
+        await self.memory.acquire(route, nbytes)
+        try:
+            return await self.run(route, fn, *args, **kwargs)
+        finally:
+            self.memory.release(nbytes)
+
+    def _reset_pool(self, broken):
+        # only the pool that broke is replaced; calls on the other one carry on
+        with self._lock:
+            for kind, pool in self._pools.items():
+                if pool is broken:
+                    self._pools[kind] = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {name: lim.snapshot() for name, lim in self.limits.items()}
+
+    def shutdown(self):
+        with self._lock:
+            pools = [p for p in self._pools.values() if p is not None]
+            self._pools = {"light": None, "heavy": None}
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,274 @@
+import os, itertools
+import numpy as np
+
+# Similarity index over HFP band_stats, for collision monitoring.
+#
+# Each HFP becomes the vector [mean, std, entropy] per band (3*(levels+1) values). Vectors
+# are standardized with a center and per-feature scale fitted on the first MIN_FIT_ROWS
+# fingerprints (refitted on every insert until there are that many, then fixed), so
+# distances are in population standard deviations and later inserts stay comparable.
+# Features with no real spread (the A_L mean is ~1e-16 for every seed) are left unscaled.
+#
+# The features have ~14 effective dimensions, where KD-trees degrade to a full scan, so
+# kNN and radius queries are chunked brute force on BLAS. The collision audit (all pairs
+# within r) avoids N^2 work: points are bucketed on a grid of cell width 4r over the top 8
+# principal components. The projection is orthonormal, so it never lengthens a distance,
+# and a radius-r ball reaches a neighbour cell on an axis only when the point lies within r
+# of that cell boundary. Only those cells are searched, about 1.5^8 = 26 lookups per
+# point, and every candidate is checked exactly, so the audit finds every pair within r.
+
+INDEX_VERSION = 1
+MIN_FIT_ROWS = 64  # a smaller population gives no usable scale
+FEATURES = ("mean", "std", "entropy")
+
+def features(band_stats):
+    return np.array([[b[f] for f in FEATURES] for b in band_stats], dtype=float).reshape(-1)
+
+def _id_bytes(fp):
+    return bytes.fromhex(fp) if isinstance(fp, str) else bytes(fp)
+
+class HFPIndex:
+    def __init__(self, levels):
+        self.levels = int(levels)
+        self.dim = 3*(self.levels + 1)
+        self.center = self.scale = self.basis = None
+        self.fit_rows = 0  # rows the current center/scale/basis were fitted on
+        self.n = 0
+        self._X = np.empty((0, self.dim), dtype=np.float32)  # standardized features, rows [0, n)
+        self._ids = np.empty(0, dtype="S64")                 # raw sha512 fingerprint bytes
+        self._pos = None                                     # fingerprint bytes -> row, built on demand
+
+    @property
+    def X(self):
+        return self._X[:self.n]
+
+    @property
+    def ids(self):
+        return self._ids[:self.n]
+
+    def __len__(self):
+        return self.n
+
+    # ---------- build ----------
+    def fit(self, F, max_rows=200_000):
+        """Fix center, scale and principal axes (all dim of them, largest variance first) from raw feature rows."""
+        F = np.asarray(F, dtype=float)
+        self.fit_rows = len(F)
+        if len(F) > max_rows:
+            F = F[np.random.default_rng(0).choice(len(F), max_rows, replace=False)]
+        self.center = F.mean(axis=0)
+        s = F.std(axis=0)
+        self.scale = np.where(s > 1e-3*s.max(), s, 1.0) if s.max() > 0 else np.ones(self.dim)
+        Z = (F - self.center) / self.scale
+        # eigenvectors of the dim x dim scatter matrix: a complete basis even when rows < dim
+        _, v = np.linalg.eigh(Z.T @ Z)
+        self.basis = np.ascontiguousarray(v[:, ::-1])
+        return self
+
+    def transform(self, F):
+        F = np.atleast_2d(np.asarray(F, dtype=float))
+        if F.shape[1] != self.dim:
+            raise ValueError(f"feature vectors have {F.shape[1]} values; levels={self.levels} needs {self.dim}")
+        return (F - self.center) / self.scale
+
+    def add(self, ids, F):
+        """Insert rows of raw features keyed by fingerprint_hash; known fingerprints are skipped. Returns rows added."""
+        keys = [_id_bytes(i) for i in ids]
+        F = np.atleast_2d(np.asarray(F, dtype=float))
+        if len(keys) != len(F):
+            raise ValueError("ids and features differ in length")
+        if not keys:
+            return 0
+        pos = self._positions()
+        fresh, seen = [], set()
+        for r, k in enumerate(keys):
+            if k not in pos and k not in seen:
+                fresh.append(r); seen.add(k)
+        if not fresh:
+            return 0
+        if self.fit_rows < MIN_FIT_ROWS:
+            # too few rows for a stable scale so far: refit on everything and restandardize
+            old = self.raw(np.arange(self.n)) if self.n else np.empty((0, self.dim))
+            self.fit(np.concatenate([old, F[fresh]]))
+            if self.n:
+                self._X[:self.n] = self.transform(old)
+        Z = self.transform(F[fresh]).astype(np.float32)
+        need = self.n + len(fresh)
+        if need > len(self._X):
+            cap = max(need, 2*len(self._X), 1024)
+            self._X = np.resize(self._X, (cap, self.dim)); self._ids = np.resize(self._ids, cap)
+        self._X[self.n:need] = Z
+        for r in fresh:
+            self._ids[self.n] = keys[r]; pos[keys[r]] = self.n; self.n += 1
+        return len(fresh)
+
+    def add_hfp(self, hfp):
+        if int(hfp["levels"]) != self.levels:
+            raise ValueError(f"HFP has levels={hfp['levels']}; index has levels={self.levels}")
+        return self.add([hfp["fingerprint_hash"]], [features(hfp["band_stats"])])
+
+    @classmethod
+    def build(cls, hfps, levels=None, batch=65536):
+        """Bulk build from an iterable of HFP records (assemble_hfp shape)."""
+        idx, ids, rows = None, [], []
+        def flush():
+            idx.add(ids, rows); ids.clear(); rows.clear()
+        for h in hfps:
+            if idx is None:
+                idx = cls(levels if levels is not None else h["levels"])
+            if int(h["levels"]) != idx.levels:
+                continue
+            ids.append(h["fingerprint_hash"]); rows.append(features(h["band_stats"]))
+            if len(ids) >= batch: flush()
+        if idx is None:
+            raise ValueError("no HFPs to index")
+        if ids: flush()
+        return idx
+
+    def _positions(self):
+        if self._pos is None:
+            self._pos = {bytes(k): i for i, k in enumerate(self.ids)}
+        return self._pos
+
+    def row(self, fingerprint_hash):
+        return self._positions().get(_id_bytes(fingerprint_hash))
+
+    def fingerprint(self, i):
+        return bytes(self._ids[i]).hex()
+
+    def raw(self, i):
+        """Raw feature row(s) of index row i (float32 precision)."""
+        return self._X[i].astype(float)*self.scale + self.center
+
+    # ---------- queries ----------
+    def _scan(self, Q, chunk):
+        # squared distances from standardized queries Q to index rows, one row chunk at a time
+        q32 = Q.astype(np.float32)
+        qn = np.einsum("ij,ij->i", q32, q32)
+        for s in range(0, self.n, chunk):
+            Xc = self._X[s:min(s + chunk, self.n)]
+            d2 = qn[:, None] + np.einsum("ij,ij->i", Xc, Xc)[None, :] - 2.0*(q32 @ Xc.T)
+            yield s, np.maximum(d2, 0.0)
+
+    def _exact(self, Q, rows):
+        return np.linalg.norm(self._X[rows].astype(float) - Q, axis=-1)
+
+    def knn(self, F, k=5, exclude_self=False, chunk=1 << 16):
+        """(distances, rows) of the k nearest index rows to each raw feature row, nearest first."""
+        Q = self.transform(F)
+        k = min(k + int(exclude_self), self.n)
+        best_d = np.full((len(Q), 0), np.inf, dtype=np.float32)
+        best_i = np.zeros((len(Q), 0), dtype=np.int64)
+        for s, d2 in self._scan(Q, chunk):
+            kk = min(k, d2.shape[1])
+            part = np.argpartition(d2, kk - 1, axis=1)[:, :kk]
+            best_d = np.concatenate([best_d, np.take_along_axis(d2, part, 1)], axis=1)
+            best_i = np.concatenate([best_i, part + s], axis=1)
+            if best_d.shape[1] > k:
+                keep = np.argpartition(best_d, k - 1, axis=1)[:, :k]
+                best_d, best_i = np.take_along_axis(best_d, keep, 1), np.take_along_axis(best_i, keep, 1)
+        dist = self._exact(Q[:, None, :], best_i)
+        order = np.argsort(dist, axis=1, kind="stable")
+        dist, rows = np.take_along_axis(dist, order, 1), np.take_along_axis(best_i, order, 1)
+        if exclude_self:
+            dist, rows = dist[:, 1:], rows[:, 1:]
+        return dist, rows
+
+    def radius(self, F, r, chunk=1 << 16):
+        """Per raw feature row: (distances, rows) of index rows within r, nearest first."""
+        Q = self.transform(F)
+        hits = [[] for _ in Q]
+        for s, d2 in self._scan(Q, chunk):
+            slack = 1e-5*(d2.max() + 1.0)  # float32 cancellation; candidates are re-checked exactly
+            qi, ci = np.nonzero(d2 <= r*r + slack)
+            for q, c in zip(qi, ci + s):
+                hits[q].append(c)
+        out = []
+        for q, rows in zip(Q, hits):
+            rows = np.array(rows, dtype=np.int64)
+            d = self._exact(q, rows) if len(rows) else np.zeros(0)
+            keep = np.argsort(d, kind="stable")[: int(np.sum(d <= r))]
+            out.append((d[keep], rows[keep]))
+        return out
+
+    def audit(self, r, grid_dims=8, chunk=1 << 16, max_pairs=1 << 21):
+        """All pairs of distinct fingerprints within distance r: (i, j, d) arrays, i < j, sorted by d."""
+        empty = (np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0))
+        if self.n < 2:
+            return empty
+        g = min(grid_dims, self.basis.shape[1])
+        w = 4.0*r
+        u = (self.X.astype(float) @ self.basis[:, :g]) / w
+        cell = np.floor(u).astype(np.int64)
+        frac = u - cell
+        del u
+        side = np.where(frac >= 0.5, 1, -1)
+        # a neighbour cell on an axis is only needed within r of that boundary (half the points)
+        near = (np.minimum(frac, 1.0 - frac)*w < r) @ (1 << np.arange(g))
+        cell -= cell.min(axis=0)
+        # packed cell coordinates; if they do not fit in 64 bits the key wraps, which only
+        # merges cells (extra candidates, still checked exactly)
+        with np.errstate(over="ignore"):
+            mult = np.cumprod(np.concatenate([[1], cell.max(axis=0)[:-1] + 3])).astype(np.int64)
+            key = cell @ mult
+            step = side*mult
+        order = np.argsort(key, kind="stable")
+        ukey, ustart, ucount = np.unique(key[order], return_index=True, return_counts=True)
+        I, J = [], []
+        for s in range(0, self.n, chunk):
+            # (point, cell key) for the point's own cell and every neighbour cell it reaches:
+            # on each axis, points near a boundary fork a copy shifted toward it
+            pi = order[s:s + chunk]  # in key order, so the lookups below walk ukey nearly in sequence
+            k2 = key[pi]
+            for a in range(g):
+                f = ((near[pi] >> a) & 1).astype(bool)
+                with np.errstate(over="ignore"):
+                    k2 = np.concatenate([k2, k2[f] + step[pi[f], a]])
+                pi = np.concatenate([pi, pi[f]])
+            u = np.minimum(np.searchsorted(ukey, k2), len(ukey) - 1)
+            hit = ukey[u] == k2
+            pi, u = pi[hit], u[hit]
+            cnt = ucount[u]
+            # expand to candidate pairs at most max_pairs at a time; a large r means crowded cells
+            csum = np.cumsum(cnt)
+            cuts = np.searchsorted(csum, np.arange(max_pairs, int(csum[-1]) if len(csum) else 0, max_pairs), "right")
+            for a, b in itertools.pairwise(np.unique(np.concatenate([[0], cuts, [len(cnt)]]))):
+                c, total = cnt[a:b], int(cnt[a:b].sum())
+                i = np.repeat(pi[a:b], c)
+                j = order[np.repeat(ustart[u[a:b]], c) + np.arange(total) - np.repeat(np.cumsum(c) - c, c)]
+                keep = i < j
+                i, j = i[keep], j[keep]
+                d = np.linalg.norm(self._X[i].astype(float) - self._X[j], axis=1)
+                keep = d <= r
+                I.append(i[keep]); J.append(j[keep])
+        if not I:
+            return empty
+        pair = np.unique(np.concatenate(I)*self.n + np.concatenate(J))
+        I, J = pair // self.n, pair % self.n
+        D = np.linalg.norm(self._X[I].astype(float) - self._X[J], axis=1)
+        o = np.argsort(D, kind="stable")
+        return I[o], J[o], D[o]
+
+    # ---------- persistence ----------
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, version=INDEX_VERSION, levels=self.levels, X=self.X, ids=self.ids,
+                     center=self.center, scale=self.scale, basis=self.basis, fit_rows=self.fit_rows)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            if int(z["version"]) != INDEX_VERSION:
+                raise ValueError(f"{path}: index version {int(z['version'])}, expected {INDEX_VERSION}")
+            idx = cls(int(z["levels"]))
+            idx._X, idx._ids = z["X"].astype(np.float32), z["ids"].astype("S64")
+            idx.n = len(idx._ids)
+            idx.center, idx.scale, idx.basis = z["center"], z["scale"], z["basis"]
+            idx.fit_rows = int(z["fit_rows"]) if "fit_rows" in z else idx.n
+        return idx
+
+    def stats(self):
+        return {"levels": self.levels, "dim": self.dim, "fingerprints": self.n, "fit_rows": self.fit_rows,
+                "bytes": int(self.X.nbytes + self.ids.nbytes)}
@@ -1,6 +1,7 @@
 import math, json, hashlib, hmac, struct, time, random
 import numpy as np
 import os
+from qlx_metrics import timed, stage
 
 def _env_int(key, default):
     try:
@@ -8,9 +9,10 @@ def _env_int(key, default):
     except Exception:
         return default
 
+# argon2 is imported on first use; only probe for it here
 try:
-    from argon2.low_level import hash_secret_raw, Type
-    HAVE_ARGON2 = True
+    import importlib.util
+    HAVE_ARGON2 = importlib.util.find_spec("argon2") is not None
 except Exception:
     HAVE_ARGON2 = False
 
@@ -36,12 +38,14 @@ def hkdf_expand(prk, info, length, hashmod=hashlib.sha512):
     return okm[:length]
 
 # ---------- chaos and harmonics ----------
+@timed("logistic_map")
 def logistic_map(n, r=3.99, x0=0.372, burn=1024):
     x = np.empty(n+burn); x[0] = x0
     for i in range(1, n+burn):
         x[i] = r * x[i-1] * (1 - x[i-1])
     return x[burn:]
 
+@timed("harmonic_comb")
 def harmonic_comb(n, freqs, fs=1.0, phi=1.61803398875, phase_seed=0xBEEF):
     rng = random.Random(phase_seed)
     t = np.arange(n)/fs
@@ -56,9 +60,10 @@ def harmonic_comb(n, freqs, fs=1.0, phi=1.61803398875, phase_seed=0xBEEF):
     return s
 
 # ---------- Haar DWT ----------
-def dwt_haar(x, levels=4):
+def _haar_steps(x, levels):
+    # approximation and detail after each step: [A_1..A_L], [D(1)..D(L)], finest detail first
     a = np.array(x, dtype=float)
-    details = []
+    approx, details = [], []
     h = 1/math.sqrt(2)
     for _ in range(levels):
         if len(a) % 2 == 1:
@@ -66,25 +71,31 @@ def dwt_haar(x, levels=4):
         a_next = (a[0::2]*h + a[1::2]*h)
         d_next = (a[0::2]*h - a[1::2]*h)
         details.append(d_next)
+        approx.append(a_next)
         a = a_next
-    return [a] + details  # [A_L, D_L, D_{L-1}, ..., D1]
+    return approx, details
+
+@timed("dwt_haar")
+def dwt_haar(x, levels=4):
+    approx, details = _haar_steps(x, levels)
+    return approx[-1:] + details  # [A_L, D_L, D_{L-1}, ..., D1]
+
+def _band_stat(name, b, phi):
+    b = np.asarray(b, dtype=float) * phi
+    return {
+        "band": name,
+        "mean": float(np.mean(b)),
+        "std": float(np.std(b) + 1e-15),
+        "entropy": shannon_entropy(b, bins=64)
+    }
 
+@timed("compute_band_stats")
 def compute_band_stats(bands, phi=1.61803398875):
     names = ["A_L"] + [f"D_{i}" for i in range(len(bands)-1,0,-1)]
-    stats = []
-    for name, b in zip(names, bands):
-        b = np.asarray(b, dtype=float) * phi
-        stats.append({
-            "band": name,
-            "mean": float(np.mean(b)),
-            "std": float(np.std(b) + 1e-15),
-            "entropy": shannon_entropy(b, bins=64)
-        })
-    return stats
+    return [_band_stat(name, b, phi) for name, b in zip(names, bands)]
 
 # ---------- HFP assembly ----------
-
-def assemble_hfp(seed_phrase, levels=5, seed_harmonics=(3,6,9,27,54,111,216), phi=1.61803398875, carrier_gain=0.30, n=8192):
+def _blend(seed_phrase, seed_harmonics, phi, carrier_gain, n):
     sp_hash = hashlib.sha256(seed_phrase.encode()).digest()
     x0 = struct.unpack(">I", sp_hash[:4])[0] / 2**32
     chaos = logistic_map(n, r=3.99, x0=0.2 + 0.6*x0, burn=2048)
@@ -94,11 +105,9 @@ def assemble_hfp(seed_phrase, levels=5, seed_harmonics=(3,6,9,27,54,111,216), ph
     carriers = harmonic_comb(n, [float(f) for f in seed_harmonics], fs=1.0, phi=phi, phase_seed=phase_seed)
 
     blend = chaos + carrier_gain*carriers
-    blend = (blend - np.mean(blend)) / (np.std(blend) + 1e-12)
-
-    bands = dwt_haar(blend, levels=levels)
-    stats = compute_band_stats(bands, phi=phi)
+    return (blend - np.mean(blend)) / (np.std(blend) + 1e-12)
 
+def _hfp_record(levels, stats, seed_harmonics, phi, carrier_gain, timestamp=None):
     # Build a stable core without timestamp or fingerprint
     record_core = {
         "version": "HFP-0.1",
@@ -112,21 +121,54 @@ def assemble_hfp(seed_phrase, levels=5, seed_harmonics=(3,6,9,27,54,111,216), ph
     }
 
     # Canonical JSON for deterministic hashing
-    s_core = json.dumps(record_core, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
-    fingerprint = hashlib.sha512(s_core).hexdigest()
+    with stage("sha512_fingerprint"):
+        s_core = json.dumps(record_core, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+        fingerprint = hashlib.sha512(s_core).hexdigest()
 
     # Add runtime fields after the hash is fixed
     record = dict(record_core)
-    record["timestamp"] = time.time()
+    record["timestamp"] = time.time() if timestamp is None else timestamp
     record["fingerprint_hash"] = fingerprint
     return record
 
+def assemble_hfp(seed_phrase, levels=5, seed_harmonics=(3,6,9,27,54,111,216), phi=1.61803398875, carrier_gain=0.30, n=8192):
+    blend = _blend(seed_phrase, seed_harmonics, phi, carrier_gain, n)
+    bands = dwt_haar(blend, levels=levels)
+    stats = compute_band_stats(bands, phi=phi)
+    return _hfp_record(levels, stats, seed_harmonics, phi, carrier_gain)
+
+def assemble_hfp_bundle(seed_phrase, levels_set=range(1, 11), seed_harmonics=(3,6,9,27,54,111,216), phi=1.61803398875, carrier_gain=0.30, n=8192):
+    """
+    {levels: assemble_hfp record} for several level counts from one pipeline run. D(k) does not
+    depend on the total level count, so one max(levels_set)-level decomposition gives every
+    detail band and every A_L; each band's stats are computed once and only the labels differ
+    per level count. Fingerprints are identical to standalone assemble_hfp calls.
+    """
+    levels_set = sorted({int(l) for l in levels_set})
+    if not levels_set or levels_set[0] < 1:
+        raise ValueError("levels_set must contain level counts >= 1")
+    blend = _blend(seed_phrase, seed_harmonics, phi, carrier_gain, n)
+    with stage("dwt_haar"):
+        approx, details = _haar_steps(blend, levels_set[-1])
+    with stage("compute_band_stats"):
+        d_stats = [_band_stat(None, d, phi) for d in details]
+        a_stats = {L: _band_stat("A_L", approx[L-1], phi) for L in levels_set}
+    ts = time.time()
+    out = {}
+    for L in levels_set:
+        # compute_band_stats labels the k-th finest detail of an L-level transform D_{L-k}
+        stats = [a_stats[L]] + [dict(d_stats[k], band=f"D_{L-k}") for k in range(L)]
+        out[L] = _hfp_record(L, stats, seed_harmonics, phi, carrier_gain, timestamp=ts)
+    return out
+
+@timed("kdf_argon2id")
 def derive_key_argon2id(password: bytes, hfp_hash_hex: str, key_len=32, time_cost=None, memory_cost_kib=None, parallelism=None):
     if not globals().get("HAVE_ARGON2", False):
         raise RuntimeError("argon2-cffi not installed")
     if time_cost is None: time_cost = _env_int("ARGON2_TIME_COST", 2)
     if memory_cost_kib is None: memory_cost_kib = _env_int("ARGON2_MEMORY_KIB", 65536)
     if parallelism is None: parallelism = _env_int("ARGON2_PARALLELISM", 1)
+    from argon2.low_level import hash_secret_raw, Type
     salt = bytes.fromhex(hfp_hash_hex[:32])
     return hash_secret_raw(
         secret=password,
@@ -139,12 +181,14 @@ def derive_key_argon2id(password: bytes, hfp_hash_hex: str, key_len=32, time_cos
     )
 
 
+@timed("kdf_hkdf")
 def derive_key_from_hfp(password: bytes, hfp_hash_hex: str, key_len=32):
     salt = bytes.fromhex(hfp_hash_hex[:32])  # 16 bytes from HFP hash prefix
     prk = hkdf_extract(salt, password)
     okm = hkdf_expand(prk, b"QLX-HFP-KDF", key_len)
     return okm
 
+@timed("kdf_scrypt")
 def derive_key_scrypt(password: bytes, hfp_hash_hex: str, key_len=32, n=(1<<15), r=8, p=1):
     """
     Derive a key using standard-library scrypt.
@@ -156,6 +200,7 @@ def derive_key_scrypt(password: bytes, hfp_hash_hex: str, key_len=32, n=(1<<15),
     return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, dklen=key_len)
 
 
+@timed("kdf_scrypt")
 def derive_key_scrypt(password: bytes, hfp_hash_hex: str, key_len=32, n=None, r=None, p=None, maxmem=None):
     """
     Scrypt KDF with safe defaults and OpenSSL maxmem guard.
@@ -0,0 +1,225 @@
+import os, json, hmac, hashlib, datetime
+from qlx_photonic_control import canonical_json, signed_message, merkle_sign
+from qlx_metrics import stage
+
+HMAC_ALGS = ("HMAC-SHA256","HMAC_SHA256","HMAC")
+
+def _now():
+    return datetime.datetime.now(datetime.UTC).replace(microsecond=0).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+# ---------- keys ----------
+class HMACKey:
+    alg = "HMAC-SHA256"
+
+    def __init__(self, key_id, key: bytes):
+        self.key_id = key_id
+        self._base = hmac.new(key, digestmod=hashlib.sha256)  # pre-keyed, copied per message
+        self.can_sign = True
+
+    def sign(self, msg: bytes) -> str:
+        h = self._base.copy(); h.update(msg)
+        return h.hexdigest()
+
+    def verify(self, msg: bytes, sig_hex: str) -> bool:
+        return hmac.compare_digest(self.sign(msg), sig_hex)
+
+class Ed25519Key:
+    alg = "Ed25519"
+
+    def __init__(self, key_id, priv_hex=None, pub_hex=None):
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+        if not priv_hex and not pub_hex:
+            raise ValueError(f"key {key_id!r}: need priv_hex or pub_hex")
+        self.key_id = key_id
+        self._priv = Ed25519PrivateKey.from_private_bytes(bytes.fromhex(priv_hex)) if priv_hex else None
+        self._pub = self._priv.public_key() if self._priv else Ed25519PublicKey.from_public_bytes(bytes.fromhex(pub_hex))
+        self.can_sign = self._priv is not None
+
+    def sign(self, msg: bytes) -> str:
+        if self._priv is None:
+            raise ValueError(f"key {self.key_id!r} is verify-only")
+        return self._priv.sign(msg).hex()
+
+    def verify(self, msg: bytes, sig_hex: str) -> bool:
+        from cryptography.exceptions import InvalidSignature
+        try:
+            self._pub.verify(bytes.fromhex(sig_hex), msg)
+            return True
+        except (InvalidSignature, ValueError):
+            return False
+
+    def public_hex(self) -> str:
+        from cryptography.hazmat.primitives import serialization
+        return self._pub.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw).hex()
+
+# ---------- keyring ----------
+class Keyring:
+    """
+    Parsed signing and verification keys indexed by key_id.
+
+    Keys are parsed once when added. Several keys may be active for signing at once
+    during rotation; the first active key is the default signer. Retired keys stay
+    available for verification. Entries named "*ed25519" / "*hmac" verify any key_id
+    that has no key of its own.
+    """
+
+    def __init__(self):
+        self._keys = {}
+        self._active = []
+        self.legacy = False  # built from single SIGN_ALG/ED25519_PRIV_HEX/SIGNING_KEY secrets
+        self._roots = set()  # (key_id, message, sig) of merkle roots that verified
+
+    def __contains__(self, key_id):
+        return key_id in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add_hmac(self, key_id, key: bytes, active=True):
+        return self._add(HMACKey(key_id, key), active)
+
+    def add_ed25519(self, key_id, priv_hex=None, pub_hex=None, active=True):
+        return self._add(Ed25519Key(key_id, priv_hex=priv_hex, pub_hex=pub_hex), active)
+
+    def _add(self, k, active):
+        self._keys[k.key_id] = k
+        if active and k.can_sign and k.key_id not in self._active and not k.key_id.startswith("*"):
+            self._active.append(k.key_id)
+        return k
+
+    def retire(self, key_id):
+        if key_id in self._active:
+            self._active.remove(key_id)
+
+    def remove(self, key_id):
+        self.retire(key_id)
+        self._keys.pop(key_id, None)
+
+    @property
+    def active(self):
+        return list(self._active)
+
+    def get(self, key_id, alg=None):
+        """Key for key_id, falling back to the wildcard entry for alg."""
+        k = self._keys.get(key_id)
+        if k is not None and (alg is None or _alg_name(k.alg) == alg):
+            return k
+        return self._keys.get("*" + alg) if alg else None
+
+    # ---------- envelopes ----------
+    def _signer(self, key_id):
+        if key_id is None:
+            if not self._active:
+                raise KeyError("keyring has no active signing key")
+            key_id = self._active[0]
+        k = self._keys.get(key_id)
+        if k is None:
+            raise KeyError(f"unknown key_id {key_id!r}")
+        return key_id, k
+
+    def sign(self, envelope, key_id=None, label=None):
+        """Sign envelope with key_id (default: primary active key). label overrides signing.key_id."""
+        key_id, k = self._signer(key_id)
+        with stage(f"sign_{_alg_name(k.alg)}"):
+            sig = k.sign(canonical_json(envelope))
+        envelope = dict(envelope)
+        envelope["signing"] = {
+            "alg": k.alg, "key_id": label or key_id, "nonce": "",
+            "timestamp": _now(), "sig": sig
+        }
+        return envelope
+
+    def sign_batch(self, envelopes, key_id=None, label=None):
+        """Sign a batch with one signature over its merkle root; each envelope gets its proof in signing.merkle."""
+        key_id, k = self._signer(key_id)
+        with stage(f"sign_batch_{_alg_name(k.alg)}"):
+            return merkle_sign(envelopes, k.sign, k.alg, label or key_id)
+
+    def check(self, envelope):
+        """(True|False|None, error) for an envelope's signature; None means no key to check with."""
+        signing = envelope.get("signing", {}) or {}
+        alg = _alg_name(signing.get("alg", ""))
+        key_id = signing.get("key_id", "")
+        if alg is None:
+            return None, "unknown or missing signing.alg; signature check skipped"
+        k = self.get(key_id, alg)
+        if k is None:
+            return None, f"no {signing.get('alg')} key for key_id {key_id!r}; signature check skipped"
+        sig_hex = signing.get("sig", "")
+        if not sig_hex:
+            return False, "missing signature"
+        msg, err = signed_message(envelope)
+        if msg is None:
+            return False, err
+        if "merkle" not in signing:
+            ok = k.verify(msg, sig_hex)
+        else:
+            # every envelope of a batch carries the same root signature: verify it once
+            seen = (k.key_id, msg, sig_hex)
+            ok = seen in self._roots or k.verify(msg, sig_hex)
+            if ok:
+                if len(self._roots) >= 4096: self._roots.clear()
+                self._roots.add(seen)
+        if ok:
+            return True, None
+        return False, f"{k.alg} signature mismatch"
+
+    def verify(self, envelope) -> bool:
+        return self.check(envelope)[0] is True
+
+    # ---------- loading ----------
+    @classmethod
+    def from_dict(cls, spec):
+        """
+        {"active": [...], "keys": {"<key_id>": {"alg": "hmac", "key_hex"|"key": ...} |
+                                   {"alg": "ed25519", "priv_hex"|"pub_hex": ...}}}
+        A bare {"<key_id>": {...}} mapping is accepted too; every signing-capable key is then active.
+        """
+        keys = spec.get("keys", spec) if isinstance(spec.get("keys"), dict) else spec
+        active = spec.get("active") if "keys" in spec else None
+        kr = cls()
+        for key_id, k in keys.items():
+            if key_id == "active":
+                continue
+            on = True if active is None else key_id in active
+            alg = (k.get("alg") or "").lower()
+            if alg == "ed25519":
+                kr.add_ed25519(key_id, priv_hex=k.get("priv_hex"), pub_hex=k.get("pub_hex"), active=on)
+            elif alg in ("hmac", "hmac-sha256"):
+                raw = bytes.fromhex(k["key_hex"]) if "key_hex" in k else k["key"].encode()
+                kr.add_hmac(key_id, raw, active=on)
+            else:
+                raise ValueError(f"key {key_id!r}: unsupported alg {k.get('alg')!r}")
+        if active:
+            # keep the configured order so active[0] is the primary signer
+            kr._active = [a for a in active if a in kr._active]
+        return kr
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """QLX_KEYRING (JSON file) if set, else the single-key SIGN_ALG secrets."""
+        environ = os.environ if environ is None else environ
+        path = environ.get("QLX_KEYRING", "")
+        if path:
+            return cls.from_file(path)
+        kr = cls(); kr.legacy = True
+        alg = environ.get("SIGN_ALG", "hmac").lower()
+        key_id = environ.get("SIGN_KEY_ID", "ctrl-ed25519" if alg == "ed25519" else "ctrl-01")
+        if alg == "ed25519":
+            priv_hex = environ.get("ED25519_PRIV_HEX", "")
+            if priv_hex:
+                kr.add_ed25519(key_id, priv_hex=priv_hex)
+        else:
+            kr.add_hmac(key_id, environ.get("SIGNING_KEY", "test-key").encode())
+        return kr
+
+def _alg_name(alg):
+    a = (alg or "").upper()
+    if a == "ED25519": return "ed25519"
+    if a in HMAC_ALGS: return "hmac"
+    return None
@@ -0,0 +1,295 @@
+import json, time, uuid, struct, asyncio, collections
+from qlx_photonic_control import canonical_json
+
+# Persistent controller link: signed envelopes pipelined over one TCP connection per device.
+#
+# Frames are a 4-byte big-endian length followed by canonical JSON.
+#   client -> controller  {"t": "hello", "link_id": ..., "acked": n}     first frame of every connection
+#   controller -> client  {"t": "welcome", "last_seq": s}                then replays acks for seq in (n, s]
+#   client -> controller  {"t": "env", "seq": k, "env": {...}}           k = 1, 2, ... per link_id
+#   controller -> client  {"t": "ack", "seq": k, "ok": bool, "session_id": ..., "error"?, "dup"?}
+# The controller handles frames in seq order; at most `window` envelopes are unacknowledged.
+# After a dropped connection the client reconnects with the same link_id, gets the acks it
+# missed, and resends only seq > last_seq. Envelopes are also deduplicated by session_id, so a
+# resend under a new link_id (e.g. a restarted pusher) is acknowledged without applying twice.
+
+MAX_FRAME = 4 << 20
+ACK_HISTORY = 4096  # acks a controller keeps per link for resume; bounds the client window
+
+class LinkError(Exception):
+    pass
+
+def encode_frame(msg) -> bytes:
+    body = canonical_json(msg)
+    return struct.pack(">I", len(body)) + body
+
+async def read_frame(reader):
+    head = await reader.readexactly(4)
+    (n,) = struct.unpack(">I", head)
+    if n > MAX_FRAME:
+        raise LinkError(f"frame of {n} bytes exceeds {MAX_FRAME}")
+    return json.loads(await reader.readexactly(n))
+
+# ---------- stand-in controller ----------
+class StandInController:
+    """
+    Local controller for tests and benchmarks: verifies each envelope (fields, ranges and,
+    with a keyring, the signature) and applies it. Delta envelopes apply on top of the
+    current full envelope. One instance is one device.
+    """
+
+    def __init__(self, keyring=None, require_sig=False, apply_delay_s=0.0, session_history=65536):
+        self.keyring, self.require_sig, self.apply_delay_s = keyring, require_sig, apply_delay_s
+        self.current = None
+        self.applied = self.rejected = self.duplicates = 0
+        self.links = {}                            # link_id -> {"last_seq", "acks"}
+        self.sessions = collections.OrderedDict()  # session_id -> ack fields, most recent last
+        self.session_history = session_history
+        self._writers = set()
+        self._tasks = set()
+        self.server = None
+
+    def apply(self, env):
+        """Verify and apply one envelope; returns {"ok": True} or {"ok": False, "error": ...}."""
+        from qlx_validate import check_envelope
+        from qlx_delta import is_delta, apply_delta
+        try:
+            if self.keyring is not None:
+                ok, err = self.keyring.check(env)
+                if ok is False or (ok is None and self.require_sig):
+                    return {"ok": False, "error": f"sign: {err}"}
+            if is_delta(env):
+                if self.current is None:
+                    return {"ok": False, "error": "delta with no base envelope applied"}
+                env = apply_delta(self.current, env, verify=False)  # signature checked above; base when applied
+            rep = check_envelope(env, schema=False)
+            if not rep["ok"]:
+                return {"ok": False, "error": "; ".join(rep["errors"])}
+        except (ValueError, KeyError, TypeError) as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.current = env
+        return {"ok": True}
+
+    def _handle(self, link, seq, env):
+        sid = env.get("session_id") if isinstance(env, dict) else None
+        if sid in self.sessions:
+            self.duplicates += 1
+            res = dict(self.sessions[sid], dup=True)
+        else:
+            res = self.apply(env) if isinstance(env, dict) else {"ok": False, "error": "envelope is not an object"}
+            self.applied += res["ok"]; self.rejected += not res["ok"]
+            if sid is not None:
+                self.sessions[sid] = res
+                if len(self.sessions) > self.session_history:
+                    self.sessions.popitem(last=False)
+        ack = {"t": "ack", "seq": seq, "session_id": sid, **res}
+        link["last_seq"] = seq
+        link["acks"].append(ack)
+        return ack
+
+    async def _conn(self, reader, writer):
+        self._writers.add(writer)
+        self._tasks.add(asyncio.current_task())
+        try:
+            hello = await read_frame(reader)
+            if hello.get("t") != "hello":
+                raise LinkError("expected hello")
+            link = self.links.setdefault(hello["link_id"], {"last_seq": 0, "acks": collections.deque(maxlen=ACK_HISTORY)})
+            acked = int(hello.get("acked", 0))
+            writer.write(encode_frame({"t": "welcome", "last_seq": link["last_seq"]}))
+            for ack in link["acks"]:
+                if ack["seq"] > acked:
+                    writer.write(encode_frame(ack))
+            await writer.drain()
+            while True:
+                msg = await read_frame(reader)
+                if msg.get("t") != "env":
+                    raise LinkError(f"unexpected frame {msg.get('t')!r}")
+                seq = int(msg["seq"])
+                if seq <= link["last_seq"]:
+                    continue  # already handled and acked (or replayed in the welcome)
+                if seq != link["last_seq"] + 1:
+                    raise LinkError(f"seq {seq} after {link['last_seq']}")
+                if self.apply_delay_s:
+                    await asyncio.sleep(self.apply_delay_s)
+                writer.write(encode_frame(self._handle(link, seq, msg.get("env"))))
+                if writer.transport.get_write_buffer_size() > 1 << 16:
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, LinkError, ValueError, KeyError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._tasks.discard(asyncio.current_task())
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=0):
+        self.server = await asyncio.start_server(self._conn, host, port)
+        return self.server
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    def kick(self):
+        """Drop every open connection (simulates a network fault)."""
+        for w in list(self._writers):
+            w.transport.abort()
+
+    async def close(self):
+        self.kick()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def stats(self):
+        return {"applied": self.applied, "rejected": self.rejected, "duplicates": self.duplicates,
+                "links": len(self.links), "connections": len(self._writers),
+                "current_session_id": (self.current or {}).get("session_id")}
+
+# ---------- client ----------
+class ControllerLink:
+    """
+    One persistent, pipelined connection to a controller. send() returns a future for the
+    envelope's ack once a window slot is free; lost connections are re-established and
+    unacknowledged envelopes resent, in order, without caller involvement.
+    """
+
+    def __init__(self, host, port, link_id=None, window=64, retry_s=(0.05, 2.0), max_retries=20):
+        if not 1 <= window <= ACK_HISTORY:
+            raise ValueError(f"window must be in [1, {ACK_HISTORY}]")
+        self.host, self.port = host, port
+        self.link_id = link_id or str(uuid.uuid4())
+        self.window, self.retry_s, self.max_retries = window, retry_s, max_retries
+        self.seq = self.acked = 0
+        self.pending = collections.OrderedDict()  # seq -> (frame bytes, future, sent_at)
+        self.latencies = []                       # seconds from send() to ack
+        self.reconnects = self.resent = 0
+        self._slots = asyncio.Semaphore(window)
+        self._up = asyncio.Event()
+        self._writer = self._reader_task = None
+        self._closing = False
+        self._error = None
+
+    async def connect(self):
+        await self._open()
+        return self
+
+    async def _open(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write(encode_frame({"t": "hello", "link_id": self.link_id, "acked": self.acked}))
+        await writer.drain()
+        welcome = await read_frame(reader)
+        if welcome.get("t") != "welcome":
+            writer.close()
+            raise LinkError("expected welcome")
+        last = int(welcome["last_seq"])
+        # acks for seq <= last follow the welcome; resend what the controller never got
+        for seq, (frame, _, _) in self.pending.items():
+            if seq > last:
+                writer.write(frame); self.resent += 1
+        await writer.drain()
+        self._writer = writer
+        self._reader_task = asyncio.ensure_future(self._read_acks(reader))
+        self._up.set()
+
+    async def _read_acks(self, reader):
+        try:
+            while True:
+                ack = await read_frame(reader)
+                entry = self.pending.pop(ack.get("seq"), None)
+                if entry is None:
+                    continue
+                _, fut, t0 = entry
+                self.acked = max(self.acked, ack["seq"])
+                self.latencies.append(time.perf_counter() - t0)
+                self._slots.release()
+                if not fut.done():
+                    fut.set_result(ack)
+        except (asyncio.IncompleteReadError, ConnectionError, LinkError, ValueError):
+            pass
+        if not self._closing:
+            self._up.clear()
+            asyncio.ensure_future(self._reconnect())
+
+    async def _reconnect(self):
+        delay = self.retry_s[0]
+        for _ in range(self.max_retries):
+            self.reconnects += 1
+            try:
+                await self._open()
+                return
+            except (OSError, LinkError, asyncio.IncompleteReadError):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.retry_s[1])
+        self._error = LinkError(f"{self.host}:{self.port}: gave up after {self.max_retries} reconnects")
+        # fail what is in flight and hand its window slots back, so no sender stays blocked in acquire()
+        pending, self.pending = self.pending, collections.OrderedDict()
+        for _, fut, _ in pending.values():
+            if not fut.done():
+                fut.set_exception(self._error)
+            self._slots.release()
+        self._up.set()  # wake senders so they see the error
+
+    async def send(self, env):
+        """Queue one envelope; returns a future resolving to its ack dict. Raises LinkError once the link gave up."""
+        if self._error is not None:
+            raise self._error
+        await self._slots.acquire()
+        await self._up.wait()
+        if self._error is not None:
+            self._slots.release()
+            raise self._error
+        self.seq += 1
+        frame = encode_frame({"t": "env", "seq": self.seq, "env": env})
+        fut = asyncio.get_running_loop().create_future()
+        self.pending[self.seq] = (frame, fut, time.perf_counter())
+        self._writer.write(frame)
+        if self._writer.transport.get_write_buffer_size() > 1 << 16:
+            try:
+                await self._writer.drain()
+            except ConnectionError:
+                pass  # the ack reader reconnects and resends
+        return fut
+
+    async def push(self, envelopes):
+        """Send envelopes in order and wait for all acks; raises LinkError if the controller stays unreachable."""
+        futs = []
+        try:
+            for e in envelopes:
+                futs.append(await self.send(e))
+        except LinkError:
+            for f in futs:
+                if f.done() and not f.cancelled():
+                    f.exception()  # already failed with the same error; mark it retrieved
+            raise
+        return await asyncio.gather(*futs)
+
+    async def close(self):
+        if self.pending:
+            await asyncio.gather(*[f for _, f, _ in self.pending.values()], return_exceptions=True)
+        self._closing = True
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+
+    def stats(self):
+        lat = sorted(self.latencies)
+        pick = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))] * 1e3, 3) if lat else None
+        return {"link_id": self.link_id, "sent": self.seq, "acked": self.acked, "in_flight": len(self.pending),
+                "reconnects": self.reconnects, "resent": self.resent, "p50_ms": pick(0.5), "p99_ms": pick(0.99)}
+
+async def push_fleet(targets, window=64):
+    """
+    targets: {(host, port): [envelopes]}. One link per controller, all pushed concurrently.
+    Returns {(host, port): (acks, link stats)}.
+    """
+    async def one(addr, envs):
+        link = await ControllerLink(*addr, window=window).connect()
+        try:
+            return addr, (await link.push(envs), link.stats())
+        finally:
+            await link.close()
+    return dict(await asyncio.gather(*[one(a, e) for a, e in targets.items()]))
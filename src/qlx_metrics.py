@@ -0,0 +1,191 @@
+import os, time, bisect, threading, contextvars, functools
+
+# Low-overhead stage timers published as Prometheus text. Stdlib only, so the
+# kernels can import it even in numpy-only environments.
+
+ENABLED = os.environ.get("QLX_METRICS", "1") != "0"
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# ASGI scope of the request being served; its route label is read when an observation is made
+_request_scope = contextvars.ContextVar("qlx_request_scope", default=None)
+# when set to a list, observations are captured there instead of recorded (pool workers)
+_capture = contextvars.ContextVar("qlx_capture", default=None)
+_listeners = []
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v):
+        self.counts[bisect.bisect_left(BUCKETS, v)] += 1
+        self.sum += v
+        self.count += 1
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hist = {}      # (metric, labels tuple) -> Histogram
+        self._help = {}
+        self._gauges = {}    # metric -> callable returning {labels tuple: value}
+
+    def observe(self, metric, labels, seconds):
+        key = (metric, labels)
+        with self._lock:
+            h = self._hist.get(key)
+            if h is None:
+                h = self._hist[key] = Histogram()
+            h.observe(seconds)
+
+    def describe(self, metric, text):
+        self._help[metric] = text
+
+    def gauge(self, metric, fn, text=""):
+        """Register a callable evaluated at scrape time; returns {((label, value), ...): number}."""
+        self._gauges[metric] = fn
+        if text: self._help[metric] = text
+
+    def reset(self):
+        with self._lock:
+            self._hist.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {k: (list(h.counts), h.sum, h.count) for k, h in self._hist.items()}
+
+    def render(self) -> str:
+        lines, seen = [], set()
+        for (metric, labels), (counts, total, n) in sorted(self.snapshot().items()):
+            if metric not in seen:
+                seen.add(metric)
+                if metric in self._help:
+                    lines.append(f"# HELP {metric} {self._help[metric]}")
+                lines.append(f"# TYPE {metric} histogram")
+            lab = ",".join(f'{k}="{_esc(v)}"' for k, v in labels)
+            sep = "," if lab else ""
+            acc = 0
+            for bound, c in zip(BUCKETS, counts):
+                acc += c
+                lines.append(f'{metric}_bucket{{{lab}{sep}le="{bound}"}} {acc}')
+            lines.append(f'{metric}_bucket{{{lab}{sep}le="+Inf"}} {n}')
+            tail = f"{{{lab}}}" if lab else ""
+            lines.append(f"{metric}_sum{tail} {total:.9f}")
+            lines.append(f"{metric}_count{tail} {n}")
+        for metric, fn in sorted(self._gauges.items()):
+            if metric in self._help:
+                lines.append(f"# HELP {metric} {self._help[metric]}")
+            lines.append(f"# TYPE {metric} gauge")
+            for labels, v in sorted(fn().items()):
+                lab = ",".join(f'{k}="{_esc(val)}"' for k, val in labels)
+                lines.append(f"{metric}{{{lab}}} {v}" if lab else f"{metric} {v}")
+        return "\n".join(lines) + "\n"
+
+def _esc(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REGISTRY = Registry()
+REGISTRY.describe("qlx_stage_seconds", "Time spent in each HFP/envelope/STS pipeline stage")
+REGISTRY.describe("qlx_http_request_seconds", "HTTP request latency by route, method and status")
+
+# ---------- recording ----------
+def route_label():
+    """
+    Route template of the current request ("/sts/jobs/{job_id}", never the raw path), so the
+    label set stays bounded; "unmatched" before routing or for 404s, "none" outside a request.
+    """
+    scope = _request_scope.get()
+    if scope is None:
+        return "none"
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+def observe_stage(name, seconds):
+    cap = _capture.get()
+    if cap is not None:
+        cap.append((name, seconds))
+    else:
+        REGISTRY.observe("qlx_stage_seconds", (("stage", name), ("route", route_label())), seconds)
+    for fn in _listeners:
+        fn(name, seconds)
+
+def merge_stages(observations, route=None):
+    """Record stage observations captured in another process."""
+    route = route or route_label()
+    for name, seconds in observations:
+        REGISTRY.observe("qlx_stage_seconds", (("stage", name), ("route", route)), seconds)
+
+def add_listener(fn):
+    """fn(stage_name, seconds) is called after every stage; used by the profiler."""
+    _listeners.append(fn)
+
+def remove_listener(fn):
+    if fn in _listeners: _listeners.remove(fn)
+
+class stage:
+    """Context manager timing one pipeline stage: `with stage("sha512_fingerprint"): ...`"""
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if ENABLED:
+            observe_stage(self.name, time.perf_counter() - self.t0)
+        return False
+
+def timed(name):
+    """Decorator form of stage()."""
+    def deco(fn):
+        if not ENABLED:
+            return fn
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe_stage(name, time.perf_counter() - t0)
+        return wrapper
+    return deco
+
+def call_captured(fn, args, kwargs):
+    """Run fn capturing its stage observations; returns (result, observations). Picklable for pools."""
+    cap = []
+    token = _capture.set(cap)
+    try:
+        return fn(*args, **kwargs), cap
+    finally:
+        _capture.reset(token)
+
+# ---------- ASGI ----------
+class MetricsMiddleware:
+    """Pure ASGI middleware: sets the route label and records request latency."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            return await self.app(scope, receive, send)
+        status = [500]
+        async def send_wrapped(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+        # the router adds scope["route"] once it matches, so labels are resolved lazily from the scope
+        token = _request_scope.set(scope)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapped)
+        finally:
+            REGISTRY.observe("qlx_http_request_seconds",
+                             (("route", route_label()), ("method", scope.get("method", "")), ("status", str(status[0]))),
+                             time.perf_counter() - t0)
+            _request_scope.reset(token)
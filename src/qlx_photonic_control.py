@@ -1,13 +1,13 @@
-import json, math, hashlib, hmac, uuid, datetime
-from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
-from cryptography.hazmat.primitives import serialization
+import json, math, hashlib, hmac, uuid, datetime, functools
 import numpy as np
+from qlx_metrics import timed
 
 def _normalize01(x):
     x = np.asarray(x, dtype=float)
     mn, mx = x.min(), x.max()
     return (x - mn) / (mx - mn + 1e-15)
 
+@timed("photonic_map")
 def photonic_map(band_stats):
     import numpy as np, math
     means = np.array([b["mean"] for b in band_stats])
@@ -50,6 +50,7 @@ def photonic_map(band_stats):
         "alpha":     alpha.tolist()
     }
 
+@timed("quantize")
 def _quantize(arr, lo, hi, bits, mode="nearest"):
     import numpy as np
     arr = np.asarray(arr, dtype=float)
@@ -68,28 +69,44 @@ def _quantize(arr, lo, hi, bits, mode="nearest"):
         xi = np.floor(x) + (rnd < frac)
     else:
         raise ValueError("quantization mode")
-    # map back and clip to OPEN interval by one LSB
-    y = (xi / levels) * (hi - lo) + lo
+    return _codes_to_values(xi, lo, hi, bits)
+
+def _codes_to_values(codes, lo, hi, bits):
+    # map DAC codes back and clip to OPEN interval by one LSB
+    levels = (1 << bits) - 1
+    y = (np.asarray(codes) / levels) * (hi - lo) + lo
     eps = (hi - lo) / levels
-    y = np.clip(y, lo + eps, hi - eps)
-    return y
+    return np.clip(y, lo + eps, hi - eps)
 
+# envelope parameter order and closed ranges used by make_envelope
+PARAM_RANGES = {
+    "I_bias_mA":   (15.0, 50.0),
+    "phi_rad":     (0.0, math.pi),
+    "kappa":       (0.05, 0.9),
+    "tau_ps":      (50.0, 300.0),
+    "delta_f_GHz": (-10.0, 10.0),
+    "alpha":       (2.0, 6.0),
+}
+
+def envelope_codes(env, params=None):
+    """DAC codes of an envelope's params, one per (param, band), param-major."""
+    params = list(params or PARAM_RANGES)
+    levels = (1 << int(env["dac"]["width_bits"])) - 1
+    out = []
+    for k in params:
+        lo, hi = PARAM_RANGES[k]
+        v = np.asarray(env["params"][k], dtype=float)
+        out.append(np.clip(np.rint((v - lo) / (hi - lo) * levels), 0, levels))
+    return np.concatenate(out).astype(np.int64)
 
 def make_envelope(hfp, photonic_params, dac_bits=14, sample_rate_GSa=64,
                   quant_mode="nearest", mode="static", ramp_ms=10, hold_ms=2000, ttl_ms=10000):
-    keys = ["I_bias_mA","phi_rad","kappa","tau_ps","delta_f_GHz","alpha"]
-    Ls = [len(photonic_params[k]) for k in keys]
+    Ls = [len(photonic_params[k]) for k in PARAM_RANGES]
     if len(set(Ls)) != 1:
         raise ValueError(f"photonic_params arrays must have equal length, got lengths={Ls}")
     L = Ls[0]
-    qp = {
-        "I_bias_mA":  _quantize(photonic_params["I_bias_mA"], 15.0, 50.0, dac_bits, quant_mode).tolist(),
-        "phi_rad":    _quantize(photonic_params["phi_rad"], 0.0, math.pi, dac_bits, quant_mode).tolist(),
-        "kappa":      _quantize(photonic_params["kappa"], 0.05, 0.9, dac_bits, quant_mode).tolist(),
-        "tau_ps":     _quantize(photonic_params["tau_ps"], 50.0, 300.0, dac_bits, quant_mode).tolist(),
-        "delta_f_GHz":_quantize(photonic_params["delta_f_GHz"], -10.0, 10.0, dac_bits, quant_mode).tolist(),
-        "alpha":      _quantize(photonic_params["alpha"], 2.0, 6.0, dac_bits, quant_mode).tolist()
-    }
+    qp = {k: _quantize(photonic_params[k], lo, hi, dac_bits, quant_mode).tolist()
+          for k, (lo, hi) in PARAM_RANGES.items()}
     env = {
         "version": "P-0.2",
         "session_id": str(uuid.uuid4()),
@@ -108,6 +125,7 @@ def make_envelope(hfp, photonic_params, dac_bits=14, sample_rate_GSa=64,
 def canonical_json(obj) -> bytes:
     return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
 
+@timed("sign_hmac")
 def sign_envelope_hmac(envelope, key: bytes, key_id="ctrl-01"):
     msg = canonical_json(envelope)
     sig = hmac.new(key, msg, hashlib.sha256).hexdigest()
@@ -118,25 +136,132 @@ def sign_envelope_hmac(envelope, key: bytes, key_id="ctrl-01"):
     }
     return envelope
 
+def _one_key_ring(key_id, priv_hex):
+    # private keys live only in a Keyring the caller owns; nothing module-level keeps them
+    from qlx_keyring import Keyring  # lazy: qlx_keyring imports this module
+    kr = Keyring()
+    kr.add_ed25519(key_id, priv_hex=priv_hex)
+    return kr
+
+@functools.lru_cache(maxsize=256)
+def _ed25519_public(pub_hex: str):
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+    return Ed25519PublicKey.from_public_bytes(bytes.fromhex(pub_hex))
+
 def sign_envelope_ed25519(envelope, priv_hex: str, key_id="ctrl-ed25519"):
-    msg = canonical_json(envelope)
-    priv = Ed25519PrivateKey.from_private_bytes(bytes.fromhex(priv_hex))
-    sig = priv.sign(msg).hex()
-    envelope = dict(envelope)
-    envelope["signing"] = {
-        "alg": "Ed25519", "key_id": key_id, "nonce": "",
-        "timestamp": datetime.datetime.now(datetime.UTC).replace(microsecond=0).strftime("%Y-%m-%dT%H:%M:%SZ"),
-        "sig": sig
-    }
-    return envelope
+    """One-off signature; the key is parsed per call. Hold a Keyring to sign repeatedly."""
+    return _one_key_ring(key_id, priv_hex).sign(envelope)
 
 def verify_envelope_ed25519(envelope, pub_hex: str) -> bool:
-    env = dict(envelope)
-    signing = env.pop("signing", {})
+    signing = envelope.get("signing", {}) or {}
     sig_hex = signing.get("sig", "")
     if not sig_hex:
         return False
-    msg = canonical_json(env)
-    pub = Ed25519PublicKey.from_public_bytes(bytes.fromhex(pub_hex))
+    msg, err = signed_message(envelope)
+    if msg is None:
+        raise ValueError(err)
+    if "merkle" in signing:
+        return _ed25519_root_ok(pub_hex, msg, sig_hex)
+    pub = _ed25519_public(pub_hex)
     pub.verify(bytes.fromhex(sig_hex), msg)
     return True
+
+@functools.lru_cache(maxsize=1024)
+def _ed25519_root_ok(pub_hex, msg, sig_hex):
+    # one Ed25519 verify per batch root; a bad signature raises and is not cached
+    _ed25519_public(pub_hex).verify(bytes.fromhex(sig_hex), msg)
+    return True
+
+# ---------- merkle batch signing ----------
+# A batch of envelopes is signed once: each canonical envelope (without "signing") is a
+# leaf, leaf = sha256(0x00 || canonical), node = sha256(0x01 || left || right), and an odd
+# node at the end of a level moves up unchanged. The key signs merkle_message(root, count).
+# Each envelope carries signing.merkle = {root, index, count, path}: the sibling hashes
+# from its leaf up to the root.
+
+def merkle_leaf(envelope) -> bytes:
+    bare = {k: v for k, v in envelope.items() if k != "signing"}
+    return hashlib.sha256(b"\x00" + canonical_json(bare)).digest()
+
+def _node(left, right):
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+def merkle_tree(leaves):
+    """(root, paths): the root of the leaf hashes and each leaf's sibling path."""
+    if not leaves:
+        raise ValueError("empty batch")
+    paths = [[] for _ in leaves]
+    level, members = list(leaves), [[i] for i in range(len(leaves))]
+    while len(level) > 1:
+        nxt, nmem = [], []
+        for j in range(0, len(level) - 1, 2):
+            for i in members[j]: paths[i].append(level[j + 1])
+            for i in members[j + 1]: paths[i].append(level[j])
+            nxt.append(_node(level[j], level[j + 1])); nmem.append(members[j] + members[j + 1])
+        if len(level) % 2:
+            nxt.append(level[-1]); nmem.append(members[-1])
+        level, members = nxt, nmem
+    return level[0], paths
+
+def merkle_root_from_path(leaf, index, count, path):
+    """Recompute the root from a leaf and its path; None if the path does not fit (index, count)."""
+    if not 0 <= index < count:
+        return None
+    h, path = leaf, list(path)
+    while count > 1:
+        if index % 2:
+            if not path: return None
+            h = _node(path.pop(0), h)
+        elif index + 1 < count:
+            if not path: return None
+            h = _node(h, path.pop(0))
+        index, count = index // 2, (count + 1) // 2
+    return None if path else h
+
+def merkle_message(root_hex, count) -> bytes:
+    """What the key signs for a batch."""
+    return canonical_json({"alg": "merkle-sha256", "root": root_hex, "count": count})
+
+def signed_message(envelope):
+    """(message, None) that signing.sig covers, or (None, error) if a merkle proof does not check out."""
+    signing = envelope.get("signing", {}) or {}
+    proof = signing.get("merkle")
+    if proof is None:
+        return canonical_json({k: v for k, v in envelope.items() if k != "signing"}), None
+    try:
+        path = [bytes.fromhex(h) for h in proof["path"]]
+        root = merkle_root_from_path(merkle_leaf(envelope), int(proof["index"]), int(proof["count"]), path)
+    except (KeyError, TypeError, ValueError) as e:
+        return None, f"malformed merkle proof: {e}"
+    if root is None or root.hex() != proof.get("root"):
+        return None, "merkle proof does not lead to signing.merkle.root"
+    return merkle_message(proof["root"], int(proof["count"])), None
+
+def merkle_sign(envelopes, sign, alg, key_id):
+    """Sign a batch with one call of sign(message) -> sig hex; returns new envelopes with proofs."""
+    root, paths = merkle_tree([merkle_leaf(e) for e in envelopes])
+    count = len(envelopes)
+    sig = sign(merkle_message(root.hex(), count))
+    ts = datetime.datetime.now(datetime.UTC).replace(microsecond=0).strftime("%Y-%m-%dT%H:%M:%SZ")
+    out = []
+    for i, (env, path) in enumerate(zip(envelopes, paths)):
+        env = {k: v for k, v in env.items() if k != "signing"}
+        env["signing"] = {"alg": alg, "key_id": key_id, "nonce": "", "timestamp": ts, "sig": sig,
+                          "merkle": {"root": root.hex(), "index": i, "count": count, "path": [h.hex() for h in path]}}
+        out.append(env)
+    return out
+
+@timed("sign_batch_hmac")
+def sign_envelopes_hmac(envelopes, key: bytes, key_id="ctrl-01"):
+    return merkle_sign(envelopes, lambda m: hmac.new(key, m, hashlib.sha256).hexdigest(), "HMAC-SHA256", key_id)
+
+def sign_envelopes_ed25519(envelopes, priv_hex: str, key_id="ctrl-ed25519"):
+    return _one_key_ring(key_id, priv_hex).sign_batch(envelopes)
+
+def sign_envelope(envelope, keyring, key_id=None):
+    """Sign with a preloaded qlx_keyring.Keyring; key_id defaults to its primary active key."""
+    return keyring.sign(envelope, key_id=key_id)
+
+def verify_envelope(envelope, keyring) -> bool:
+    """Verify against the keyring entry named by signing.key_id (HMAC or Ed25519)."""
+    return keyring.verify(envelope)
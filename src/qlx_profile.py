@@ -0,0 +1,130 @@
+import os, sys, json, time, pstats, cProfile, resource, itertools, threading, tracemalloc, collections
+from qlx_metrics import add_listener, remove_listener
+
+# CPU and allocation profiling for one run of a CLI command. Writes:
+#   profile.txt        hot functions by own time and by cumulative time
+#   profile.pstats     raw cProfile data (snakeviz, gprof2dot, pstats)
+#   stacks.collapsed   sampled stacks, "frame;frame;frame count" (flamegraph.pl, speedscope, inferno)
+#   alloc_top.txt      largest live allocation sites at the end of the run (tracemalloc)
+#   stages.json        per pipeline stage: calls, seconds, peak RSS and peak traced Python memory
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        # no procfs: fall back to the lifetime peak
+        r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return r if sys.platform == "darwin" else r * 1024
+
+def _frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class Profiler:
+    def __init__(self, out_dir, interval=0.005, trace_alloc=True, alloc_frames=1, top=40):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.trace_alloc = trace_alloc
+        self.alloc_frames = alloc_frames
+        self.top = top
+        self.stacks = collections.Counter()
+        self.samples = collections.deque(maxlen=200_000)  # (t, rss, traced)
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    # ---------- sampling ----------
+    def _memory_now(self):
+        traced = tracemalloc.get_traced_memory()[0] if self.trace_alloc else 0
+        return rss_bytes(), traced
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                names = []
+                while frame is not None:
+                    names.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+            sample = (time.perf_counter(), *self._memory_now())
+            with self._lock:
+                self.samples.append(sample)
+
+    def _on_stage(self, name, seconds):
+        end = time.perf_counter()
+        rss, traced = self._memory_now()
+        start = end - seconds
+        with self._lock:
+            self.samples.append((end, rss, traced))
+            window = list(itertools.takewhile(lambda s: s[0] >= start, reversed(self.samples)))
+        st = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "peak_rss_bytes": 0, "peak_traced_bytes": 0})
+        st["calls"] += 1
+        st["seconds"] += seconds
+        st["peak_rss_bytes"] = max([st["peak_rss_bytes"], rss] + [s[1] for s in window])
+        st["peak_traced_bytes"] = max([st["peak_traced_bytes"], traced] + [s[2] for s in window])
+
+    # ---------- lifecycle ----------
+    def __enter__(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        if self.trace_alloc:
+            tracemalloc.start(self.alloc_frames)
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._sample_loop, name="qlx-profile-sampler", daemon=True)
+        self._thread.start()
+        add_listener(self._on_stage)
+        self._t0 = time.perf_counter()
+        self._prof = cProfile.Profile()
+        self._prof.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self._prof.disable()
+        self.wall_s = time.perf_counter() - self._t0
+        remove_listener(self._on_stage)
+        self._stop.set(); self._thread.join()
+        snapshot = tracemalloc.take_snapshot() if self.trace_alloc else None
+        self.peak_traced = tracemalloc.get_traced_memory()[1] if self.trace_alloc else 0
+        if self.trace_alloc:
+            tracemalloc.stop()
+        self.write(snapshot)
+        return False
+
+    # ---------- reports ----------
+    def write(self, snapshot):
+        p = lambda name: os.path.join(self.out_dir, name)
+        self._prof.dump_stats(p("profile.pstats"))
+        with open(p("profile.txt"), "w") as f:
+            st = pstats.Stats(self._prof, stream=f).strip_dirs()
+            f.write("== by own time ==\n")
+            st.sort_stats("tottime").print_stats(self.top)
+            f.write("== by cumulative time ==\n")
+            st.sort_stats("cumulative").print_stats(self.top)
+        with open(p("stacks.collapsed"), "w") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        if snapshot is not None:
+            snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)])
+            with open(p("alloc_top.txt"), "w") as f:
+                for stat in snapshot.statistics("traceback")[:self.top]:
+                    f.write(f"{stat.size/1024:.1f} KiB in {stat.count} blocks\n")
+                    for line in stat.traceback.format(limit=6):
+                        f.write(f"  {line}\n")
+        with open(p("stages.json"), "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def summary(self):
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        stages = {k: dict(v, seconds=round(v["seconds"], 6),
+                          peak_rss_mb=round(v["peak_rss_bytes"] / 2**20, 1),
+                          peak_traced_mb=round(v["peak_traced_bytes"] / 2**20, 1))
+                  for k, v in sorted(self.stages.items(), key=lambda kv: -kv[1]["seconds"])}
+        return {"wall_s": round(getattr(self, "wall_s", 0.0), 6), "samples": sum(self.stacks.values()),
+                "interval_s": self.interval,
+                "max_rss_mb": round((maxrss if sys.platform == "darwin" else maxrss * 1024) / 2**20, 1),
+                "peak_traced_mb": round(getattr(self, "peak_traced", 0) / 2**20, 1),
+                "stages": stages}
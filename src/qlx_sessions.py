@@ -0,0 +1,275 @@
+import json, time, calendar, functools
+
+# TTL-aware store of applied envelopes with a hierarchical timing wheel.
+#
+# Each envelope's apply block gives three events, in ms since the epoch:
+#   ramp_start  apply.at                       (now, if the envelope has no at)
+#   hold_end    apply.at + ramp_ms + hold_ms
+#   expire      apply.at + ttl_ms              the session is dropped from the store
+# Timers sit in a 5-level wheel of 128 slots per level (tick_ms per tick; 2^35 ticks, about a
+# year at 1 ms, with an overflow list beyond that). A deadline goes in the level of the highest
+# 7-bit group where it differs from the current tick, so inserting is O(1). advance() jumps
+# straight to the next occupied slot using one occupancy bitmask per level, so idle time
+# costs nothing and each timer is touched at most once per level on its way down.
+# Timers name a session_id and the version it was put with (a store-wide counter), so timers of
+# replaced or removed sessions are skipped when their slot comes up instead of being searched for.
+
+LEVELS, BITS = 5, 7  # small slots keep each cascade (one slot moved down a level) short
+SLOTS, MASK = 1 << BITS, (1 << BITS) - 1
+KINDS = ("ramp_start", "hold_end", "expire")
+
+@functools.lru_cache(maxsize=4096)
+def _at_ms(at):
+    # apply.at is whole-second UTC ("2025-01-01T00:00:00Z"); many sessions share one
+    return calendar.timegm(time.strptime(at, "%Y-%m-%dT%H:%M:%SZ")) * 1000
+
+class Session:
+    __slots__ = ("session_id", "hfp_hash", "env", "state", "at_ms", "hold_end_ms", "expires_ms", "version")
+
+    def as_dict(self):
+        return {"session_id": self.session_id, "hfp_hash": self.hfp_hash, "state": self.state,
+                "at_ms": self.at_ms, "hold_end_ms": self.hold_end_ms, "expires_ms": self.expires_ms}
+
+class TimingWheel:
+    """Hierarchical timing wheel over integer ticks. Entries are opaque; pop_due() returns them in tick order."""
+
+    def __init__(self, now_tick=0):
+        self.now = int(now_tick)
+        self.slots = [[None] * SLOTS for _ in range(LEVELS)]
+        self.occ = [0] * LEVELS  # bit s set: slot s of that level holds entries
+        self.overflow = []       # (tick, entry) beyond the top level
+        self.due = []            # (tick, entry) at or before now, fired by the next pop_due
+        self.count = 0
+
+    def add(self, tick, entry):
+        self.count += 1
+        self._place(tick, entry)
+
+    def _place(self, tick, entry):
+        diff = tick ^ self.now
+        if tick <= self.now:
+            self.due.append((tick, entry)); return
+        lvl = (diff.bit_length() - 1) // BITS
+        if lvl >= LEVELS:
+            self.overflow.append((tick, entry)); return
+        s = (tick >> (BITS * lvl)) & MASK
+        slot = self.slots[lvl][s]
+        if slot is None:
+            self.slots[lvl][s] = slot = []
+            self.occ[lvl] |= 1 << s
+        slot.append((tick, entry))
+
+    def _take(self, lvl, s):
+        slot = self.slots[lvl][s]
+        self.slots[lvl][s] = None
+        self.occ[lvl] &= ~(1 << s)
+        return slot
+
+    def _next(self):
+        # (level, slot, tick) of the earliest occupied slot; levels below it are empty
+        for lvl in range(LEVELS):
+            shift = BITS * lvl
+            cur = (self.now >> shift) & MASK
+            m = self.occ[lvl] >> cur
+            if m:
+                s = cur + (m & -m).bit_length() - 1
+                base = self.now >> (shift + BITS) << (shift + BITS)
+                return lvl, s, max(self.now, base | (s << shift))
+        return None
+
+    def pop_due(self, to_tick):
+        """Advance to to_tick; returns [(tick, entry)] for every deadline <= to_tick, earliest first."""
+        out = sorted(self.due, key=lambda e: e[0]) if self.due else []
+        self.due = []
+        to_tick = int(to_tick)
+        while True:
+            nxt = self._next()
+            if nxt is None:
+                if self.overflow:
+                    top = min(t for t, _ in self.overflow) >> (BITS * LEVELS) << (BITS * LEVELS)
+                    if top <= to_tick:
+                        self.now = max(self.now, top)
+                        spill, self.overflow = self.overflow, []
+                        for t, e in spill: self._place(t, e)
+                        out.extend(sorted(self.due, key=lambda e: e[0])); self.due = []
+                        continue
+                break
+            lvl, s, tick = nxt
+            if tick > to_tick:
+                break
+            self.now = tick
+            if lvl == 0:
+                out.extend(self._take(0, s))
+            else:
+                for t, e in self._take(lvl, s):
+                    self._place(t, e)
+                if self.due:
+                    out.extend(sorted(self.due, key=lambda e: e[0])); self.due = []
+        self.now = max(self.now, to_tick)
+        self.count -= len(out)
+        return out
+
+class SessionStore:
+    """
+    Applied envelopes by session_id and hfp_hash, with ramp_start / hold_end / expire events
+    from a timing wheel. Envelopes are taken as already verified (Keyring.check or a stand-in
+    controller). With a journal path, every put, remove and advance is appended as JSONL so
+    replay() can rebuild the store and its event sequence after a restart.
+    """
+
+    def __init__(self, tick_ms=1, now_ms=None, journal=None):
+        self.tick_ms = int(tick_ms)
+        now_ms = int(time.time() * 1000) if now_ms is None else int(now_ms)
+        self.wheel = TimingWheel(now_ms // self.tick_ms)
+        self.now_ms = now_ms
+        self.sessions = {}  # session_id -> Session
+        self.by_hfp = {}    # hfp_hash -> {session_id: Session}
+        self.fired = {k: 0 for k in KINDS}
+        self.stale = 0      # timers of replaced or removed sessions, dropped when due
+        self.listeners = []
+        self._version = 0
+        self._journal = open(journal, "a") if journal else None
+
+    def _log(self, rec):
+        if self._journal is not None:
+            self._journal.write(json.dumps(rec, separators=(",", ":")) + "\n")
+
+    def _schedule(self, ms, kind, sess):
+        # atomic entries (no Session reference) are untracked by the cyclic GC, which would
+        # otherwise walk every pending timer on each full collection
+        self.wheel.add(-(-ms // self.tick_ms), (ms, kind, sess.session_id, sess.version))
+
+    # ---------- sessions ----------
+    def put(self, env, now_ms=None):
+        """Track an applied envelope (replacing any session with its session_id); returns the Session."""
+        now_ms = self.now_ms if now_ms is None else int(now_ms)
+        sid = env["session_id"]
+        a = env.get("apply") or {}
+        old = self.sessions.get(sid)
+        if old is not None:
+            self._drop(old)
+        self._log({"op": "put", "t": now_ms, "env": env})
+        s = Session()
+        s.session_id, s.hfp_hash, s.env = sid, env.get("hfp_hash"), env
+        self._version += 1
+        s.version = self._version
+        s.at_ms = _at_ms(a["at"]) if a.get("at") else now_ms
+        s.hold_end_ms = s.at_ms + int(a.get("ramp_ms", 0)) + int(a.get("hold_ms", 0))
+        s.expires_ms = s.at_ms + int(a.get("ttl_ms", 0)) if a.get("ttl_ms") else None
+        s.state = "pending"
+        self.sessions[sid] = s
+        self.by_hfp.setdefault(s.hfp_hash, {})[sid] = s
+        self._schedule(s.at_ms, "ramp_start", s)
+        self._schedule(s.hold_end_ms, "hold_end", s)
+        if s.expires_ms is not None:
+            self._schedule(s.expires_ms, "expire", s)
+        return s
+
+    def _drop(self, s):
+        del self.sessions[s.session_id]
+        peers = self.by_hfp[s.hfp_hash]
+        del peers[s.session_id]
+        if not peers:
+            del self.by_hfp[s.hfp_hash]
+
+    def remove(self, session_id):
+        s = self.sessions.get(session_id)
+        if s is None:
+            return False
+        self._log({"op": "remove", "t": self.now_ms, "session_id": session_id})
+        self._drop(s)
+        return True
+
+    def get(self, session_id):
+        return self.sessions.get(session_id)
+
+    def for_hfp(self, hfp_hash):
+        return list(self.by_hfp.get(hfp_hash, {}).values())
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self.sessions
+
+    # ---------- time ----------
+    def advance(self, now_ms=None):
+        """Move the clock to now_ms and fire every event due by then; returns [(ms, kind, session_id, hfp_hash)]."""
+        now_ms = int(time.time() * 1000) if now_ms is None else int(now_ms)
+        if now_ms < self.now_ms:
+            return []
+        if self._journal is not None:
+            self._log({"op": "advance", "t": now_ms})
+            self._journal.flush()
+        self.now_ms = now_ms
+        events = []
+        sessions = self.sessions
+        for _, (ms, kind, sid, version) in self.wheel.pop_due(now_ms // self.tick_ms):
+            s = sessions.get(sid)
+            if s is None or version != s.version:
+                self.stale += 1
+                continue
+            if kind == "ramp_start":
+                s.state = "active"
+            elif kind == "hold_end":
+                s.state = "released"
+            else:
+                self._drop(s)
+                s.state = "expired"
+            self.fired[kind] += 1
+            ev = (ms, kind, s.session_id, s.hfp_hash)
+            events.append(ev)
+            for fn in self.listeners:
+                fn(ev)
+        return events
+
+    def stats(self):
+        states = {}
+        for s in self.sessions.values():
+            states[s.state] = states.get(s.state, 0) + 1
+        return {"sessions": len(self.sessions), "hfp_hashes": len(self.by_hfp), "timers": self.wheel.count,
+                "states": states, "fired": dict(self.fired), "stale_timers": self.stale, "now_ms": self.now_ms}
+
+    # ---------- journal ----------
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @classmethod
+    def replay(cls, journal, until_ms=None, tick_ms=1, on_event=None):
+        """
+        Rebuild a store from a journal file (or iterable of its records), re-firing the same
+        events in the same order; stops before records after until_ms. Returns the store.
+        """
+        lines = open(journal) if isinstance(journal, str) else journal
+        st = None
+        try:
+            for rec in lines:
+                rec = json.loads(rec) if isinstance(rec, str) else rec
+                if until_ms is not None and rec["t"] > until_ms:
+                    break
+                if st is None:
+                    st = cls(tick_ms=tick_ms, now_ms=rec["t"])
+                    if on_event is not None:
+                        st.listeners.append(on_event)
+                if rec["op"] == "put":
+                    st.put(rec["env"], now_ms=rec["t"])
+                elif rec["op"] == "remove":
+                    st.remove(rec["session_id"])
+                else:
+                    st.advance(rec["t"])
+            if st is None:
+                st = cls(tick_ms=tick_ms)
+            if until_ms is not None:
+                st.advance(until_ms)
+        finally:
+            if isinstance(journal, str):
+                lines.close()
+        return st
@@ -0,0 +1,199 @@
+import os, json, gzip, lzma, fcntl, hashlib, contextlib
+
+# Content-addressed artifact store for HFPs and signed envelopes.
+#
+#   <root>/objects.pack   append-only compressed blobs
+#   <root>/index.jsonl    one line per stored object, loaded into dicts on open
+#   <root>/lock           flock held while a batch appends
+#
+# Objects are addressed by sha256 of their canonical JSON, so identical content is
+# written once. HFPs are looked up by fingerprint_hash: only the core (what the
+# fingerprint hashes) goes into the pack; fingerprint_hash and the first timestamp
+# live in the index line. Envelopes are looked up by envelope_digest().
+# Appends inside one batch() share a single fsync of the pack and then the index, so
+# an index line never points at data that was not synced first. After a crash, the
+# next writer cuts a torn index line and unreferenced pack bytes.
+
+HFP_CORE_KEYS = ["version","wavelet_basis","levels","seed_harmonics","phi","chaos","mixer","band_stats"]
+
+CODECS = {
+    "none": (lambda b, level: b, lambda b: b),
+    "gzip": (lambda b, level: gzip.compress(b, compresslevel=6 if level is None else level, mtime=0), gzip.decompress),
+    "lzma": (lambda b, level: lzma.compress(b, preset=6 if level is None else level), lzma.decompress),
+}
+
+def canonical_json(obj) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def envelope_digest(env) -> str:
+    """sha256 hex of the canonical signed envelope; the store key for envelopes."""
+    return hashlib.sha256(canonical_json(env)).hexdigest()
+
+class ArtifactStore:
+    def __init__(self, root, codec="gzip", level=None):
+        if codec not in CODECS:
+            raise ValueError(f"unknown codec {codec!r}; expected one of {', '.join(CODECS)}")
+        self.root, self.codec, self.level = root, codec, level
+        os.makedirs(root, exist_ok=True)
+        self._pack = os.open(os.path.join(root, "objects.pack"), os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._index = open(os.path.join(root, "index.jsonl"), "a+b")
+        self._lockf = open(os.path.join(root, "lock"), "a+b")
+        self.by_digest = {}  # digest -> index entry
+        self.by_key = {}     # (kind, key) -> digest
+        self._index_pos = self._pack_end = 0
+        self._depth = 0
+        self.written = self.deduplicated = 0
+        self._load()
+
+    # ---------- index ----------
+    def _load(self):
+        # read index lines appended since the last load (by us or another writer); stop at the
+        # first torn line or line past the end of the pack, which only a crashed writer leaves
+        pack_size = os.fstat(self._pack).st_size
+        self._index.seek(self._index_pos)
+        for line in self._index.read().splitlines(keepends=True):
+            try:
+                e = json.loads(line) if line.endswith(b"\n") else None
+            except ValueError:
+                e = None
+            if e is None or e["offset"] + e["length"] > pack_size:
+                break
+            self.by_digest.setdefault(e["digest"], e)
+            self.by_key.setdefault((e["kind"], e["key"]), e["digest"])
+            self._pack_end = max(self._pack_end, e["offset"] + e["length"])
+            self._index_pos += len(line)
+
+    def _repair(self):
+        # under the lock: drop what _load stopped at, and blobs no index line points to
+        self._index.truncate(self._index_pos)
+        if os.fstat(self._pack).st_size > self._pack_end:
+            os.ftruncate(self._pack, self._pack_end)
+
+    def _add(self, kind, key, raw, meta=None):
+        if (kind, key) in self.by_key:
+            self.deduplicated += 1
+            return False
+        digest = hashlib.sha256(raw).hexdigest()
+        with self.batch():
+            if (kind, key) in self.by_key:  # another writer stored it while we waited for the lock
+                self.deduplicated += 1
+                return False
+            blob = CODECS[self.codec][0](raw, self.level)
+            offset = os.lseek(self._pack, 0, os.SEEK_END)
+            os.write(self._pack, blob)
+            self._pack_end = offset + len(blob)
+            e = {"digest": digest, "kind": kind, "key": key, "offset": offset, "length": len(blob),
+                 "size": len(raw), "codec": self.codec}
+            if meta: e["meta"] = meta
+            self._pending.append(canonical_json(e) + b"\n")
+            self.by_digest.setdefault(digest, e)
+            self.by_key[(kind, key)] = digest
+            self.written += 1
+        return True
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Group puts under one lock and one fsync. Nested batches join the outer one."""
+        if self._depth:
+            self._depth += 1
+            try: yield self
+            finally: self._depth -= 1
+            return
+        fcntl.flock(self._lockf, fcntl.LOCK_EX)
+        self._depth, self._pending = 1, []
+        try:
+            self._load()
+            self._repair()
+            yield self
+        finally:
+            try:
+                if self._pending:
+                    os.fsync(self._pack)  # blobs are durable before any index line points at them
+                    self._index.seek(0, os.SEEK_END)
+                    self._index.write(b"".join(self._pending))
+                    self._index.flush()
+                    os.fsync(self._index.fileno())
+                    self._index_pos = self._index.tell()
+            finally:
+                self._depth, self._pending = 0, []
+                fcntl.flock(self._lockf, fcntl.LOCK_UN)
+
+    # ---------- put ----------
+    def put_hfp(self, hfp) -> str:
+        """Store an assemble_hfp() record; returns its fingerprint_hash."""
+        fp = hfp["fingerprint_hash"]
+        if ("hfp", fp) in self.by_key:
+            self.deduplicated += 1  # skip building the core bytes
+            return fp
+        self._add("hfp", fp, canonical_json({k: hfp[k] for k in HFP_CORE_KEYS}), meta={"timestamp": hfp.get("timestamp")})
+        return fp
+
+    def put_envelope(self, env) -> str:
+        """Store a (signed) envelope; returns its envelope_digest."""
+        raw = canonical_json(env)
+        digest = hashlib.sha256(raw).hexdigest()
+        self._add("envelope", digest, raw, meta={"session_id": env.get("session_id"), "hfp_hash": env.get("hfp_hash")})
+        return digest
+
+    # ---------- get ----------
+    def _read(self, e):
+        blob = os.pread(self._pack, e["length"], e["offset"])
+        raw = CODECS[e["codec"]][1](blob)
+        if hashlib.sha256(raw).hexdigest() != e["digest"]:
+            raise ValueError(f"corrupt object {e['digest']} in {self.root}")
+        return raw
+
+    def _entry(self, kind, key):
+        digest = self.by_key.get((kind, key))
+        if digest is None:
+            self._load()
+            digest = self.by_key.get((kind, key))
+            if digest is None:
+                raise KeyError(key)
+        return self.by_digest[digest]
+
+    def get_hfp(self, fingerprint_hash, full=True):
+        """HFP core by fingerprint_hash; with full, the assemble_hfp() shape (core + timestamp + fingerprint_hash)."""
+        e = self._entry("hfp", fingerprint_hash)
+        rec = json.loads(self._read(e))
+        if full:
+            rec["timestamp"] = (e.get("meta") or {}).get("timestamp")
+            rec["fingerprint_hash"] = fingerprint_hash
+        return rec
+
+    def get_envelope(self, digest):
+        return json.loads(self._read(self._entry("envelope", digest)))
+
+    def get(self, key):
+        """Look up a fingerprint_hash or envelope digest."""
+        if ("hfp", key) in self.by_key:
+            return self.get_hfp(key)
+        return self.get_envelope(key)
+
+    def __contains__(self, key):
+        return ("hfp", key) in self.by_key or ("envelope", key) in self.by_key
+
+    def __len__(self):
+        return len(self.by_key)
+
+    def stats(self):
+        kinds = {}
+        for (kind, _), digest in self.by_key.items():
+            e = self.by_digest[digest]
+            k = kinds.setdefault(kind, {"objects": 0, "raw_bytes": 0, "stored_bytes": 0})
+            k["objects"] += 1; k["raw_bytes"] += e["size"]; k["stored_bytes"] += e["length"]
+        return {"root": self.root, "objects": len(self), "kinds": kinds,
+                "pack_bytes": os.fstat(self._pack).st_size,
+                "written": self.written, "deduplicated": self.deduplicated}
+
+    def close(self):
+        if self._pack is not None:
+            os.close(self._pack); self._pack = None
+            self._index.close(); self._lockf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
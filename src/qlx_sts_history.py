@@ -0,0 +1,250 @@
+import os, json, math, time, sqlite3, hashlib, html
+from qlx_sts_min import wilson_hilferty_p_upper_chi2
+
+# SQLite history of run_suite reports. One row per run (metadata and summary) and one
+# row per (test, run) p-value. Results are clustered on (test, ts) and carry the run's
+# time and pass/fail, so trend, window and drift queries are index range scans that
+# only join runs when filtering on run metadata.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    seed TEXT, whiten TEXT, source TEXT, workflow TEXT, git_sha TEXT,
+    n_bits INTEGER, alpha REAL, block_M INTEGER,
+    all_pass INTEGER, min_p REAL,
+    report_sha TEXT,
+    run_key TEXT UNIQUE,
+    meta TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_ts ON runs(ts);
+CREATE INDEX IF NOT EXISTS runs_report_sha ON runs(report_sha);
+CREATE TABLE IF NOT EXISTS results (
+    test TEXT NOT NULL,
+    ts REAL NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    p REAL, stat REAL,
+    failed INTEGER,
+    PRIMARY KEY (test, ts, run_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tests (name TEXT PRIMARY KEY) WITHOUT ROWID;
+"""
+META_COLUMNS = ("seed", "whiten", "source", "workflow", "git_sha")
+FILTERS = META_COLUMNS + ("n_bits",)
+
+# Runs are deduplicated by identity, not content: nightly runs on the fixed seed produce
+# byte-identical reports and each one is still a run. The key is an explicit run id (e.g.
+# GITHUB_RUN_ID) plus source when given, else source plus run time (a report file's mtime).
+def run_key(source, ts, run_id=None):
+    return f"{run_id}:{source}" if run_id else f"{source}@{float(ts)!r}"
+
+def _report_sha(report):
+    return hashlib.sha256(json.dumps(report, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+class History:
+    def __init__(self, path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    # ---------- ingest ----------
+    def ingest(self, report, ts=None, run_id=None, **meta):
+        """
+        Add one run_suite report; anything without results and summary objects (e.g. an
+        sts_summarize.py roll-up) raises ValueError. meta may carry seed, whiten, source, workflow, git_sha;
+        other keys are kept as JSON. Returns the run id, or None if this run (same run_id
+        and source, or same source and ts) was already ingested.
+        """
+        if not (isinstance(report, dict) and isinstance(report.get("results"), dict)
+                and isinstance(report.get("summary"), dict)):
+            raise ValueError("not a run_suite report (needs results and summary objects)")
+        cols = {k: meta.pop(k, None) for k in META_COLUMNS}
+        summary = report["summary"]
+        ts = time.time() if ts is None else float(ts)
+        key = run_key(cols["source"], ts, run_id)
+        alpha = report.get("alpha", 0.01)
+        with self.db:
+            cur = self.db.execute(
+                "INSERT OR IGNORE INTO runs (ts, seed, whiten, source, workflow, git_sha, n_bits, alpha, block_M,"
+                " all_pass, min_p, report_sha, run_key, meta) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                (ts, *cols.values(), report.get("n_bits"), alpha,
+                 report.get("block_M"), int(bool(summary.get("all_pass"))), summary.get("min_p"),
+                 _report_sha(report), key, json.dumps(meta) if meta else None))
+            if cur.rowcount == 0:
+                return None
+            run_id = cur.lastrowid
+            self.db.executemany("INSERT INTO results (test, ts, run_id, p, stat, failed) VALUES (?,?,?,?,?,?)",
+                                [(name, ts, run_id, r.get("p"),
+                                  r.get("stat") if isinstance(r.get("stat"), (int, float)) else None,
+                                  None if r.get("p") is None else int(r["p"] < alpha))
+                                 for name, r in report.get("results", {}).items()])
+            self.db.executemany("INSERT OR IGNORE INTO tests (name) VALUES (?)", [(n,) for n in report.get("results", {})])
+        return run_id
+
+    def ingest_file(self, path, **meta):
+        """Ingest a report JSON file; the run time defaults to the file's mtime."""
+        with open(path) as f:
+            report = json.load(f)
+        meta.setdefault("source", os.path.basename(path))
+        return self.ingest(report, ts=meta.pop("ts", None) or os.path.getmtime(path), **meta)
+
+    # ---------- queries ----------
+    def _where(self, since=None, until=None, prefix="r", **filters):
+        sql, args = ["1=1"], []
+        if since is not None: sql.append(f"{prefix}.ts >= ?"); args.append(since)
+        if until is not None: sql.append(f"{prefix}.ts < ?"); args.append(until)
+        for k, v in filters.items():
+            if k not in FILTERS:
+                raise ValueError(f"unknown filter {k!r}; expected one of {', '.join(FILTERS)}")
+            if v is not None:
+                sql.append(f"r.{k} = ?"); args.append(v)
+        return " AND ".join(sql), args
+
+    def _results(self, since, until, filters):
+        # FROM/WHERE over results x, joining runs r only when a metadata filter needs it
+        where, args = self._where(since, until, prefix="x", **filters)
+        if any(v is not None for v in filters.values()):
+            return f"FROM results x JOIN runs r ON r.id = x.run_id WHERE {where}", args
+        return f"FROM results x WHERE {where}", args
+
+    def tests(self):
+        return [r[0] for r in self.db.execute("SELECT name FROM tests ORDER BY name")]
+
+    def runs(self, since=None, until=None, limit=None, **filters):
+        where, args = self._where(since, until, **filters)
+        q = f"SELECT id, ts, seed, whiten, n_bits, all_pass, min_p, source FROM runs r WHERE {where} ORDER BY ts DESC"
+        if limit: q += f" LIMIT {int(limit)}"
+        keys = ("id", "ts", "seed", "whiten", "n_bits", "all_pass", "min_p", "source")
+        return [dict(zip(keys, row)) for row in self.db.execute(q, args)]
+
+    def trend(self, test, since=None, until=None, **filters):
+        """[(ts, p)] for one test, oldest first."""
+        src, args = self._results(since, until, filters)
+        return self.db.execute(f"SELECT x.ts, x.p {src} AND x.test = ? ORDER BY x.ts", [*args, test]).fetchall()
+
+    def failure_rates(self, window_s=86400.0, alpha=None, since=None, until=None, **filters):
+        """
+        Per test and time window: {test: [{"start", "runs", "failures", "rate"}]}. A run fails a
+        test when p < alpha; alpha defaults to each run's own alpha.
+        """
+        src, args = self._results(since, until, filters)
+        fail = "x.p < ?" if alpha is not None else "x.failed"
+        q = (f"SELECT CAST(x.ts / ? AS INTEGER) AS w, COUNT(*), SUM({fail}) {src} AND x.test = ? "
+             f"GROUP BY w ORDER BY w")
+        out = {}
+        for test in self.tests():
+            params = [window_s] + ([alpha] if alpha is not None else []) + args + [test]
+            rows = [{"start": w * window_s, "runs": n, "failures": k or 0, "rate": (k or 0) / n}
+                    for w, n, k in self.db.execute(q, params)]
+            if rows:
+                out[test] = rows
+        return out
+
+    def drift(self, recent=100, alpha=0.01, since=None, until=None, **filters):
+        """
+        NIST SP 800-22 section 4.2 checks on each test's most recent p-values:
+          proportion: pass fraction must lie in (1-alpha) +/- 3*sqrt(alpha*(1-alpha)/m)
+          uniformity: chi-square of p-values over 10 bins, P_T >= 0.0001
+        plus the failure rate of the older runs in range, for comparison.
+        """
+        src, args = self._results(since, until, filters)
+        src += " AND x.test = ? AND x.p IS NOT NULL"
+        out = {}
+        for test in self.tests():
+            cur = [p for (p,) in self.db.execute(f"SELECT x.p {src} ORDER BY x.ts DESC LIMIT ?", [*args, test, recent])]
+            if not cur:
+                continue
+            total, total_fail = self.db.execute(f"SELECT COUNT(*), SUM(x.p < ?) {src}", [alpha, *args, test]).fetchone()
+            m = len(cur)
+            prop = sum(p >= alpha for p in cur) / m
+            half = 3 * math.sqrt(alpha * (1 - alpha) / m)
+            counts = [0] * 10
+            for p in cur:
+                counts[min(int(p * 10), 9)] += 1
+            chi2 = sum((c - m / 10) ** 2 / (m / 10) for c in counts)
+            p_t = wilson_hilferty_p_upper_chi2(chi2, 9)
+            out[test] = {
+                "runs": m, "proportion": prop, "proportion_range": [1 - alpha - half, 1 - alpha + half],
+                "proportion_ok": prop >= 1 - alpha - half, "uniformity_p": p_t,
+                # the chi-square needs about 55+ values (NIST's minimum) to mean anything
+                "uniformity_ok": m < 55 or p_t >= 1e-4,
+                "recent_fail_rate": 1 - prop,
+                "baseline_runs": total - m,
+                "baseline_fail_rate": ((total_fail - sum(p < alpha for p in cur)) / (total - m)) if total > m else None,
+            }
+            out[test]["drift"] = not (out[test]["proportion_ok"] and out[test]["uniformity_ok"])
+        return out
+
+    def summary(self, since=None, until=None, window_s=86400.0, recent=100, alpha=0.01, **filters):
+        where, args = self._where(since, until, **filters)
+        n, first, last, pass_rate = self.db.execute(
+            f"SELECT COUNT(*), MIN(ts), MAX(ts), AVG(all_pass) FROM runs r WHERE {where}", args).fetchone()
+        return {
+            "db": self.path, "runs": n, "first": first, "last": last, "all_pass_rate": pass_rate,
+            "latest": self.runs(since, until, limit=10, **filters),
+            "failure_rates": self.failure_rates(window_s, since=since, until=until, **filters),
+            "drift": self.drift(recent, alpha, since, until, **filters),
+        }
+
+# ---------- rendering ----------
+def _when(ts):
+    return time.strftime("%Y-%m-%d %H:%M", time.gmtime(ts)) if ts else "-"
+
+def _num(x, fmt):
+    return "-" if x is None else format(x, fmt)
+
+def render_text(s):
+    lines = [f"{s['runs']} runs from {_when(s['first'])} to {_when(s['last'])} UTC; "
+             f"all-pass rate {_rate(s['all_pass_rate'])}" if s["runs"] else "no runs"]
+    if s["drift"]:
+        lines.append(f"{'test':<20} {'runs':>5} {'pass':>7} {'range':>15} {'unif_p':>9} {'base_fail':>9}  status")
+        for test, d in s["drift"].items():
+            lo, hi = d["proportion_range"]
+            lines.append(f"{test:<20} {d['runs']:>5} {d['proportion']:>7.3f} {lo:>7.3f}-{hi:<7.3f} "
+                         f"{_num(d['uniformity_p'], '.4f'):>9} {_rate(d['baseline_fail_rate']):>9}  {'DRIFT' if d['drift'] else 'ok'}")
+    for r in s["latest"]:
+        lines.append(f"  {_when(r['ts'])}  {r['whiten'] or '-':<7} n={_num(r['n_bits'], 'd'):<9} "
+                     f"{'pass' if r['all_pass'] else 'FAIL'}  min_p={_num(r['min_p'], '.4g')}  {r['source'] or ''}")
+    return "\n".join(lines)
+
+def _rate(x):
+    return _num(x, ".3f")
+
+def render_html(s):
+    e = html.escape
+    rows = "".join(
+        f"<tr><td>{e(t)}</td><td>{d['runs']}</td><td>{d['proportion']:.3f}</td>"
+        f"<td>{d['proportion_range'][0]:.3f}–{d['proportion_range'][1]:.3f}</td><td>{_num(d['uniformity_p'], '.4f')}</td>"
+        f"<td>{_rate(d['baseline_fail_rate'])}</td><td>{'DRIFT' if d['drift'] else 'ok'}</td></tr>"
+        for t, d in s["drift"].items())
+    latest = "".join(
+        f"<tr><td>{_when(r['ts'])}</td><td>{e(r['whiten'] or '-')}</td><td>{_num(r['n_bits'], 'd')}</td>"
+        f"<td>{'pass' if r['all_pass'] else 'FAIL'}</td><td>{_num(r['min_p'], '.4g')}</td><td>{e(r['source'] or '')}</td></tr>"
+        for r in s["latest"])
+    return f"""<!doctype html><meta charset="utf-8"><title>STS History</title>
+<h2>STS History</h2>
+<p>{s['runs']} runs from {_when(s['first'])} to {_when(s['last'])} UTC; all-pass rate {_rate(s['all_pass_rate'])}</p>
+<table border="1" cellpadding="6" cellspacing="0">
+<tr><th>test</th><th>recent runs</th><th>pass proportion</th><th>acceptable</th><th>uniformity P</th><th>older fail rate</th><th>status</th></tr>
+{rows}
+</table>
+<h3>Latest runs</h3>
+<table border="1" cellpadding="6" cellspacing="0">
+<tr><th>time (UTC)</th><th>whitener</th><th>n_bits</th><th>result</th><th>min_p</th><th>source</th></tr>
+{latest}
+</table>
+"""
@@ -0,0 +1,255 @@
+import os, json, time, uuid, pathlib, threading, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from qlx_sts_min import make_stream, stream_to_bits, iter_suite, summarize_suite, SUITE_TESTS
+
+STAGES = ["stream", "whiten"] + [name for name, _ in SUITE_TESTS]
+FINAL_STATES = ("done", "error", "cancelled")
+
+def _env_num(key, default, cast=int):
+    try:
+        return cast(os.environ.get(key, default))
+    except Exception:
+        return default
+
+def _stream_len(n_bits, whiten):
+    if whiten == "sha512":
+        chunk_in, chunk_out = 4096, 512
+        return ((n_bits + chunk_out - 1)//chunk_out) * chunk_in
+    return n_bits
+
+def check_stream(n_bits, whiten, max_stream_mib):
+    """Raise ValueError if generating n_bits needs a float64 stream over max_stream_mib."""
+    mib = _stream_len(n_bits, whiten) * 8 / 2**20
+    if mib > max_stream_mib:
+        raise ValueError(f"n_bits={n_bits} with whiten={whiten} needs a {mib:.0f} MiB "
+                         f"stream, over QLX_JOB_MAX_STREAM_MIB={max_stream_mib:g}")
+
+def default_max_stream_mib():
+    return _env_num("QLX_JOB_MAX_STREAM_MIB", 1024, float)
+
+# ---------- store ----------
+class JobStore:
+    """
+    One JSON file per job under root, replaced atomically on every update, so the API
+    process and pool workers share state without an external service. A `<id>.cancel`
+    file asks a running worker to stop at the next stage boundary. Finished jobs are
+    kept for ttl_s seconds.
+    """
+
+    def __init__(self, root, ttl_s=3600):
+        self.root = pathlib.Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.ttl_s = ttl_s
+
+    def _path(self, job_id):
+        if not job_id or "/" in job_id or job_id.startswith("."):
+            raise KeyError(job_id)
+        return self.root / f"{job_id}.json"
+
+    def write(self, job):
+        p = self._path(job["id"])
+        tmp = p.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(job))
+        os.replace(tmp, p)
+
+    def get(self, job_id):
+        try:
+            job = json.loads(self._path(job_id).read_text())
+        except (KeyError, FileNotFoundError, json.JSONDecodeError):
+            return None
+        if job.get("expires_at") and job["expires_at"] < time.time():
+            self.delete(job_id)
+            return None
+        return job
+
+    def update(self, job_id, **fields):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        if job["state"] in FINAL_STATES and not job.get("expires_at"):
+            job["finished"] = job.get("finished") or time.time()
+            job["expires_at"] = job["finished"] + self.ttl_s
+        self.write(job)
+        return job
+
+    def create(self, params):
+        job = {"id": uuid.uuid4().hex, "state": "queued", "created": time.time(), "started": None,
+               "finished": None, "expires_at": None, "params": params,
+               "progress": {"stage": None, "done": 0, "total": len(STAGES)},
+               "stages": [], "partial": {}, "report": None, "error": None}
+        self.write(job)
+        return job
+
+    def request_cancel(self, job_id):
+        self._path(job_id).with_suffix(".cancel").touch()
+
+    def cancel_requested(self, job_id):
+        return self._path(job_id).with_suffix(".cancel").exists()
+
+    def delete(self, job_id):
+        for suffix in (".json", ".cancel"):
+            try: self._path(job_id).with_suffix(suffix).unlink()
+            except (KeyError, FileNotFoundError): pass
+
+    def purge(self):
+        """Drop expired jobs; returns how many were removed."""
+        n, now = 0, time.time()
+        for p in self.root.glob("*.json"):
+            try:
+                job = json.loads(p.read_text())
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            if job.get("expires_at") and job["expires_at"] < now:
+                self.delete(job["id"]); n += 1
+        return n
+
+# ---------- worker ----------
+class _Cancelled(Exception):
+    pass
+
+def run_job(root, job_id, ttl_s=3600):
+    """Run one STS job in the current process, recording progress after every stage."""
+    store = JobStore(root, ttl_s=ttl_s)
+    job = store.get(job_id)
+    if job is None or job["state"] != "queued":
+        return
+    p = job["params"]
+    stages, partial = [], {}
+
+    def stage(name, done):
+        if store.cancel_requested(job_id):
+            raise _Cancelled()
+        store.update(job_id, progress={"stage": name, "done": done, "total": len(STAGES)},
+                     stages=stages, partial=partial)
+
+    try:
+        store.update(job_id, state="running", started=time.time())
+        stage("stream", 0)
+        t0 = time.perf_counter()
+        generator = p.get("generator", "logistic-v1")
+        x = make_stream(p["seed"], _stream_len(p["n_bits"], p["whiten"]), generator)
+        stages.append({"name": "stream", "seconds": round(time.perf_counter() - t0, 6)})
+        stage("whiten", 1)
+        t0 = time.perf_counter()
+        bits = stream_to_bits(x, whiten=p["whiten"])[:p["n_bits"]]
+        del x
+        stages.append({"name": "whiten", "seconds": round(time.perf_counter() - t0, 6)})
+        tests = iter_suite(bits, block_M=p["block_M"])
+        for i, (name, _) in enumerate(SUITE_TESTS):
+            stage(name, 2 + i)
+            t0 = time.perf_counter()
+            _, r = next(tests)
+            partial[name] = r
+            stages.append({"name": name, "seconds": round(time.perf_counter() - t0, 6)})
+        report = summarize_suite(partial, len(bits), alpha=p["alpha"], block_M=p["block_M"])
+        report["generator"] = generator
+        store.update(job_id, state="done", report=report, stages=stages, partial=partial,
+                     progress={"stage": None, "done": len(STAGES), "total": len(STAGES)})
+    except _Cancelled:
+        store.update(job_id, state="cancelled", stages=stages, partial=partial)
+    except Exception as e:
+        store.update(job_id, state="error", error=f"{type(e).__name__}: {e}", stages=stages, partial=partial)
+
+# ---------- runner ----------
+class JobRunner:
+    """
+    Submits jobs to a local worker pool and keeps their futures for cancellation.
+
+    Config (env):
+      QLX_JOB_DIR      job store directory (default: $TMPDIR/qlx-sts-jobs)
+      QLX_JOB_WORKERS  worker processes (default 1; 0 runs jobs in a thread)
+      QLX_JOB_TTL_S    seconds finished jobs are kept (default 3600)
+      QLX_JOB_MAX_STREAM_MIB  largest float64 stream a job may generate (default 1024); the
+                       whole stream and its bits are held in memory, and sha512 needs 8
+                       samples per output bit
+    """
+
+    def __init__(self, root=None, workers=None, ttl_s=None, start_method=None, max_stream_mib=None):
+        import tempfile
+        root = root or os.environ.get("QLX_JOB_DIR") or os.path.join(tempfile.gettempdir(), "qlx-sts-jobs")
+        self.ttl_s = _env_num("QLX_JOB_TTL_S", 3600, float) if ttl_s is None else ttl_s
+        self.store = JobStore(root, ttl_s=self.ttl_s)
+        self.workers = _env_num("QLX_JOB_WORKERS", 1) if workers is None else workers
+        self.start_method = start_method or os.environ.get("QLX_POOL_START", "spawn")
+        self.max_stream_mib = default_max_stream_mib() if max_stream_mib is None else max_stream_mib
+        self._futures = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                if self.workers <= 0:
+                    self._pool = ThreadPoolExecutor(max_workers=1)
+                else:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context(self.start_method))
+            return self._pool
+
+    def check(self, params):
+        """Raise ValueError if the job's generated stream would exceed max_stream_mib."""
+        check_stream(params["n_bits"], params["whiten"], self.max_stream_mib)
+
+    def submit(self, params):
+        self.check(params)
+        self.store.purge()
+        job = self.store.create(params)
+        pool = self.pool
+        try:
+            fut = pool.submit(run_job, str(self.store.root), job["id"], self.ttl_s)
+        except BrokenProcessPool:
+            # a worker died since the last submit; start a fresh pool
+            self._reset_pool(pool)
+            pool = self.pool
+            fut = pool.submit(run_job, str(self.store.root), job["id"], self.ttl_s)
+        self._futures[job["id"]] = fut
+        fut.add_done_callback(lambda f, jid=job["id"], p=pool: self._finished(jid, f, p))
+        return job
+
+    def _finished(self, job_id, fut, pool):
+        # run_job records its own outcome; this catches jobs whose worker died (OOM kill,
+        # segfault) or that a pool reset cancelled, which would otherwise stay queued/running
+        self._futures.pop(job_id, None)
+        exc = None if fut.cancelled() else fut.exception()
+        if isinstance(exc, BrokenProcessPool):
+            self._reset_pool(pool)
+        job = self.store.get(job_id)
+        if job is None or job["state"] in FINAL_STATES:
+            return
+        if fut.cancelled():
+            if self.store.cancel_requested(job_id):
+                self.store.update(job_id, state="cancelled")
+            else:
+                self.store.update(job_id, state="error", error="worker pool restarted before the job ran")
+        elif exc is not None:
+            self.store.update(job_id, state="error", error=f"{type(exc).__name__}: {exc}")
+
+    def _reset_pool(self, broken):
+        # several jobs can see the same broken pool; only the first replaces it
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.store.get(job_id)
+        if job is None or job["state"] in FINAL_STATES:
+            return job
+        self.store.request_cancel(job_id)
+        fut = self._futures.get(job_id)
+        if fut is not None and fut.cancel():
+            return self.store.update(job_id, state="cancelled")
+        return self.store.get(job_id)
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
@@ -1,4 +1,5 @@
 import json, math, argparse, hashlib, struct, random, numpy as np
+from qlx_metrics import timed, stage
 
 SQRT2 = math.sqrt(2.0)
 def normal_cdf(z): return 0.5*(1.0 + math.erf(z/SQRT2))
@@ -10,12 +11,14 @@ def wilson_hilferty_p_upper_chi2(x, k):
     return 0.5*erfc(z/SQRT2)
 
 # stream
+@timed("logistic_map")
 def logistic_map(n, r=3.99, x0=0.372, burn=1024):
     x = np.empty(n+burn); x[0] = x0
     for i in range(1, n+burn):
         x[i] = r*x[i-1]*(1 - x[i-1])
     return x[burn:]
 
+@timed("harmonic_comb")
 def harmonic_comb(n, freqs, fs=1.0, phi=1.61803398875, phase_seed=0xBEEF):
     rng = random.Random(phase_seed)
     t = np.arange(n)/fs
@@ -27,6 +30,8 @@ def harmonic_comb(n, freqs, fs=1.0, phi=1.61803398875, phase_seed=0xBEEF):
     s /= (wtot + 1e-15)
     return s
 
+PSUB_K = 256  # substreams in psub-v1; part of the version, never change it
+
 def default_stream(seed_phrase, n):
     h = hashlib.sha256(seed_phrase.encode()).digest()
     x0 = struct.unpack(">I", h[:4])[0] / 2**32
@@ -37,6 +42,40 @@ def default_stream(seed_phrase, n):
     blend = chaos + 0.30*carriers
     return (blend - np.mean(blend)) / (np.std(blend) + 1e-12)
 
+@timed("psub_stream")
+def psub_stream(seed_phrase, n, k=PSUB_K, r=3.99, burn=2048):
+    """
+    "psub-v1": k logistic substreams with seeds from sha256(seed | "/psub-v1/" | j), advanced
+    in lockstep as one float64 vector and interleaved sample by sample (sample t comes from
+    substream t % k). Each step is the same r*x*(1-x) as logistic_map, element-wise, so the
+    output is bit-for-bit reproducible. The harmonic comb of default_stream is left out: at
+    integer sample times with fs=1 its integer-frequency carriers are constant.
+    """
+    seeds = [hashlib.sha256(seed_phrase.encode() + b"/psub-v1/" + j.to_bytes(4, "big")).digest() for j in range(k)]
+    x = 0.2 + 0.6*np.array([struct.unpack(">I", h[:4])[0] / 2**32 for h in seeds])
+    m = (n + k - 1)//k
+    out = np.empty((m, k))
+    tmp = np.empty(k)
+    for _ in range(burn):
+        x = r*x*(1 - x)
+    for i in range(m):
+        np.subtract(1.0, x, out=tmp)
+        np.multiply(r, x, out=x)
+        np.multiply(x, tmp, out=x)
+        out[i] = x
+    chaos = out.reshape(-1)[:n]
+    return (chaos - np.mean(chaos)) / (np.std(chaos) + 1e-12)
+
+GENERATORS = {"logistic-v1": default_stream, "psub-v1": psub_stream}
+
+def make_stream(seed_phrase, n, generator="logistic-v1"):
+    """Stream of n samples from a versioned generator; logistic-v1 is default_stream."""
+    try:
+        return GENERATORS[generator](seed_phrase, n)
+    except KeyError:
+        raise ValueError(f"unknown generator {generator!r}; expected one of {', '.join(GENERATORS)}") from None
+
+@timed("whiten")
 def stream_to_bits(x, thresh=0.0, whiten="none"):
     raw = (x > thresh).astype(np.uint8)
     if whiten == "none": return raw
@@ -98,7 +137,11 @@ def cusum_forward(bits):
     if n == 0: return {"p": 0.0, "stat": 0.0}
     y = bits.astype(np.int64)*2 - 1
     s = np.cumsum(y)
-    z = float(np.max(np.abs(s)))
+    return _cusum_p(n, np.max(np.abs(s)))
+
+def _cusum_p(n, z):
+    if n == 0: return {"p": 0.0, "stat": 0.0}
+    z = float(z)
     if z == 0.0: return {"p": 1.0, "stat": 0.0}
     t = z/math.sqrt(n)
     kmin1 = int(math.ceil((-n/z + 1.0)/4.0))
@@ -126,70 +169,256 @@ def dft_spectral(bits):
     return {"p": float(p), "stat": float(d), "N1": int(N1), "T": float(T)}
 
 
-def approx_entropy(bits, m=2):
-    n = len(bits)
-    if n < (m+1):
-        return {"p": 0.0, "stat": 0.0, "note": "short"}
-    def phi(mm):
-        k = 1 << mm
-        counts = np.zeros(k, dtype=np.int64)
-        mask = k - 1
-        val = 0
-        # extend by mm to allow b[i+mm] up to i = n-1
-        b = np.concatenate([bits, bits[:mm]])
-        # init window
-        for i in range(mm):
-            val = ((val << 1) & mask) | int(b[i])
-        # slide over n positions
-        for i in range(n):
-            val = ((val << 1) & mask) | int(b[i + mm])
-            counts[val] += 1
-        probs = counts / float(n)
-        nz = probs > 0
-        return float(np.sum(probs[nz] * np.log(probs[nz])))
-    phi_m  = phi(m)
-    phi_m1 = phi(m + 1)
-    ApEn = phi_m - phi_m1
+def _window_counts(a, L):
+    # counts of each big-endian L-bit pattern over the overlapping windows of a 0/1 array
+    k = max(len(a) - L + 1, 0)
+    v = np.zeros(k, dtype=np.uint8 if L <= 8 else np.int64)
+    for j in range(L):
+        v = (v << 1) | a[j:j+k]
+    if L <= 4:  # a few compares beat bincount's widening copy
+        return np.array([np.count_nonzero(v == p) for p in range(1 << L)], dtype=np.int64)
+    return np.bincount(v, minlength=1 << L).astype(np.int64)
+
+def _phi(counts, n):
+    probs = counts / float(n)
+    nz = probs > 0
+    return float(np.sum(probs[nz] * np.log(probs[nz])))
+
+def _approx_entropy_result(counts_m, counts_m1, n, m):
+    ApEn = _phi(counts_m, n) - _phi(counts_m1, n)
     chi2 = 2.0 * n * (math.log(2) - ApEn)
     df = (1 << m) - 1
     p = wilson_hilferty_p_upper_chi2(chi2, df)
     return {"p": float(p), "stat": float(chi2), "ApEn": float(ApEn), "df": int(df)}
 
+def approx_entropy(bits, m=2):
+    n = len(bits)
+    if n < (m+1):
+        return {"p": 0.0, "stat": 0.0, "note": "short"}
+    # overlapping (m+1)-bit patterns, wrapping around the end of the sequence; every
+    # m-bit window is the prefix of exactly one of them
+    c1 = _window_counts(np.concatenate([bits, bits[:m]]).astype(np.uint8, copy=False), m + 1)
+    return _approx_entropy_result(c1.reshape(-1, 2).sum(axis=1), c1, n, m)
 
-def run_suite(bits, alpha=0.01, block_M=256):
-    results, fails = {}, []
-    r = freq_monobit(bits); results["frequency_monobit"] = r
-    if r["p"] < alpha: fails.append("frequency_monobit")
-    r = block_frequency(bits, M=block_M); results["block_frequency"] = r
-    if r["p"] < alpha: fails.append("block_frequency")
-    r = runs_test(bits); results["runs_test"] = r
-    if r["p"] < alpha: fails.append("runs_test")
-    r = cusum_forward(bits); results["cusum_forward"] = r
-    if r["p"] < alpha: fails.append("cusum_forward")
-    r = dft_spectral(bits); results["dft_spectral"] = r
-    if r["p"] < alpha: fails.append("dft_spectral")
-    r = approx_entropy(bits, m=2); results["approx_entropy_m2"] = r
-    if r["p"] < alpha: fails.append("approx_entropy_m2")
+
+SUITE_TESTS = [
+    ("frequency_monobit", lambda bits, M: freq_monobit(bits)),
+    ("block_frequency",   lambda bits, M: block_frequency(bits, M=M)),
+    ("runs_test",         lambda bits, M: runs_test(bits)),
+    ("cusum_forward",     lambda bits, M: cusum_forward(bits)),
+    ("dft_spectral",      lambda bits, M: dft_spectral(bits)),
+    ("approx_entropy_m2", lambda bits, M: approx_entropy(bits, m=2)),
+]
+
+def iter_suite(bits, block_M=256):
+    """Yield (test_name, result) for each test in suite order, for progress reporting."""
+    for name, fn in SUITE_TESTS:
+        with stage(f"sts_{name}"):
+            r = fn(bits, block_M)
+        yield name, r
+
+def summarize_suite(results, n_bits, alpha=0.01, block_M=256):
+    fails = [k for k in results if results[k]["p"] < alpha]
     min_p = min((results[k]["p"] for k in results if "p" in results[k]), default=1.0)
     return {
         "suite": "qlx-sts-min",
         "alpha": alpha,
-        "n_bits": int(len(bits)),
+        "n_bits": int(n_bits),
         "block_M": block_M,
         "results": results,
         "summary": {"all_pass": len(fails)==0, "min_p": float(min_p), "failures": fails}
     }
 
+def run_suite(bits, alpha=0.01, block_M=256):
+    results = dict(iter_suite(bits, block_M=block_M))
+    return summarize_suite(results, len(bits), alpha=alpha, block_M=block_M)
+
+# ---------- external bit sources ----------
+# Captures (hardware RNG dumps, other generators) are memory-mapped and read in chunks,
+# so only one chunk of unpacked bits is in Python memory at a time.
+BIT_FORMATS = ("packed", "bytes", "ascii")  # 8 bits per byte | one 0/1 byte per bit | '0'/'1' characters
+
+def bit_file_len(path, fmt="packed", offset=0):
+    """Number of bits available in a capture after `offset` bytes."""
+    import os
+    size = max(os.path.getsize(path) - offset, 0)
+    return size * 8 if fmt == "packed" else size
+
+def open_bits(path, fmt="packed", offset=0, n_bits=None):
+    """Read-only memmap over the capture's bytes: (array, n_bits). Nothing is read until sliced."""
+    if fmt not in BIT_FORMATS:
+        raise ValueError(f"unknown bit format {fmt!r}; expected one of {', '.join(BIT_FORMATS)}")
+    avail = bit_file_len(path, fmt, offset)
+    n = avail if n_bits is None else int(n_bits)
+    if n > avail:
+        raise ValueError(f"{path}: {n} bits requested after offset {offset}, only {avail} available")
+    nbytes = (n + 7)//8 if fmt == "packed" else n
+    if nbytes == 0:
+        return np.zeros(0, dtype=np.uint8), 0
+    return np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(nbytes,)), n
+
+def iter_bit_chunks(path, fmt="packed", offset=0, n_bits=None, bitorder="big", chunk_bits=1 << 22):
+    """Yield 0/1 uint8 arrays of up to chunk_bits bits from a capture, in order."""
+    mm, n = open_bits(path, fmt, offset, n_bits)
+    chunk_bits = max(8, chunk_bits//8*8)
+    for start in range(0, n, chunk_bits):
+        stop = min(start + chunk_bits, n)
+        if fmt == "packed":
+            yield np.unpackbits(mm[start//8:(stop + 7)//8], bitorder=bitorder)[:stop - start]
+        elif fmt == "bytes":
+            yield np.asarray(mm[start:stop]) & 1
+        else:
+            yield (np.asarray(mm[start:stop]) == ord("1")).astype(np.uint8)
+
+def iter_array_chunks(bits, chunk_bits=1 << 22):
+    for i in range(0, len(bits), chunk_bits):
+        yield bits[i:i+chunk_bits]
+
+class StreamSuite:
+    """
+    The SUITE_TESTS battery as one pass over bit chunks, with per-test accumulators
+    (counts, transitions, partial sums, window patterns) instead of whole-sequence arrays.
+    Results equal run_suite on the concatenated bits, except that the DFT test runs on
+    the first dft_max_bits bits only (noted in its result when it is capped).
+    """
+
+    def __init__(self, block_M=256, dft_max_bits=1 << 22, apen_m=2):
+        self.M, self.dft_max, self.m = block_M, dft_max_bits, apen_m
+        self.n = self.ones = self.transitions = 0
+        self.last = None                           # last bit seen, for runs across chunks
+        self.block_rem = np.zeros(0, np.uint8)     # partial block carried to the next chunk
+        self.block_N, self.block_sq = 0, 0         # sum of (2*ones - M)^2 over whole blocks
+        self.S = self.z = 0                        # cusum: running sum and max |S|
+        self.dft = []
+        self.dft_n = 0
+        self.head = np.zeros(0, np.uint8)          # first m bits, for the wrap-around windows
+        self.tail = np.zeros(0, np.uint8)          # last m bits seen
+        self.apen = np.zeros(1 << (apen_m + 1), np.int64)  # (m+1)-bit window counts
+
+    def update(self, bits):
+        bits = np.asarray(bits, dtype=np.uint8)
+        if bits.size == 0:
+            return
+        self.ones += int(np.count_nonzero(bits))
+        # runs
+        self.transitions += int(np.count_nonzero(bits[1:] != bits[:-1]))
+        if self.last is not None and bits[0] != self.last:
+            self.transitions += 1
+        self.last = bits[-1]
+        # block frequency
+        b = np.concatenate([self.block_rem, bits]) if self.block_rem.size else bits
+        N = len(b)//self.M
+        if N:
+            c = b[:N*self.M].reshape(N, self.M).sum(axis=1, dtype=np.int64)
+            self.block_sq += int(np.sum((2*c - self.M)**2))
+            self.block_N += N
+        self.block_rem = b[N*self.M:].copy()
+        # cusum forward: chunk-local partial sums, offset by the running total
+        s = np.cumsum(bits.view(np.int8)*2 - 1, dtype=np.int64 if bits.size >= 1 << 31 else np.int32)
+        self.z = max(self.z, abs(self.S + int(s.max())), abs(self.S + int(s.min())))
+        self.S += int(s[-1])
+        # dft prefix
+        if self.dft_n < self.dft_max:
+            take = bits[:self.dft_max - self.dft_n]
+            self.dft.append(take.copy()); self.dft_n += len(take)
+        # approximate entropy: windows ending in this chunk
+        if self.head.size < self.m:
+            self.head = np.concatenate([self.head, bits[:self.m - self.head.size]])
+        a = np.concatenate([self.tail, bits])
+        self.apen += _window_counts(a, self.m + 1)
+        self.tail = a[-self.m:].copy()
+        self.n += len(bits)
+
+    def _apen(self):
+        n, m = self.n, self.m
+        if n < m + 1:
+            return {"p": 0.0, "stat": 0.0, "note": "short"}
+        # plus the m windows that wrap from the end of the sequence to its start
+        c1 = self.apen + _window_counts(np.concatenate([self.tail, self.head]), m + 1)
+        return _approx_entropy_result(c1.reshape(-1, 2).sum(axis=1), c1, n, m)
+
+    def results(self):
+        n = self.n
+        out = {}
+        if n == 0:
+            out["frequency_monobit"] = {"p": 0.0, "stat": 0.0}
+        else:
+            sobs = abs(2*self.ones - n)/math.sqrt(n)
+            out["frequency_monobit"] = {"p": float(erfc(sobs/SQRT2)), "stat": float(sobs)}
+        if self.block_N == 0:
+            out["block_frequency"] = {"p": 0.0, "stat": 0.0, "note": "short"}
+        else:
+            chi2 = self.block_sq / self.M
+            out["block_frequency"] = {"p": float(wilson_hilferty_p_upper_chi2(chi2, self.block_N)), "stat": float(chi2),
+                                      "N": int(self.block_N), "M": int(self.M)}
+        if n < 2:
+            out["runs_test"] = {"p": 0.0, "stat": 0.0, "note": "short"}
+        else:
+            pi = self.ones / n
+            if abs(pi - 0.5) >= 2.0/math.sqrt(n):
+                out["runs_test"] = {"p": 0.0, "stat": float(pi), "note": "pi off 0.5"}
+            else:
+                v = 1 + self.transitions
+                p = erfc(abs(v - 2.0*n*pi*(1.0 - pi)) / (2.0*math.sqrt(2.0*n)*pi*(1.0 - pi)))
+                out["runs_test"] = {"p": float(p), "stat": int(v), "pi": pi}
+        out["cusum_forward"] = _cusum_p(n, self.z)
+        bits = np.concatenate(self.dft) if self.dft else np.zeros(0, np.uint8)
+        out["dft_spectral"] = dft_spectral(bits)
+        if self.dft_n < n:
+            out["dft_spectral"]["note"] = f"first {self.dft_n} of {n} bits"
+        out["approx_entropy_m2"] = self._apen()
+        return out
+
+def run_suite_stream(chunks, alpha=0.01, block_M=256, dft_max_bits=1 << 22):
+    """run_suite over an iterable of 0/1 chunks (e.g. iter_bit_chunks) in one pass."""
+    suite = StreamSuite(block_M=block_M, dft_max_bits=dft_max_bits)
+    with stage("sts_stream"):
+        for c in chunks:
+            suite.update(c)
+        results = suite.results()
+    rep = summarize_suite(results, suite.n, alpha=alpha, block_M=block_M)
+    rep["dft_bits"] = suite.dft_n
+    return rep
+
+def run_suite_file(path, fmt="packed", offset=0, n_bits=None, bitorder="big", alpha=0.01, block_M=256,
+                   dft_max_bits=1 << 22, chunk_bits=1 << 22):
+    """run_suite_stream over a memory-mapped capture; the report records where the bits came from."""
+    rep = run_suite_stream(iter_bit_chunks(path, fmt, offset, n_bits, bitorder, chunk_bits),
+                           alpha=alpha, block_M=block_M, dft_max_bits=dft_max_bits)
+    rep["source"] = {"bits_file": path, "format": fmt, "offset": offset, "bitorder": bitorder}
+    return rep
+
+def add_bits_file_args(ap):
+    """--bits-file and friends, shared by this script and `qlx sts`."""
+    ap.add_argument("--bits-file", default="", help="test a captured bit file (memory-mapped, streamed) instead of the generator")
+    ap.add_argument("--format", choices=BIT_FORMATS, default="packed")
+    ap.add_argument("--offset", type=int, default=0, help="bytes to skip at the start of --bits-file")
+    ap.add_argument("--bitorder", choices=["big","little"], default="big", help="bit order within a packed byte")
+    ap.add_argument("--dft-max-bits", type=int, default=1 << 22, help="DFT test on this many leading bits of a capture")
+    ap.add_argument("--chunk-bits", type=int, default=1 << 22)
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--seed", type=str, default="qlx-demo-seed-phi369")
-    ap.add_argument("--n-bits", type=int, default=200000)
+    ap.add_argument("--n-bits", type=int, default=None, help="default: 200000 generated, or the whole --bits-file")
     ap.add_argument("--alpha", type=float, default=0.01)
     ap.add_argument("--block-M", type=int, default=256)
     ap.add_argument("--whiten", type=str, default="sha512", choices=["none","vn","sha512"])
+    ap.add_argument("--generator", default="logistic-v1", choices=list(GENERATORS), help="versioned bit-stream generator")
     ap.add_argument("--json-out", type=str, default="")
+    add_bits_file_args(ap)
     args = ap.parse_args()
 
+    if args.bits_file:
+        report = run_suite_file(args.bits_file, args.format, args.offset, args.n_bits, args.bitorder, alpha=args.alpha,
+                                block_M=args.block_M, dft_max_bits=args.dft_max_bits, chunk_bits=args.chunk_bits)
+        js = json.dumps(report, indent=2)
+        if args.json_out:
+            with open(args.json_out, "w") as f: f.write(js)
+        print(js)
+        raise SystemExit(0 if report["summary"]["all_pass"] else 2)
+    if args.n_bits is None:
+        args.n_bits = 200000
     if args.whiten == "sha512":
         chunk_in, chunk_out = 4096, 512
         need_chunks = (args.n_bits + chunk_out - 1)//chunk_out
@@ -197,9 +426,10 @@ def main():
     else:
         n_stream = args.n_bits
 
-    stream = default_stream(args.seed, n=n_stream)
+    stream = make_stream(args.seed, n_stream, args.generator)
     bits = stream_to_bits(stream, whiten=args.whiten)[:args.n_bits]
     report = run_suite(bits, alpha=args.alpha, block_M=args.block_M)
+    report["generator"] = args.generator
     js = json.dumps(report, indent=2)
     if args.json_out:
         with open(args.json_out, "w") as f: f.write(js)
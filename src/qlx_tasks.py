@@ -0,0 +1,70 @@
+# CPU-bound work units for the API. Top-level functions so they can run in a process pool.
+from qlx_hfp_prototype import assemble_hfp, assemble_hfp_bundle, derive_key_from_hfp, derive_key_scrypt
+try:
+    from qlx_hfp_prototype import derive_key_argon2id, HAVE_ARGON2
+except Exception:
+    HAVE_ARGON2 = False
+from qlx_photonic_control import photonic_map, make_envelope
+from qlx_sts_min import make_stream, stream_to_bits, run_suite
+
+def hfp_task(seed, levels):
+    h = assemble_hfp(seed, levels=levels)
+    return {"fingerprint_hash": h["fingerprint_hash"], "version": h["version"], "levels": h["levels"]}
+
+def hfp_levels_task(seed, levels):
+    hfps = assemble_hfp_bundle(seed, levels)
+    return {"seed": seed, "hfps": [{"levels": L, "version": h["version"], "fingerprint_hash": h["fingerprint_hash"],
+                                    "band_stats": h["band_stats"]} for L, h in hfps.items()]}
+
+def key_task(seed, levels, kdf, password, length, time_cost=None, memory_kib=None, parallelism=None):
+    h = assemble_hfp(seed, levels=levels)
+    pw = password.encode()
+    if kdf == "hkdf":
+        k = derive_key_from_hfp(pw, h["fingerprint_hash"], key_len=length)
+    elif kdf == "scrypt":
+        k = derive_key_scrypt(pw, h["fingerprint_hash"], key_len=length)
+    else:
+        k = derive_key_argon2id(pw, h["fingerprint_hash"], key_len=length,
+                                time_cost=time_cost, memory_cost_kib=memory_kib, parallelism=parallelism)
+    return {"fingerprint_hash": h["fingerprint_hash"], "kdf": kdf, "key_hex": k.hex()}
+
+def kdf_memory_bytes(kdf, memory_kib=None, scrypt_n=1 << 14, scrypt_r=8):
+    """Peak KDF working memory: Argon2id holds memory_kib, scrypt about 128*r*N bytes."""
+    if kdf == "argon2id":
+        return int(memory_kib) * 1024
+    if kdf == "scrypt":
+        return 128 * scrypt_r * scrypt_n
+    return 0
+
+def envelope_task(seed, levels, dac_bits, sample_gsa, quant):
+    """Unsigned envelope; signing stays with the caller's keyring."""
+    h = assemble_hfp(seed, levels=levels)
+    params = photonic_map(h["band_stats"])
+    return make_envelope(h, params, dac_bits=dac_bits, sample_rate_GSa=sample_gsa, quant_mode=quant)
+
+def sts_stream_len(n_bits, whiten):
+    if whiten == "sha512":
+        chunk_in, chunk_out = 4096, 512
+        need_chunks = (n_bits + chunk_out - 1)//chunk_out
+        return need_chunks*chunk_in
+    return n_bits
+
+def sts_task(seed, n_bits, alpha, block_M, whiten, generator="logistic-v1"):
+    stream = make_stream(seed, sts_stream_len(n_bits, whiten), generator)
+    bits = stream_to_bits(stream, whiten=whiten)[:n_bits]
+    rep = run_suite(bits, alpha=alpha, block_M=block_M)
+    rep["generator"] = generator
+    return rep
+
+def sts_file_task(path, fmt="packed", offset=0, n_bits=None, bitorder="big", alpha=0.01, block_M=256, dft_max_bits=1 << 22):
+    from qlx_sts_min import run_suite_file
+    return run_suite_file(path, fmt, offset, n_bits, bitorder, alpha=alpha, block_M=block_M, dft_max_bits=dft_max_bits)
+
+def warm_task(n_bits=10_000):
+    """Prime imports, NumPy code paths and per-process caches with one small run of each route."""
+    import os
+    hfp_task("qlx-warmup", 5)
+    key_task("qlx-warmup", 5, "hkdf", "warmup", 32)
+    envelope_task("qlx-warmup", 5, 14, 64, "nearest")
+    sts_task("qlx-warmup", n_bits, 0.01, 256, "sha512")
+    return os.getpid()
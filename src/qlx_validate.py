@@ -0,0 +1,192 @@
+import re, json, pathlib, functools
+import numpy as np
+from qlx_photonic_control import PARAM_RANGES
+
+# Envelope validation shared by the service, the verify scripts and the batch verifier.
+# The schema is compiled once per process; length and range checks run on one
+# (params x bands) array instead of per-list min/max.
+
+SCHEMA_PATH = pathlib.Path(__file__).resolve().parent.parent / "schemas" / "qlx_photonic_control.schema.json"
+PARAM_KEYS = tuple(PARAM_RANGES)
+BOUNDS = dict(PARAM_RANGES)
+
+_LO = np.array([BOUNDS[k][0] for k in PARAM_KEYS])
+_HI = np.array([BOUNDS[k][1] for k in PARAM_KEYS])
+
+# ---------- schema ----------
+# jsonschema walks the schema for every value (~10 us per node), which is most of the
+# cost of checking an envelope. The keywords the envelope schema uses are compiled into
+# plain closures for the accept path; jsonschema only runs to explain a rejection, or
+# when the schema uses a keyword not compiled here.
+_TYPES = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: (isinstance(v, int) and not isinstance(v, bool)) or (isinstance(v, float) and v.is_integer()),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+_ANNOTATIONS = {"$schema", "$id", "title", "description", "$comment", "examples", "default"}
+
+class _Unsupported(Exception):
+    pass
+
+def _compile(schema):
+    checks = []
+    add = checks.append
+    for kw, arg in schema.items():
+        if kw in _ANNOTATIONS:
+            continue
+        if kw == "type":
+            add(_TYPES[arg])
+        elif kw == "enum":
+            add(lambda v, arg=arg: any(v == e and isinstance(v, bool) == isinstance(e, bool) for e in arg))
+        elif kw == "minimum":
+            add(lambda v, arg=arg: not _TYPES["number"](v) or v >= arg)
+        elif kw == "pattern":
+            rx = re.compile(arg)
+            add(lambda v, rx=rx: not isinstance(v, str) or rx.search(v) is not None)
+        elif kw == "required":
+            add(lambda v, arg=tuple(arg): not isinstance(v, dict) or all(k in v for k in arg))
+        elif kw == "items":
+            item = _compile(arg)
+            add(lambda v, item=item: not isinstance(v, list) or all(map(item, v)))
+        elif kw == "properties":
+            props = {k: _compile(sub) for k, sub in arg.items()}
+            add(lambda v, props=props: not isinstance(v, dict)
+                or all(props[k](v[k]) for k in props.keys() & v.keys()))
+        elif kw == "additionalProperties" and isinstance(arg, bool):
+            if not arg:
+                allowed = frozenset(schema.get("properties", {}))
+                add(lambda v, allowed=allowed: not isinstance(v, dict) or v.keys() <= allowed)
+        else:
+            raise _Unsupported(kw)
+    if len(checks) == 1:
+        return checks[0]
+    return lambda v: all(c(v) for c in checks)
+
+@functools.lru_cache(maxsize=None)
+def validator(path=None):
+    """Compiled jsonschema validator for the envelope schema, built on first use and cached."""
+    from jsonschema.validators import validator_for
+    schema = json.loads(pathlib.Path(path or SCHEMA_PATH).read_text())
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+@functools.lru_cache(maxsize=None)
+def fast_is_valid(path=None):
+    """Plain-Python accept check equivalent to validator(path).is_valid for the keywords it knows."""
+    schema = json.loads(pathlib.Path(path or SCHEMA_PATH).read_text())
+    try:
+        return _compile(schema)
+    except _Unsupported:
+        return validator(path).is_valid
+
+def schema_errors(env):
+    if fast_is_valid()(env):
+        return []
+    return [f"schema: {'/'.join(map(str, e.absolute_path)) or '<root>'}: {e.message}"
+            for e in validator().iter_errors(env)]
+
+# ---------- lengths and ranges ----------
+@functools.lru_cache(maxsize=None)
+def limits(bits):
+    """Per-param (lo, hi) after shrinking the open interval by 1 LSB, less a tiny rounding tolerance."""
+    eps = (_HI - _LO) / ((1 << bits) - 1)
+    tol = np.maximum(1e-12, eps*1e-6)
+    return _LO + eps - tol, _HI - eps + tol
+
+def _is_int(v):
+    return isinstance(v, (int, np.integer)) and not isinstance(v, bool)
+
+def _matrix(params, L):
+    # (len(PARAM_KEYS), L) float array, or None if any list is missing, ragged or not numeric
+    try:
+        a = np.array([params[k] for k in PARAM_KEYS], dtype=float)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return a if a.ndim == 2 and a.shape[1] == L else None
+
+def check_params(params, band_count, bits):
+    """(lengths_ok, ranges_ok, errors) for the param arrays of one envelope."""
+    errors = []
+    if not _is_int(band_count) or not isinstance(params, dict):
+        return False, False, ["type: band_count must be an integer and params an object"]
+    L = band_count
+    a = _matrix(params, L)
+    lengths_ok = a is not None and L > 0
+    if a is None:
+        for k in PARAM_KEYS:
+            v = params.get(k)
+            n = len(v) if isinstance(v, (list, tuple)) else 0
+            if n != L:
+                errors.append(f"length: {k} has {n} != band_count {L}")
+        if not errors:
+            errors.append("length: params are not numeric arrays")
+    elif L <= 0:
+        errors.append(f"length: band_count {L} < 1")
+
+    ranges_ok = lengths_ok
+    if lengths_ok:
+        lo, hi = limits(bits)
+        inside = ((a >= lo[:, None]) & (a <= hi[:, None])).all(axis=1)
+        ranges_ok = bool(inside.all())
+        for i in np.flatnonzero(~inside):
+            k = PARAM_KEYS[i]
+            errors.append(f"range: {k} not in ({BOUNDS[k][0]},{BOUNDS[k][1]}) open by 1 LSB")
+    return lengths_ok, ranges_ok, errors
+
+def param_extents(params):
+    """{key: (min, max)} for each param list; empty lists are skipped."""
+    return {k: (float(np.min(v)), float(np.max(v))) for k in PARAM_KEYS if len(v := params.get(k) or [])}
+
+# ---------- envelope ----------
+def structure_errors(env):
+    """Type errors in band_count, params and dac that would stop check_params from running."""
+    errors = []
+    if not _is_int(env["band_count"]):
+        errors.append(f"type: band_count must be an integer, got {type(env['band_count']).__name__}")
+    params = env["params"]
+    if not isinstance(params, dict):
+        errors.append(f"type: params must be an object, got {type(params).__name__}")
+    else:
+        for k in PARAM_KEYS:
+            if k in params and not isinstance(params[k], list):
+                errors.append(f"type: params.{k} must be an array, got {type(params[k]).__name__}")
+    dac = env["dac"]
+    if not isinstance(dac, dict):
+        errors.append(f"type: dac must be an object, got {type(dac).__name__}")
+    elif not _is_int(dac.get("width_bits", 14)) or not 2 <= dac.get("width_bits", 14) <= 32:
+        errors.append(f"type: dac.width_bits must be an integer in [2, 32], got {dac.get('width_bits')!r}")
+    return errors
+
+def check_envelope(env, schema=True):
+    """
+    Report {"ok", "checks", "errors"} for one envelope. Signatures are not checked here;
+    callers add their own sig_ok. With schema=False only the structural fields the
+    length and range checks need are required.
+    """
+    checks, errors = {}, []
+    if not isinstance(env, dict):
+        return {"ok": False, "checks": checks, "errors": ["type: envelope is not an object"]}
+    if schema:
+        errors += schema_errors(env)
+        checks["schema_ok"] = not errors
+    for k in ("band_count", "params", "dac"):
+        if k not in env:
+            errors.append(f"missing field: {k}")
+    if any(e.startswith("missing field") for e in errors):
+        return {"ok": False, "checks": checks, "errors": errors}
+    # the length and range checks index into these; a wrong shape is an error, not an exception
+    errs = structure_errors(env)
+    if errs:
+        checks["lengths_ok"] = checks["ranges_ok"] = False
+        return {"ok": False, "checks": checks, "errors": errors + errs}
+
+    bits = env["dac"].get("width_bits", 14)
+    lengths_ok, ranges_ok, errs = check_params(env["params"], env["band_count"], bits)
+    checks["lengths_ok"], checks["ranges_ok"] = lengths_ok, ranges_ok
+    errors += errs
+    return {"ok": checks.get("schema_ok", True) and lengths_ok and ranges_ok, "checks": checks, "errors": errors}
@@ -0,0 +1,135 @@
+import os, json, time, pathlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from qlx_keyring import Keyring
+from qlx_validate import check_envelope as check_fields
+
+# ---------- key material ----------
+# keys spec: a qlx_keyring dict, e.g. {"<key_id>": {"alg": "ed25519", "pub_hex": "..."} | {"alg": "hmac", "key_hex": "..."}}
+# "*ed25519" / "*hmac" entries act as a fallback for any key_id
+_KEYRING = Keyring()
+
+def load_keys(path):
+    with open(path) as f:
+        return json.load(f)
+
+def default_keys(ed25519_pub_hex="", hmac_key_hex=""):
+    keys = {}
+    if ed25519_pub_hex: keys["*ed25519"] = {"alg": "ed25519", "pub_hex": ed25519_pub_hex}
+    if hmac_key_hex: keys["*hmac"] = {"alg": "hmac", "key_hex": hmac_key_hex}
+    return keys
+
+def _init_worker(keyspec):
+    # keys are parsed once per worker process, not per envelope
+    global _KEYRING
+    _KEYRING = Keyring.from_dict(keyspec or {})
+
+# ---------- per-envelope checks ----------
+def check_envelope(env, require_sig=False, schema=False):
+    rep = check_fields(env, schema=schema)
+    if any(e.startswith("missing field") for e in rep["errors"]):
+        return rep
+    checks, errors = rep["checks"], rep["errors"]
+
+    signing = env.get("signing", {})
+    sig_ok, sig_err = _KEYRING.check(env)
+    checks["sig_alg"] = signing.get("alg", "").upper()
+    checks["sig_ok"] = sig_ok
+    if sig_err: errors.append(f"sign: {sig_err}")
+
+    sig_pass = sig_ok is True or (sig_ok is None and not require_sig)
+    return {"ok": rep["ok"] and sig_pass, "checks": checks, "errors": errors}
+
+def _verify_chunk(items, require_sig=False):
+    out = []
+    for source, text in items:
+        try:
+            env = json.loads(text)
+        except Exception as e:
+            out.append({"source": source, "ok": False, "checks": {}, "errors": [f"load error: {e}"]})
+            continue
+        rec = {"source": source, "session_id": env.get("session_id") if isinstance(env, dict) else None}
+        if not isinstance(env, dict):
+            rec.update(ok=False, checks={}, errors=["load error: envelope is not an object"])
+        else:
+            try:
+                rec.update(check_envelope(env, require_sig=require_sig))
+            except Exception as e:  # a malformed record is reported, never fatal to the audit
+                rec.update(ok=False, checks={}, errors=[f"check error: {type(e).__name__}: {e}"])
+        out.append(rec)
+    return out
+
+# ---------- sources ----------
+def iter_envelopes(paths):
+    """
+    Yield (source, raw bytes) for every envelope in .jsonl/.json files or directory trees.
+    Bytes are decoded by json.loads, so a file that is not UTF-8 fails as that record only.
+    """
+    for p in paths:
+        p = pathlib.Path(p)
+        if p.is_dir():
+            files = sorted(q for q in p.rglob("*") if q.suffix in (".json", ".jsonl") and q.is_file())
+        else:
+            files = [p]
+        for f in files:
+            if f.suffix == ".jsonl":
+                with open(f, "rb") as fh:
+                    for i, line in enumerate(fh, start=1):
+                        if line.strip():
+                            yield f"{f}:{i}", line
+            else:
+                yield str(f), f.read_bytes()
+
+def _chunks(it, size):
+    buf = []
+    for item in it:
+        buf.append(item)
+        if len(buf) >= size:
+            yield buf; buf = []
+    if buf:
+        yield buf
+
+# ---------- driver ----------
+def verify_batch(paths, keys=None, workers=None, chunk=256, out=None, require_sig=False):
+    """
+    Verify envelopes across a process pool and stream one JSON line per envelope to `out`.
+    Records are written in completion order. Returns summary counts.
+    """
+    if workers is None: workers = os.cpu_count() or 1
+    Keyring.from_dict(keys or {})  # fail fast on malformed keys before starting workers
+    summary = {"total": 0, "ok": 0, "failed": 0, "sig_verified": 0, "sig_skipped": 0, "load_errors": 0}
+    t0 = time.perf_counter()
+
+    def emit(records):
+        for r in records:
+            summary["total"] += 1
+            summary["ok" if r["ok"] else "failed"] += 1
+            sig_ok = r["checks"].get("sig_ok")
+            if sig_ok is True: summary["sig_verified"] += 1
+            elif sig_ok is None and r["checks"]: summary["sig_skipped"] += 1
+            if any(e.startswith("load error") for e in r["errors"]): summary["load_errors"] += 1
+            if out is not None:
+                out.write(json.dumps(r, separators=(",", ":")) + "\n")
+
+    chunks = _chunks(iter_envelopes(paths), chunk)
+    if workers <= 1:
+        _init_worker(keys)
+        for items in chunks:
+            emit(_verify_chunk(items, require_sig))
+    else:
+        max_inflight = workers * 4
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(keys,)) as ex:
+            inflight = set()
+            for items in chunks:
+                inflight.add(ex.submit(_verify_chunk, items, require_sig))
+                if len(inflight) >= max_inflight:
+                    done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                    for f in done: emit(f.result())
+            while inflight:
+                done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for f in done: emit(f.result())
+
+    elapsed = time.perf_counter() - t0
+    summary["workers"] = workers
+    summary["elapsed_s"] = round(elapsed, 6)
+    summary["per_s"] = round(summary["total"] / elapsed, 1) if elapsed > 0 else None
+    return summary
@@ -1,32 +1,123 @@
-import os, json
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
-from typing import Literal, Optional
-from qlx_hfp_prototype import assemble_hfp, derive_key_from_hfp, derive_key_scrypt
-try:
-    from qlx_hfp_prototype import derive_key_argon2id, HAVE_ARGON2
-except Exception:
-    HAVE_ARGON2 = False
-from qlx_photonic_control import photonic_map, make_envelope, sign_envelope_hmac, sign_envelope_ed25519, canonical_json
-from qlx_sts_min import default_stream, stream_to_bits, run_suite
-
-app = FastAPI(title="QLX HFP API", version="0.1.1")
+import os, json, asyncio, threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Annotated, Any, Literal, Optional
+from qlx_exec import Executor, Saturated
+from qlx_metrics import REGISTRY, MetricsMiddleware, stage
+
+# Only FastAPI/pydantic and stdlib load at import time. NumPy, cryptography, argon2 and
+# the STS suite are imported by the first route that needs them, or by the warm-up.
+
+# CPU-bound work runs in a bounded process pool; see qlx_exec.Executor for QLX_POOL_*/QLX_LIMIT_* config
+_EXECUTOR = None
+
+def get_executor() -> Executor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = Executor()
+    return _EXECUTOR
+
+# Long STS runs go through a local job store and worker pool; see qlx_sts_jobs.JobRunner for QLX_JOB_* config
+_JOBS = None
+
+def get_jobs():
+    global _JOBS
+    if _JOBS is None:
+        from qlx_sts_jobs import JobRunner
+        _JOBS = JobRunner()
+    return _JOBS
+
+# ---------- Warm-up ----------
+# QLX_WARMUP=1 runs one small request per route in every pool worker and loads the
+# keyring before /readyz reports ready. Without it the instance is ready at once and
+# the first requests pay the imports.
+_WARM = {"state": "off", "seconds": None, "error": None}
+
+async def warmup():
+    import time
+    _WARM.update(state="running", seconds=None, error=None)
+    t0 = time.perf_counter()
+    try:
+        def parent():
+            import qlx_tasks  # noqa: F401  (route modules, NumPy)
+            from qlx_validate import fast_is_valid
+            fast_is_valid()  # compile the envelope schema
+            get_keyring()
+        await asyncio.to_thread(parent)
+        from qlx_tasks import warm_task
+        ex = get_executor()
+        loop = asyncio.get_running_loop()
+        # one call per worker of both pools so every process is spawned and primed
+        await asyncio.gather(*[loop.run_in_executor(ex.pool, warm_task) for _ in range(max(1, ex.workers))],
+                             *[loop.run_in_executor(ex.heavy_pool, warm_task) for _ in range(ex.heavy_workers)])
+        _WARM.update(state="done")
+    except Exception as e:
+        _WARM.update(state="failed", error=f"{type(e).__name__}: {e}")
+    _WARM["seconds"] = round(time.perf_counter() - t0, 3)
+
+@asynccontextmanager
+async def lifespan(app):
+    task = None
+    if os.environ.get("QLX_WARMUP", "0") not in ("", "0", "false"):
+        _WARM["state"] = "pending"
+        task = asyncio.create_task(warmup())
+    yield
+    if task is not None:
+        task.cancel()
+    global _EXECUTOR, _JOBS
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(); _EXECUTOR = None
+    if _JOBS is not None:
+        _JOBS.shutdown(); _JOBS = None
+
+app = FastAPI(title="QLX HFP API", version="0.1.1", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(Saturated)
+async def saturated_handler(request: Request, exc: Saturated):
+    return JSONResponse(status_code=exc.status, content={"detail": exc.detail},
+                        headers={"Retry-After": str(exc.retry_after)})
 
 def _env_int(key: str, default: int) -> int:
     try: return int(os.environ.get(key, default))
     except Exception: return default
 
+# Signing keys are parsed once per process; call reset_keyring() after rotating secrets
+_KEYRING = None
+_KEYRING_LOCK = threading.Lock()
+
+def get_keyring():
+    global _KEYRING
+    if _KEYRING is None:
+        with _KEYRING_LOCK:
+            if _KEYRING is None:
+                from qlx_keyring import Keyring
+                _KEYRING = Keyring.from_env()
+    return _KEYRING
+
+def reset_keyring():
+    global _KEYRING
+    with _KEYRING_LOCK:
+        _KEYRING = None
+
 # ---------- Schemas ----------
 class HFPReq(BaseModel):
     seed: str = Field(default="qlx-demo-seed-phi369")
     levels: int = Field(default=5, ge=1, le=10)
 
+class HFPLevelsReq(BaseModel):
+    seed: str = Field(default="qlx-demo-seed-phi369")
+    levels: list[Annotated[int, Field(ge=1, le=10)]] = Field(default_factory=lambda: list(range(1, 11)),
+                                                             min_length=1, max_length=10)
+
 class KeyReq(HFPReq):
     kdf: Literal["argon2id","scrypt","hkdf"] = "argon2id"
     length: int = Field(default=32, ge=16, le=64)
-    time_cost: Optional[int] = None
-    memory_kib: Optional[int] = None
-    parallelism: Optional[int] = None
+    time_cost: Optional[int] = Field(default=None, ge=1)
+    memory_kib: Optional[int] = Field(default=None, ge=8)  # argon2's floor is 8 KiB per lane
+    parallelism: Optional[int] = Field(default=None, ge=1)
     password: str = Field(default="demo-password")
 
 class EnvReq(HFPReq):
@@ -37,73 +128,215 @@ class EnvReq(HFPReq):
 
 class STSReq(BaseModel):
     seed: str = "qlx-demo-seed-phi369"
-    n_bits: int = Field(default=200_000, ge=10_000)
+    # the whole stream is held in memory; the routes also cap it by QLX_JOB_MAX_STREAM_MIB
+    n_bits: int = Field(default=200_000, ge=10_000, le=100_000_000)
     alpha: float = Field(default=0.01, ge=0.0001, le=0.1)
     block_M: int = Field(default=256, ge=8)
     whiten: Literal["none","vn","sha512"] = "sha512"
+    generator: Literal["logistic-v1","psub-v1"] = "logistic-v1"
+
+class STSJobReq(STSReq):
+    n_bits: int = Field(default=2_000_000, ge=10_000, le=100_000_000)
 
 # ---------- Routes ----------
+# Cheap routes are async and answer on the event loop; heavy ones await the executor.
 @app.get("/")
-def root():
+async def root():
     return {"ok": True}
 
 @app.get("/healthz")
-def healthz():
+async def healthz():
     return {"ok": True}
 
-@app.post("/hfp")
-def hfp(req: HFPReq):
-    h = assemble_hfp(req.seed, levels=req.levels)
-    return {"fingerprint_hash": h["fingerprint_hash"], "version": h["version"], "levels": h["levels"]}
+async def _hfp_one(req: HFPReq):
+    from qlx_tasks import hfp_task
+    return await get_executor().run("hfp", hfp_task, req.seed, req.levels)
 
-@app.post("/key")
-def key(req: KeyReq):
-    h = assemble_hfp(req.seed, levels=req.levels)
-    pw = req.password.encode()
-    if req.kdf == "hkdf":
-        k = derive_key_from_hfp(pw, h["fingerprint_hash"], key_len=req.length)
-    elif req.kdf == "scrypt":
-        k = derive_key_scrypt(pw, h["fingerprint_hash"], key_len=req.length)
-    else:
+async def _key_one(req: KeyReq):
+    from qlx_tasks import HAVE_ARGON2, key_task, kdf_memory_bytes
+    tc = mk = pl = None
+    if req.kdf == "argon2id":
         if not HAVE_ARGON2:
             raise HTTPException(status_code=400, detail="argon2-cffi not installed")
         # Env defaults if fields are None
         tc = req.time_cost if req.time_cost is not None else _env_int("ARGON2_TIME_COST", 2)
         mk = req.memory_kib if req.memory_kib is not None else _env_int("ARGON2_MEMORY_KIB", 65536)
         pl = req.parallelism if req.parallelism is not None else _env_int("ARGON2_PARALLELISM", 1)
-        k = derive_key_argon2id(pw, h["fingerprint_hash"], key_len=req.length, time_cost=tc, memory_cost_kib=mk, parallelism=pl)
-    return {"fingerprint_hash": h["fingerprint_hash"], "kdf": req.kdf, "key_hex": k.hex()}
+        cap = _env_int("ARGON2_MAX_MEMORY_KIB", 262144)
+        if mk > cap:
+            raise HTTPException(status_code=422, detail=f"memory_kib {mk} exceeds ARGON2_MAX_MEMORY_KIB={cap}")
+        if mk < 8 * pl:
+            raise HTTPException(status_code=422, detail=f"memory_kib {mk} is below 8 KiB per lane for parallelism {pl}")
+    # KDF memory is charged against the process-wide budget before the call is queued
+    ex, need = get_executor(), kdf_memory_bytes(req.kdf, mk)
+    if need > ex.memory.total:
+        raise HTTPException(status_code=422, detail=f"{req.kdf} needs {need >> 20} MiB, over the "
+                                                    f"{ex.memory.total >> 20} MiB KDF memory budget")
+    return await ex.run_charged("key", need, key_task, req.seed, req.levels, req.kdf, req.password, req.length,
+                                time_cost=tc, memory_kib=mk, parallelism=pl)
 
-@app.post("/envelope")
-def envelope(req: EnvReq):
-    h = assemble_hfp(req.seed, levels=req.levels)
-    params = photonic_map(h["band_stats"])
-    env = make_envelope(h, params, dac_bits=req.dac_bits, sample_rate_GSa=req.sample_gsa, quant_mode=req.quant)
-    alg = os.environ.get("SIGN_ALG","hmac").lower()
-    if alg == "ed25519":
-        priv_hex = os.environ.get("ED25519_PRIV_HEX","")
-        if not priv_hex:
+async def _envelope_one(req: EnvReq):
+    from qlx_tasks import envelope_task
+    from qlx_photonic_control import canonical_json
+    from qlx_validate import check_envelope
+    kr = get_keyring()
+    if req.key_id not in kr:
+        if not kr.legacy:
+            raise HTTPException(status_code=400, detail=f"unknown key_id {req.key_id!r}")
+        if not kr.active:
             raise HTTPException(status_code=500, detail="ED25519_PRIV_HEX not set")
-        signed = sign_envelope_ed25519(env, priv_hex=priv_hex, key_id=req.key_id)
+    env = await get_executor().run("envelope", envelope_task, req.seed, req.levels,
+                                   req.dac_bits, req.sample_gsa, req.quant)
+    # never sign an envelope a controller would reject
+    with stage("validate_envelope"):
+        rep = check_envelope(env)
+    if not rep["ok"]:
+        raise HTTPException(status_code=500, detail={"error": "invalid envelope", "errors": rep["errors"]})
+    if req.key_id in kr:
+        signed = kr.sign(env, key_id=req.key_id)
     else:
-        sign_key = os.environ.get("SIGNING_KEY", "test-key").encode()
-        signed = sign_envelope_hmac(env, key=sign_key, key_id=req.key_id)
+        # single env secret: sign with it and label with the requested key_id
+        signed = kr.sign(env, label=req.key_id)
     return json.loads(canonical_json(signed).decode())
 
+@app.post("/hfp")
+async def hfp(req: HFPReq):
+    return await _hfp_one(req)
+
+@app.post("/hfp/levels")
+async def hfp_levels(req: HFPLevelsReq):
+    # every requested level count from one pipeline run; hashes match /hfp per level
+    from qlx_tasks import hfp_levels_task
+    return await get_executor().run("hfp", hfp_levels_task, req.seed, sorted(set(req.levels)))
+
+@app.post("/key")
+async def key(req: KeyReq):
+    return await _key_one(req)
+
+@app.post("/envelope")
+async def envelope(req: EnvReq):
+    return await _envelope_one(req)
+
+# ---------- Batch routes ----------
+# Body is a JSON array of the single-route bodies. Items are validated and computed
+# independently, at most the route's concurrency at a time, and streamed back as
+# NDJSON in completion order: {"index": i, "ok": true, "result": ...} or
+# {"index": i, "ok": false, "status": ..., "detail": ...}.
+
+def _item_error(i, status, detail, retry_after=None):
+    rec = {"index": i, "ok": False, "status": status, "detail": detail}
+    if retry_after is not None:
+        rec["retry_after"] = retry_after
+    return rec
+
+def _stream_batch(items, model, one, route):
+    limit = _env_int("QLX_BATCH_MAX", 1000)
+    if len(items) > limit:
+        raise HTTPException(status_code=413, detail=f"batch of {len(items)} exceeds QLX_BATCH_MAX={limit}")
+    window = asyncio.Semaphore(get_executor().limit(route).concurrency)
+
+    async def run(i, raw):
+        try:
+            req = model.model_validate(raw)
+        except ValidationError as e:
+            return _item_error(i, 422, json.loads(e.json(include_url=False)))
+        async with window:
+            try:
+                return {"index": i, "ok": True, "result": await one(req)}
+            except HTTPException as e:
+                return _item_error(i, e.status_code, e.detail)
+            except Saturated as e:
+                return _item_error(i, e.status, e.detail, e.retry_after)
+            except Exception as e:
+                return _item_error(i, 500, f"{type(e).__name__}: {e}")
+
+    tasks = [asyncio.ensure_future(run(i, raw)) for i, raw in enumerate(items)]
+
+    async def gen():
+        try:
+            for fut in asyncio.as_completed(tasks):
+                yield (json.dumps(await fut, separators=(",", ":")) + "\n").encode()
+        finally:
+            for t in tasks: t.cancel()
+
+    return StreamingResponse(gen(), media_type="application/x-ndjson")
+
+@app.post("/hfp/batch")
+async def hfp_batch(items: list[Any]):
+    return _stream_batch(items, HFPReq, _hfp_one, "hfp")
+
+@app.post("/key/batch")
+async def key_batch(items: list[Any]):
+    return _stream_batch(items, KeyReq, _key_one, "key")
+
+@app.post("/envelope/batch")
+async def envelope_batch(items: list[Any]):
+    return _stream_batch(items, EnvReq, _envelope_one, "envelope")
+
 @app.post("/sts")
-def sts(req: STSReq):
-    if req.whiten == "sha512":
-        chunk_in, chunk_out = 4096, 512
-        need_chunks = (req.n_bits + chunk_out - 1)//chunk_out
-        n_stream = need_chunks*chunk_in
-    else:
-        n_stream = req.n_bits
-    stream = default_stream(req.seed, n=n_stream)
-    bits = stream_to_bits(stream, whiten=req.whiten)[:req.n_bits]
-    report = run_suite(bits, alpha=req.alpha, block_M=req.block_M)
-    return report
+async def sts(req: STSReq):
+    from qlx_tasks import sts_task
+    from qlx_sts_jobs import check_stream, default_max_stream_mib
+    try:
+        check_stream(req.n_bits, req.whiten, default_max_stream_mib())
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return await get_executor().run("sts", sts_task, req.seed, req.n_bits, req.alpha, req.block_M, req.whiten,
+                                    req.generator)
+
+# ---------- STS jobs ----------
+@app.post("/sts/jobs", status_code=202)
+async def sts_job_create(req: STSJobReq):
+    try:
+        job = get_jobs().submit(req.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return {"id": job["id"], "state": job["state"], "href": f"/sts/jobs/{job['id']}"}
+
+@app.get("/sts/jobs/{job_id}")
+async def sts_job_get(job_id: str):
+    job = get_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found or expired")
+    return job
+
+@app.delete("/sts/jobs/{job_id}")
+async def sts_job_cancel(job_id: str):
+    job = get_jobs().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found or expired")
+    return job
+
 
+# ---------- Metrics ----------
+def _pool_gauge(field):
+    def read():
+        ex = _EXECUTOR
+        return {} if ex is None else {(("route", name),): st[field] for name, st in ex.stats().items()}
+    return read
+
+REGISTRY.gauge("qlx_pool_running", _pool_gauge("running"), "Calls running in the worker pool per route")
+REGISTRY.gauge("qlx_pool_waiting", _pool_gauge("waiting"), "Calls waiting for a pool slot per route")
+REGISTRY.gauge("qlx_pool_rejected", _pool_gauge("rejected"), "Calls rejected with 429/503 per route since start")
+
+def _memory_gauge(field):
+    def read():
+        ex = _EXECUTOR
+        return {} if ex is None else {(): ex.memory.snapshot()[field]}
+    return read
+
+REGISTRY.gauge("qlx_kdf_memory_budget_bytes", _memory_gauge("budget_bytes"), "Memory budget shared by concurrent KDF calls")
+REGISTRY.gauge("qlx_kdf_memory_in_use_bytes", _memory_gauge("in_use_bytes"), "KDF memory currently reserved")
+REGISTRY.gauge("qlx_kdf_memory_waiting", _memory_gauge("waiting"), "KDF calls waiting for memory")
+REGISTRY.gauge("qlx_kdf_memory_rejected", _memory_gauge("rejected"), "KDF calls rejected for memory since start")
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/readyz")
-def readyz():
-    return {"ok": True}
+async def readyz():
+    ready = _WARM["state"] in ("off", "done")
+    body = {"ok": ready, "warm": _WARM["state"] == "done", "warmup": _WARM["state"],
+            "seconds": _WARM["seconds"], "error": _WARM["error"]}
+    return body if ready else JSONResponse(status_code=503, content=body)
@@ -0,0 +1,41 @@
+import io, json
+from qlx_batch import run_batch, completed_ids, _hfp
+from qlx_hfp_prototype import assemble_hfp
+
+def _write(path, jobs):
+    path.write_text("".join(json.dumps(j) + "\n" for j in jobs))
+
+def test_batch_mixed_ops_and_hfp_reuse(tmp_path):
+    jobs = tmp_path / "jobs.jsonl"
+    _write(jobs, [{"id": "h", "op": "hfp", "seed": "b1", "levels": 4},
+                  {"id": "k", "op": "key", "seed": "b1", "levels": 4, "kdf": "hkdf"},
+                  {"id": "x", "op": "export", "seed": "b1", "levels": 4},
+                  {"id": "s", "op": "sts", "seed": "b2", "n_bits": 20000},
+                  {"id": "bad", "op": "frobnicate"},
+                  {"id": "nokey", "op": "export", "seed": "b1", "levels": 4, "key_id": "typo"}])
+    _hfp.cache_clear()
+    out = io.StringIO()
+    summary = run_batch(str(jobs), out, workers=1)
+    recs = {r["id"]: r for r in map(json.loads, out.getvalue().splitlines())}
+    assert summary["total"] == 6 and summary["ok"] == 4 and not recs["bad"]["ok"]
+    assert not recs["nokey"]["ok"] and "typo" in json.dumps(recs["nokey"])  # no fallback to the primary key
+    fp = assemble_hfp("b1", levels=4)["fingerprint_hash"]
+    assert recs["h"]["result"]["fingerprint_hash"] == fp == recs["x"]["result"]["envelope"]["hfp_hash"]
+    assert len(recs["k"]["result"]["key_hex"]) == 64
+    assert recs["s"]["result"]["n_bits"] == 20000
+    assert _hfp.cache_info().hits >= 2  # key and export reused the hfp job's fingerprint
+
+def test_batch_resume_skips_done_and_repairs_torn_line(tmp_path):
+    jobs, res = tmp_path / "jobs.jsonl", tmp_path / "res.jsonl"
+    _write(jobs, [{"id": i, "op": "hfp", "seed": f"r{i}", "levels": 3} for i in range(6)])
+    with open(res, "w") as f:
+        run_batch(str(jobs), f, workers=2, chunk=2)
+    lines = res.read_text().splitlines()
+    # keep three results plus half a line, as if the run was killed mid-write
+    res.write_text("\n".join(lines[:3]) + "\n" + lines[3][:20])
+    assert len(completed_ids(str(res))) == 3 and res.read_text().endswith("\n")
+    with open(res, "a") as f:
+        summary = run_batch(str(jobs), f, workers=1, out_path=str(res))
+    assert summary["skipped"] == 3 and summary["ok"] == 3
+    ids = sorted(json.loads(l)["id"] for l in res.read_text().splitlines())
+    assert ids == [str(i) for i in range(6)]
@@ -0,0 +1,20 @@
+from qlx_bench import run, compare
+
+def _res(med, mad):
+    return {"median_s": med, "mad_s": mad, "min_s": med, "loops": 1, "repeat": 7}
+
+def test_compare_is_noise_aware():
+    base = {"calibration_s": 1.0, "results": {"a": _res(1.0, 0.01), "b": _res(1.0, 0.2), "c": _res(1.0, 0.01)}}
+    cur = {"calibration_s": 1.0, "results": {"a": _res(1.5, 0.01), "b": _res(1.5, 0.2), "c": _res(0.5, 0.01),
+                                             "d": _res(1.0, 0.0)}}
+    st = {r["case"]: r["status"] for r in compare(base, cur, rel_tol=0.25, mad_k=3)}
+    assert st == {"a": "regression", "b": "ok", "c": "improvement", "d": "new"}
+    # a machine running 1.5x slower overall is not a regression once normalized
+    slow = dict(cur, calibration_s=1.5)
+    assert {r["case"]: r["status"] for r in compare(base, slow)}["a"] == "ok"
+
+def test_run_filtered_case():
+    rep = run(r"^dwt_haar\[n=8192", quick=True, repeat=3, min_time=0.001)
+    assert list(rep["results"]) == ["dwt_haar[n=8192,L=5]"]
+    r = rep["results"]["dwt_haar[n=8192,L=5]"]
+    assert r["median_s"] > 0 and r["mad_s"] >= 0 and rep["calibration_s"] > 0
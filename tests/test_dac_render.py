@@ -0,0 +1,54 @@
+import copy
+import numpy as np
+import pytest
+from qlx_hfp_prototype import assemble_hfp
+from qlx_photonic_control import photonic_map, make_envelope
+from qlx_dac_render import render, envelope_codes, estimate
+
+RATE = 1e-6  # 1 kSa/s keeps renders tiny: 1 sample per ms
+
+def _env(seed, mode="static", ramp_ms=10, hold_ms=20):
+    h = assemble_hfp(seed, levels=5)
+    return make_envelope(h, photonic_map(h["band_stats"]), mode=mode, ramp_ms=ramp_ms, hold_ms=hold_ms)
+
+def test_static_ramp_then_hold(tmp_path):
+    env = _env("seed-r1")
+    meta = render([env], tmp_path / "s.npy", rate_GSa=RATE)
+    x = np.load(tmp_path / "s.npy", mmap_mode="r")
+    codes = envelope_codes(env)
+    assert x.shape == (36, 30) and meta["shape"] == [36, 30]
+    assert np.array_equal(x[:, 9], codes) and np.all(x[:, 10:] == codes[:, None])
+    assert len(meta["channels"]) == 36 and meta["channels"][0] == "I_bias_mA[0]"
+
+def test_dither_bounded_and_chunk_invariant(tmp_path):
+    env = _env("seed-r2", mode="dither", ramp_ms=0, hold_ms=50)
+    render([env], tmp_path / "a.npy", rate_GSa=RATE, dither_lsb=2, chunk_samples=7)
+    render([env], tmp_path / "b.npy", rate_GSa=RATE, dither_lsb=2)
+    a = np.load(tmp_path / "a.npy"); b = np.load(tmp_path / "b.npy")
+    assert np.array_equal(a, b)
+    d = a.astype(np.int64) - envelope_codes(env)[:, None]
+    assert d.min() >= -2 and d.max() <= 2 and d.std() > 0
+    assert a.min() >= 1 and a.max() <= (1 << 14) - 2
+
+def test_sweep_and_schedule_int16(tmp_path):
+    e1, e2 = _env("seed-r3"), _env("seed-r4")
+    render([e1, e2], tmp_path / "w.npy", mode="sweep", rate_GSa=RATE, params=["kappa"])
+    w = np.load(tmp_path / "w.npy")
+    c1, c2 = envelope_codes(e1, ["kappa"]), envelope_codes(e2, ["kappa"])
+    assert w.shape == (6, 10 + 20 + 20)
+    assert np.array_equal(w[:, 9], c1) and np.array_equal(w[:, 29], c2)
+    seg = w[:, 10:30].astype(np.int64)
+    assert np.all(np.diff(seg, axis=1) * np.sign(c2 - c1)[:, None] >= 0)
+
+    meta = render([e1, e2], tmp_path / "s.npy", mode="schedule", rate_GSa=RATE, dtype="int16")
+    s = np.load(tmp_path / "s.npy")
+    assert s.dtype == np.int16 and meta["code_offset"] == 1 << 13
+    assert np.array_equal(s[:, -1] + (1 << 13), envelope_codes(e2))
+    assert estimate([e1, e2], mode="schedule", rate_GSa=64)["samples"] == 60 * 64_000_000
+
+def test_mode_validation(tmp_path):
+    e1 = _env("seed-r5")
+    with pytest.raises(ValueError):
+        render([e1], tmp_path / "x.npy", mode="sweep", rate_GSa=RATE)
+    with pytest.raises(ValueError):
+        render([e1, copy.deepcopy(e1)], tmp_path / "x.npy", mode="static", rate_GSa=RATE)
@@ -0,0 +1,64 @@
+import copy
+import pytest
+from qlx_hfp_prototype import assemble_hfp
+from qlx_photonic_control import photonic_map, make_envelope, envelope_codes, canonical_json, PARAM_RANGES, _codes_to_values
+from qlx_keyring import Keyring
+from qlx_delta import make_delta, apply_delta
+
+def _full(seed):
+    h = assemble_hfp(seed, levels=5)
+    return make_envelope(h, photonic_map(h["band_stats"]))
+
+def _nudge(env, edits):
+    out = copy.deepcopy(env)
+    bits = env["dac"]["width_bits"]
+    for band, k, step in edits:
+        lo, hi = PARAM_RANGES[k]
+        code = int(envelope_codes(env, [k])[band]) + step
+        out["params"][k][band] = float(_codes_to_values(code, lo, hi, bits))
+    return out
+
+def test_delta_roundtrip_signed():
+    kr = Keyring(); kr.add_hmac("ctrl-01", b"test-key")
+    base = kr.sign(_full("seed-delta"))
+    target = _nudge(base, [(0, "kappa", 3), (4, "tau_ps", -2)])
+    target.pop("signing"); target["session_id"] = "s-2"
+    delta = kr.sign(make_delta(base, target))
+    assert [c[:2] for c in delta["changes"]] == [[0, "kappa"], [4, "tau_ps"]]
+    assert len(canonical_json(delta)) < len(canonical_json(base))
+
+    full = apply_delta(base, delta, keyring=kr)
+    assert full["session_id"] == "s-2"
+    assert (envelope_codes(full) == envelope_codes(target)).all()
+    assert full["params"]["alpha"] == base["params"]["alpha"]
+
+def test_delta_rejects_mismatch():
+    kr = Keyring(); kr.add_hmac("ctrl-01", b"test-key")
+    base = kr.sign(_full("seed-delta-a"))
+    other = kr.sign(_full("seed-delta-b"))
+    delta = kr.sign(make_delta(base, other))
+    assert len(delta["changes"]) > 0
+    with pytest.raises(ValueError, match="reference"):
+        apply_delta(other, delta, verify=False)
+    forged = dict(delta); forged["changes"] = [list(c) for c in delta["changes"]]
+    forged["changes"][0][2] += 1
+    with pytest.raises(ValueError, match="signature"):
+        apply_delta(base, forged, keyring=kr)
+    with pytest.raises(ValueError, match="digest"):
+        apply_delta(base, forged, verify=False)
+    with pytest.raises(ValueError, match="keyring"):
+        apply_delta(base, delta)  # verification is the default
+
+@pytest.mark.parametrize("change", [
+    "kappa", [0, "kappa"], [0, "kappa", 1, 2], ["0", "kappa", 1], [0.0, "kappa", 1], [True, "kappa", 1],
+    [0, 3, 1], [0, "kappa", "1"], [0, "kappa", 1.5], [0, "nope", 1], [-1, "kappa", 1], [0, "kappa", 1 << 20],
+])
+def test_delta_rejects_malformed_changes(change):
+    kr = Keyring(); kr.add_hmac("ctrl-01", b"test-key")
+    base = kr.sign(_full("seed-delta"))
+    target = _nudge(base, [(0, "kappa", 3)])
+    target.pop("signing")
+    delta = make_delta(base, target)
+    delta["changes"] = [change]
+    with pytest.raises(ValueError, match="change"):
+        apply_delta(base, kr.sign(delta), keyring=kr)
@@ -0,0 +1,96 @@
+import os, sys, json, subprocess
+import numpy as np
+from qlx_hfp_index import HFPIndex, features, MIN_FIT_ROWS
+from qlx_hfp_prototype import assemble_hfp
+
+HFPS = [assemble_hfp(f"idx-{i}", levels=3) for i in range(60)]
+
+def _synthetic(n, seed=0):
+    # real-shaped feature rows (correlated, with one constant column like the A_L mean)
+    F = np.array([features(h["band_stats"]) for h in HFPS])
+    G = np.random.default_rng(seed).multivariate_normal(F.mean(0), np.cov(F.T), size=n)
+    G[:, 0] = F[0, 0]
+    return G
+
+def _brute(X, r):
+    d = np.linalg.norm(X[:, None] - X[None], axis=-1)
+    i, j = np.triu_indices(len(X), 1)
+    m = d[i, j] <= r
+    return set(zip(i[m].tolist(), j[m].tolist()))
+
+def test_knn_and_radius_match_brute_force():
+    idx = HFPIndex.build(HFPS)
+    assert len(idx) == 60 and idx.levels == 3
+    X = idx.X.astype(float)
+    d = np.linalg.norm(X[:, None] - X[None], axis=-1)
+    F = np.array([features(h["band_stats"]) for h in HFPS[:5]])
+    D, R = idx.knn(F, k=4, exclude_self=True)
+    for q in range(5):
+        assert R[q].tolist() == np.argsort(d[q])[1:5].tolist()
+        assert np.allclose(D[q], np.sort(d[q])[1:5], atol=1e-5)
+    r = float(np.sort(d[0])[5:7].mean())  # between the 5th and 6th neighbour
+    Dr, Rr = idx.radius(F[:1], r)[0]
+    assert set(Rr.tolist()) == set(np.nonzero(d[0] <= r)[0].tolist()) and np.all(np.diff(Dr) >= 0)
+
+def test_audit_matches_brute_force_with_planted_collisions():
+    G = _synthetic(1500)
+    G[100] = G[5] * (1 + 1e-9); G[200] = G[7]
+    idx = HFPIndex(3)
+    idx.add([i.to_bytes(64, "big") for i in range(len(G))], G)
+    X = idx.X.astype(float)
+    for r in (1e-3, 1.0, 2.0):
+        I, J, D = idx.audit(r, max_pairs=5000)
+        assert set(zip(I.tolist(), J.tolist())) == _brute(X, r)
+        assert np.all(np.diff(D) >= 0)
+    I, J, _ = idx.audit(1e-3)
+    assert {(5, 100), (7, 200)} == set(zip(I.tolist(), J.tolist()))
+
+def test_incremental_insert_dedupes_and_persists(tmp_path):
+    idx = HFPIndex.build(HFPS[:40])
+    assert idx.add_hfp(HFPS[0]) == 0
+    assert sum(idx.add_hfp(h) for h in HFPS[30:]) == 20 and len(idx) == 60
+    assert idx.fit_rows == 60  # still below MIN_FIT_ROWS: refitted on every insert
+    path = str(tmp_path / "ix.npz")
+    idx.save(path)
+    back = HFPIndex.load(path)
+    assert len(back) == 60 and back.row(HFPS[59]["fingerprint_hash"]) == idx.row(HFPS[59]["fingerprint_hash"])
+    assert back.fingerprint(3) == idx.fingerprint(3)
+    F = features(HFPS[9]["band_stats"])
+    assert back.knn(F, k=3)[1].tolist() == idx.knn(F, k=3)[1].tolist()
+    assert back.add_hfp(assemble_hfp("idx-new", levels=3)) == 1
+
+def test_cli_index_and_nearest(tmp_path):
+    seeds = tmp_path / "seeds.txt"
+    seeds.write_text("\n".join(f"idx-{i}" for i in range(20)) + "\nidx-3\n")
+    ix = str(tmp_path / "ix.npz")
+    env = dict(os.environ, PYTHONPATH="src")
+    run = lambda *a: subprocess.run([sys.executable, "scripts/qlx.py", *a], capture_output=True, text=True, env=env)
+    out = run("hfp-index", ix, "--seeds", str(seeds), "--levels", "3", "--audit", "--fail-on-collision")
+    assert out.returncode == 0, out.stderr
+    s = json.loads(out.stdout)
+    assert s["seen"] == 21 and s["added"] == 20 and s["audit"]["pairs"] == 0
+    hits = json.loads(run("hfp-nearest", ix, "--seed", "idx-3", "-k", "3").stdout)["neighbours"]
+    assert hits[0]["fingerprint_hash"] == HFPS[3]["fingerprint_hash"] and hits[0]["distance"] == 0.0
+    out = run("hfp-nearest", ix, "--fingerprint", HFPS[3]["fingerprint_hash"], "-k", "2")
+    assert [h["fingerprint_hash"] for h in json.loads(out.stdout)["neighbours"]] == [h["fingerprint_hash"] for h in hits[1:]]
+
+def test_small_first_build_grows_then_audits():
+    G = _synthetic(300, seed=1)
+    ids = [i.to_bytes(64, "big") for i in range(len(G))]
+    idx = HFPIndex(3)
+    idx.add(ids[:1], G[:1])
+    assert np.all(idx.scale == 1.0) and idx.basis.shape == (idx.dim, idx.dim)
+    idx.add(ids[1:3], G[1:3])
+    assert idx.basis.shape == (idx.dim, idx.dim) and len(idx.audit(1.0)[0]) == len(_brute(idx.X.astype(float), 1.0))
+    for s in range(3, 120, 7):
+        idx.add(ids[s:s + 7], G[s:s + 7])
+        if idx.fit_rows < MIN_FIT_ROWS:  # provisional fit: every row is restandardized on each insert
+            assert np.allclose(idx.X, (G[:idx.n] - G[:idx.n].mean(0)) / idx.scale, atol=1e-4)
+    fixed = idx.scale.copy()
+    assert MIN_FIT_ROWS <= idx.fit_rows < 120 and not np.allclose(fixed, 1.0)
+    idx.add(ids[120:], G[120:])
+    assert np.array_equal(idx.scale, fixed) and len(idx) == 300
+    X = idx.X.astype(float)
+    for r in (0.5, 1.5):
+        I, J, _ = idx.audit(r)
+        assert set(zip(I.tolist(), J.tolist())) == _brute(X, r)
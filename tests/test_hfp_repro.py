@@ -1,4 +1,4 @@
-from qlx_hfp_prototype import assemble_hfp, derive_key_from_hfp
+from qlx_hfp_prototype import assemble_hfp, assemble_hfp_bundle, derive_key_from_hfp
 
 def test_hfp_repro_and_sensitivity():
     seed = "qlx-demo-seed-phi369"
@@ -12,3 +12,10 @@ def test_kdf_length():
     h = assemble_hfp("seed-for-kdf", levels=5)
     key = derive_key_from_hfp(b"demo-password", h["fingerprint_hash"], key_len=32)
     assert isinstance(key, (bytes, bytearray)) and len(key) == 32
+
+def test_level_bundle_matches_standalone():
+    b = assemble_hfp_bundle("qlx-demo-seed-phi369", [7, 1, 5, 10, 5])
+    assert sorted(b) == [1, 5, 7, 10]
+    for L, h in b.items():
+        s = assemble_hfp("qlx-demo-seed-phi369", levels=L)
+        assert h["fingerprint_hash"] == s["fingerprint_hash"] and h["band_stats"] == s["band_stats"]
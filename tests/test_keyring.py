@@ -0,0 +1,67 @@
+import pytest
+from qlx_hfp_prototype import assemble_hfp
+from qlx_photonic_control import (photonic_map, make_envelope, sign_envelope_hmac, sign_envelope_ed25519,
+                                  verify_envelope_ed25519, sign_envelope, verify_envelope)
+from qlx_keyring import Keyring
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives import serialization
+
+def _env():
+    h = assemble_hfp("seed-keyring", levels=5)
+    return make_envelope(h, photonic_map(h["band_stats"]))
+
+def _priv_hex():
+    p = Ed25519PrivateKey.generate()
+    return p.private_bytes(serialization.Encoding.Raw, serialization.PrivateFormat.Raw, serialization.NoEncryption()).hex()
+
+def test_keyring_matches_direct_signers():
+    env = _env()
+    priv = _priv_hex()
+    kr = Keyring.from_dict({"keys": {"hm": {"alg": "hmac", "key": "test-key"},
+                                     "ed": {"alg": "ed25519", "priv_hex": priv}},
+                            "active": ["ed", "hm"]})
+    assert kr.active == ["ed", "hm"]
+    s1 = sign_envelope(env, kr, key_id="hm")
+    s2 = sign_envelope_hmac(dict(env), key=b"test-key", key_id="hm")
+    assert s1["signing"]["sig"] == s2["signing"]["sig"]
+    # the pre-keyed HMAC state is reused across messages
+    assert sign_envelope(env, kr, key_id="hm")["signing"]["sig"] == s1["signing"]["sig"]
+
+    s3 = sign_envelope(env, kr)  # primary active key
+    assert s3["signing"]["alg"] == "Ed25519" and s3["signing"]["key_id"] == "ed"
+    assert s3["signing"]["sig"] == sign_envelope_ed25519(env, priv_hex=priv, key_id="ed")["signing"]["sig"]
+    assert verify_envelope_ed25519(s3, kr.get("ed").public_hex())
+    assert verify_envelope(s1, kr) and verify_envelope(s3, kr)
+
+    tampered = dict(s3); tampered["band_count"] = 99
+    assert not verify_envelope(tampered, kr)
+
+def test_rotation_and_verify_only_keys():
+    env = _env()
+    old, new = _priv_hex(), _priv_hex()
+    signer = Keyring()
+    signer.add_ed25519("k-old", priv_hex=old)
+    signer.add_ed25519("k-new", priv_hex=new)
+    a = signer.sign(env)
+    signer.retire("k-old")
+    b = signer.sign(env)
+    assert a["signing"]["key_id"] == "k-old" and b["signing"]["key_id"] == "k-new"
+
+    verifier = Keyring()
+    verifier.add_ed25519("k-old", pub_hex=signer.get("k-old").public_hex())
+    verifier.add_ed25519("k-new", pub_hex=signer.get("k-new").public_hex())
+    assert verifier.active == [] and verifier.verify(a) and verifier.verify(b)
+    with pytest.raises(KeyError):
+        verifier.sign(env)
+
+    ok, err = Keyring().check(a)
+    assert ok is None and "skipped" in err
+    wild = Keyring.from_dict({"*ed25519": {"alg": "ed25519", "pub_hex": signer.get("k-new").public_hex()}})
+    assert wild.check(b)[0] is True and wild.check(a)[0] is False
+
+def test_from_env_legacy():
+    kr = Keyring.from_env({"SIGN_ALG": "hmac", "SIGNING_KEY": "s3cret"})
+    assert kr.legacy and kr.active == ["ctrl-01"]
+    signed = kr.sign(_env(), label="dev-7")
+    assert signed["signing"]["key_id"] == "dev-7"
+    assert Keyring.from_env({"SIGN_ALG": "ed25519"}).active == []
@@ -0,0 +1,94 @@
+import copy, uuid, asyncio
+import pytest
+from qlx_hfp_prototype import assemble_hfp
+from qlx_photonic_control import photonic_map, make_envelope
+from qlx_keyring import Keyring
+from qlx_delta import make_delta
+from qlx_link import StandInController, ControllerLink, LinkError, push_fleet
+
+H = assemble_hfp("seed-link", levels=5)
+BASE = make_envelope(H, photonic_map(H["band_stats"]))
+KR = Keyring.from_dict({"hm": {"alg": "hmac", "key": "k"}})
+
+def _envs(n):
+    out = []
+    for _ in range(n):
+        e = copy.deepcopy(BASE); e["session_id"] = str(uuid.uuid4())
+        out.append(e)
+    return KR.sign_batch(out)
+
+def test_pipelined_push_verifies_and_applies():
+    async def main():
+        ctrl = StandInController(keyring=KR, require_sig=True)
+        await ctrl.serve()
+        link = await ControllerLink("127.0.0.1", ctrl.port, window=8).connect()
+        envs = _envs(50)
+        bad = copy.deepcopy(envs[0]); bad["session_id"] = "x"; bad["params"]["kappa"][0] = 0.5
+        delta = KR.sign(make_delta(envs[-1], {**envs[-1], "session_id": "d1", "params": {**envs[-1]["params"], "alpha": [3.0] * BASE["band_count"]}}))
+        acks = await link.push(envs + [bad, delta])
+        await link.close(); await ctrl.close()
+        return ctrl, link, acks
+    ctrl, link, acks = asyncio.run(main())
+    assert [a["seq"] for a in acks] == list(range(1, 53))
+    assert all(a["ok"] for a in acks[:50]) and not acks[50]["ok"] and "sign" in acks[50]["error"]
+    assert acks[51]["ok"], acks[51]
+    assert ctrl.applied == 51 and ctrl.rejected == 1 and ctrl.current["session_id"] == "d1"
+    assert link.stats()["in_flight"] == 0 and link.reconnects == 0
+
+def test_resume_after_dropped_connections():
+    envs = _envs(200)
+    async def main():
+        ctrl = StandInController(keyring=KR)
+        await ctrl.serve()
+        link = await ControllerLink("127.0.0.1", ctrl.port, window=16, retry_s=(0.01, 0.05)).connect()
+        futs = []
+        for i, e in enumerate(envs):
+            futs.append(await link.send(e))
+            if i % 40 == 39:
+                ctrl.kick()
+        acks = await asyncio.gather(*futs)
+        # a restarted pusher (new link_id) resends envelopes the controller already applied
+        again = await ControllerLink("127.0.0.1", ctrl.port).connect()
+        dup = await again.push(envs[-3:])
+        await link.close(); await again.close(); await ctrl.close()
+        return ctrl, link, acks, dup
+    ctrl, link, acks, dup = asyncio.run(main())
+    assert [a["seq"] for a in acks] == list(range(1, 201)) and all(a["ok"] for a in acks)
+    assert link.reconnects >= 5 and ctrl.applied == 200
+    assert all(d["ok"] and d["dup"] for d in dup) and ctrl.duplicates == 3
+
+def test_push_fleet_many_controllers():
+    async def main():
+        ctrls = [StandInController(keyring=KR) for _ in range(4)]
+        for c in ctrls: await c.serve()
+        res = await push_fleet({("127.0.0.1", c.port): _envs(10) for c in ctrls}, window=4)
+        for c in ctrls: await c.close()
+        return ctrls, res
+    ctrls, res = asyncio.run(main())
+    assert all(c.applied == 10 for c in ctrls)
+    assert all(len(acks) == 10 and stats["reconnects"] == 0 for acks, stats in res.values())
+
+def test_unreachable_controller_raises_instead_of_hanging():
+    async def main():
+        ctrl = StandInController(keyring=KR, apply_delay_s=0.01)
+        await ctrl.serve()
+        port = ctrl.port
+        link = await ControllerLink("127.0.0.1", port, window=8, retry_s=(0.01, 0.02), max_retries=3).connect()
+        push = asyncio.ensure_future(link.push(_envs(40)))
+        await asyncio.sleep(0.05)
+        ctrl.server.close()  # stop accepting first, so reconnects are refused
+        await ctrl.close()   # down for good with a full window in flight
+        with pytest.raises(LinkError, match="gave up"):
+            await asyncio.wait_for(push, 5)
+        with pytest.raises(LinkError):
+            await asyncio.wait_for(link.send(_envs(1)[0]), 1)
+        with pytest.raises(OSError):  # refused at connect
+            await asyncio.wait_for(push_fleet({("127.0.0.1", port): _envs(3)}), 5)
+        await asyncio.wait_for(link.close(), 1)
+        return link
+    link = asyncio.run(main())
+    assert link.stats()["in_flight"] == 0 and link._slots._value == 8
+
+def test_window_bounds():
+    with pytest.raises(ValueError):
+        ControllerLink("127.0.0.1", 1, window=0)
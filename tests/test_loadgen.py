@@ -0,0 +1,15 @@
+import os, sys, json, subprocess
+
+def test_loadgen_in_process(tmp_path):
+    out = tmp_path / "load.json"
+    env = dict(os.environ, PYTHONPATH="src", QLX_POOL_WORKERS="0")
+    subprocess.run([sys.executable, "scripts/loadgen.py", "--mix", "hfp=2,key=1,envelope=1", "--kdf", "hkdf",
+                    "--requests", "16", "--concurrency", "1,4", "--warmup", "2", "--out", str(out)],
+                   env=env, check=True, capture_output=True)
+    rep = json.loads(out.read_text())
+    assert rep["target"] == "in-process" and [l["concurrency"] for l in rep["levels"]] == [1, 4]
+    for lvl in rep["levels"]:
+        a = lvl["routes"]["all"]
+        assert a["requests"] == 16 and a["error_rate"] == 0.0
+        assert a["p50_ms"] <= a["p95_ms"] <= a["p99_ms"] <= a["max_ms"]
+        assert set(lvl["routes"]) <= {"hfp", "key", "envelope", "all"}
@@ -0,0 +1,76 @@
+import asyncio, time
+import httpx
+import pytest
+from qlx_exec import Executor, MemoryBudget, Saturated
+import service_app
+
+MiB = 1 << 20
+
+def _hold(s):
+    time.sleep(s)
+    return s
+
+def test_budget_queues_fifo_and_rejects():
+    async def main():
+        b = MemoryBudget(100 * MiB, max_waiters=2, queue_timeout_s=0.2)
+        await b.acquire("key", 60 * MiB)
+        order = []
+        async def waiter(name, n):
+            await b.acquire("key", n)
+            order.append(name)
+        big = asyncio.create_task(waiter("big", 80 * MiB))
+        await asyncio.sleep(0)
+        small = asyncio.create_task(waiter("small", 10 * MiB))  # fits, but must not overtake big
+        await asyncio.sleep(0.01)
+        assert order == [] and b.waiting == 2
+        with pytest.raises(Saturated) as full:
+            await b.acquire("key", 1 * MiB)
+        assert full.value.status == 429
+        b.release(60 * MiB)
+        await asyncio.gather(big, small)
+        assert order == ["big", "small"] and b.in_use == 90 * MiB
+        with pytest.raises(Saturated) as timed_out:
+            await b.acquire("key", 20 * MiB)
+        assert timed_out.value.status == 503 and b.waiting == 0
+        with pytest.raises(ValueError):
+            await b.acquire("key", 200 * MiB)
+        with pytest.raises(ValueError):
+            await b.acquire("key", -MiB)
+        assert b.in_use == 90 * MiB
+    asyncio.run(main())
+
+def test_run_charged_limits_concurrency():
+    async def main():
+        ex = Executor(workers=0, limits={"key": (4, 8)}, memory_budget_mib=100)
+        peak = 0
+        async def one():
+            nonlocal peak
+            t = asyncio.create_task(ex.run_charged("key", 64 * MiB, _hold, 0.05))
+            await asyncio.sleep(0.01)
+            peak = max(peak, ex.memory.in_use)
+            return await t
+        await asyncio.gather(*[one() for _ in range(3)])
+        assert peak <= 100 * MiB and ex.memory.in_use == 0
+        ex.shutdown()
+    asyncio.run(main())
+
+def test_key_route_caps_memory(monkeypatch):
+    monkeypatch.setattr(service_app, "_EXECUTOR", Executor(workers=0, memory_budget_mib=32))
+    monkeypatch.setenv("ARGON2_MAX_MEMORY_KIB", "65536")
+    async def main():
+        transport = httpx.ASGITransport(app=service_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            r = await c.post("/key", json={"seed": "s", "kdf": "argon2id", "memory_kib": 1 << 20})
+            assert r.status_code == 422 and "ARGON2_MAX_MEMORY_KIB" in r.json()["detail"]
+            r = await c.post("/key", json={"seed": "s", "kdf": "argon2id", "memory_kib": 65536})
+            assert r.status_code == 422 and "budget" in r.json()["detail"]
+            for bad in ({"memory_kib": 0}, {"memory_kib": -1024}, {"time_cost": 0}, {"parallelism": 0},
+                        {"memory_kib": 16, "parallelism": 4}):
+                r = await c.post("/key", json={"seed": "s", "kdf": "argon2id", **bad})
+                assert r.status_code == 422, bad
+            r = await c.post("/key", json={"seed": "s", "kdf": "scrypt"})
+            assert r.status_code == 200
+            r = await c.get("/metrics")
+            assert f"qlx_kdf_memory_budget_bytes {32 * MiB}" in r.text
+            assert "qlx_kdf_memory_in_use_bytes 0" in r.text
+    asyncio.run(main())
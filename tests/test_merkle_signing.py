@@ -0,0 +1,93 @@
+import io, os, sys, copy, json, subprocess
+import pytest
+from qlx_hfp_prototype import assemble_hfp
+from qlx_photonic_control import (photonic_map, make_envelope, sign_envelopes_hmac, sign_envelopes_ed25519,
+                                  verify_envelope_ed25519, merkle_leaf, merkle_tree, merkle_root_from_path,
+                                  signed_message)
+from qlx_keyring import Keyring
+from qlx_verify_batch import verify_batch
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives import serialization
+
+H = assemble_hfp("seed-merkle", levels=5)
+PARAMS = photonic_map(H["band_stats"])
+
+def _envs(n):
+    return [make_envelope(H, PARAMS) for _ in range(n)]
+
+def _priv_hex():
+    p = Ed25519PrivateKey.generate()
+    return p.private_bytes(serialization.Encoding.Raw, serialization.PrivateFormat.Raw, serialization.NoEncryption()).hex()
+
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 8, 13])
+def test_every_leaf_reaches_the_root(n):
+    leaves = [merkle_leaf(e) for e in _envs(n)]
+    root, paths = merkle_tree(leaves)
+    for i, (leaf, path) in enumerate(zip(leaves, paths)):
+        assert merkle_root_from_path(leaf, i, n, path) == root
+        if n > 1:
+            assert merkle_root_from_path(leaf, (i + 1) % n, n, path) != root
+    assert merkle_root_from_path(leaves[0], 0, n, paths[0] + [root]) is None
+
+def test_ed25519_batch_verifies_and_rejects_tampering():
+    priv = _priv_hex()
+    kr = Keyring.from_dict({"ed": {"alg": "ed25519", "priv_hex": priv}})
+    signed = sign_envelopes_ed25519(_envs(7), priv_hex=priv, key_id="ed")
+    assert len({e["signing"]["sig"] for e in signed}) == 1
+    pub = kr.get("ed").public_hex()
+    assert all(verify_envelope_ed25519(e, pub) and kr.verify(e) for e in signed)
+
+    moved = copy.deepcopy(signed[2]); moved["params"]["kappa"][0] = signed[3]["params"]["kappa"][0] + 1e-3
+    swapped = copy.deepcopy(signed[2]); swapped["signing"]["merkle"]["index"] = 3
+    forged = copy.deepcopy(signed[2]); forged["signing"]["merkle"]["root"] = "00" * 32
+    for bad in (moved, swapped, forged):
+        ok, err = kr.check(bad)
+        assert ok is False and "merkle" in err
+        with pytest.raises(ValueError):
+            verify_envelope_ed25519(bad, pub)
+
+def test_keyring_sign_batch_and_root_cache():
+    kr = Keyring.from_dict({"hm": {"alg": "hmac", "key": "k"}})
+    envs = _envs(4)
+    signed = kr.sign_batch(envs)
+    assert signed[0]["signing"]["sig"] == sign_envelopes_hmac(envs, key=b"k", key_id="hm")[0]["signing"]["sig"]
+    assert "signing" not in envs[0]
+    calls = []
+    k = kr.get("hm"); real = k.verify
+    k.verify = lambda m, s: (calls.append(m), real(m, s))[1]
+    assert all(kr.verify(e) for e in signed) and len(calls) == 1
+    other = Keyring.from_dict({"hm": {"alg": "hmac", "key": "wrong"}})
+    assert not other.verify(signed[0])
+
+def test_verify_batch_and_scripts(tmp_path):
+    src = tmp_path / "unsigned.jsonl"
+    src.write_text("".join(json.dumps(e) + "\n" for e in _envs(5)))
+    out = tmp_path / "signed.jsonl"
+    env = dict(os.environ, PYTHONPATH="src")
+    res = subprocess.run([sys.executable, "scripts/qlx.py", "sign-batch", str(src), "--out", str(out),
+                          "--key", "test-key", "--batch-size", "2"], capture_output=True, text=True, env=env, check=True)
+    assert json.loads(res.stdout)["signatures"] == 3
+    s = verify_batch([out], keys={"*hmac": {"alg": "hmac", "key_hex": b"test-key".hex()}}, workers=1, out=io.StringIO())
+    assert s["ok"] == s["sig_verified"] == 5
+
+    one = tmp_path / "one.json"
+    one.write_text(out.read_text().splitlines()[3])
+    res = subprocess.run([sys.executable, "scripts/controller_verify.py", str(one), "--hmac-key-hex", b"test-key".hex()],
+                         capture_output=True, text=True, env=env)
+    assert res.returncode == 0 and json.loads(res.stdout)["checks"]["sig_ok"] is True
+    msg, err = signed_message(json.loads(one.read_text()))
+    assert msg is not None and err is None
+
+def test_cli_rejects_unknown_key_id(tmp_path):
+    ring = tmp_path / "ring.json"
+    ring.write_text(json.dumps({"active": ["hm"], "keys": {"hm": {"alg": "hmac", "key": "k1"}}}))
+    src = tmp_path / "unsigned.jsonl"
+    src.write_text("".join(json.dumps(e) + "\n" for e in _envs(2)))
+    env = dict(os.environ, PYTHONPATH="src")
+    run = lambda *a: subprocess.run([sys.executable, "scripts/qlx.py", *a], capture_output=True, text=True, env=env)
+    for cmd in (["sign-batch", str(src), "--out", str(tmp_path / "s.jsonl")], ["export", "--out", str(tmp_path / "x")]):
+        res = run(*cmd, "--keyring", str(ring), "--key-id", "typo")
+        assert res.returncode != 0 and "unknown --key-id 'typo'" in res.stderr
+        assert run(*cmd, "--keyring", str(ring)).returncode == 0  # no --key-id: the primary key
+    signed = json.loads((tmp_path / "s.jsonl").read_text().splitlines()[0])
+    assert signed["signing"]["key_id"] == "hm" and Keyring.from_file(ring).verify(signed)
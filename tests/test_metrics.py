@@ -0,0 +1,59 @@
+import asyncio
+import httpx
+from qlx_metrics import REGISTRY, stage, timed, call_captured
+from qlx_exec import Executor
+from qlx_hfp_prototype import assemble_hfp
+import service_app
+
+def _count(text, metric, **labels):
+    want = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    for line in text.splitlines():
+        if line.startswith(f"{metric}_count{{") and want in line:
+            return int(line.rsplit(" ", 1)[1])
+    return 0
+
+def test_stage_histogram_and_capture():
+    REGISTRY.reset()
+    @timed("unit_test_stage")
+    def f(x): return x + 1
+    assert f(1) == 2
+    with stage("unit_test_stage"):
+        pass
+    text = REGISTRY.render()
+    assert _count(text, "qlx_stage_seconds", stage="unit_test_stage", route="none") == 2
+    assert 'le="+Inf"} 2' in text
+
+    result, obs = call_captured(assemble_hfp, ("s",), {"levels": 3})
+    assert len(result["fingerprint_hash"]) == 128
+    names = [n for n, _ in obs]
+    for s in ("logistic_map", "harmonic_comb", "dwt_haar", "compute_band_stats", "sha512_fingerprint"):
+        assert s in names
+    # captured observations are not recorded locally
+    assert _count(REGISTRY.render(), "qlx_stage_seconds", stage="dwt_haar") == 0
+
+def test_metrics_endpoint_route_labels(monkeypatch):
+    REGISTRY.reset()
+    monkeypatch.setattr(service_app, "_EXECUTOR", Executor(workers=0))
+    async def main():
+        transport = httpx.ASGITransport(app=service_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            assert (await c.post("/envelope", json={"seed": "s"})).status_code == 200
+            assert (await c.post("/sts", json={"n_bits": 20000})).status_code == 200
+            for i in range(3):
+                assert (await c.get(f"/sts/jobs/missing-{i}")).status_code == 404
+                assert (await c.get(f"/no/such/path/{i}")).status_code == 404
+            r = await c.get("/metrics")
+            assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+            return r.text
+    text = asyncio.run(main())
+    assert _count(text, "qlx_stage_seconds", stage="photonic_map", route="/envelope") == 1
+    assert _count(text, "qlx_stage_seconds", stage="quantize", route="/envelope") == 6
+    assert _count(text, "qlx_stage_seconds", stage="sign_hmac", route="/envelope") == 1
+    assert _count(text, "qlx_stage_seconds", stage="whiten", route="/sts") == 1
+    assert _count(text, "qlx_stage_seconds", stage="sts_dft_spectral", route="/sts") == 1
+    assert _count(text, "qlx_http_request_seconds", route="/envelope", method="POST", status="200") == 1
+    assert 'qlx_pool_running{route="envelope"} 0' in text
+    # raw paths never become labels: one series per route template
+    assert _count(text, "qlx_http_request_seconds", route="/sts/jobs/{job_id}", method="GET", status="404") == 3
+    assert _count(text, "qlx_http_request_seconds", route="unmatched", method="GET", status="404") == 3
+    assert "missing-" not in text and "/no/such" not in text
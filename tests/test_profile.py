@@ -0,0 +1,25 @@
+import os, sys, json, subprocess
+from qlx_profile import Profiler
+from qlx_hfp_prototype import assemble_hfp
+
+def test_profiler_reports(tmp_path):
+    with Profiler(str(tmp_path), interval=0.001) as prof:
+        for _ in range(3):
+            assemble_hfp("profile-seed", levels=6)
+    for name in ("profile.txt", "profile.pstats", "stacks.collapsed", "alloc_top.txt", "stages.json"):
+        assert (tmp_path / name).exists()
+    stages = json.loads((tmp_path / "stages.json").read_text())["stages"]
+    assert stages["dwt_haar"]["calls"] == 3 and stages["logistic_map"]["peak_rss_mb"] > 0
+    for line in (tmp_path / "stacks.collapsed").read_text().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and ";" in stack
+    assert "logistic_map" in (tmp_path / "profile.txt").read_text()
+    assert prof.summary()["samples"] > 0
+
+def test_cli_profile_passes_through_exit_code(tmp_path):
+    env = dict(os.environ, PYTHONPATH="src")
+    r = subprocess.run([sys.executable, "scripts/qlx.py", "profile", "--out", str(tmp_path), "--no-tracemalloc",
+                        "hfp", "--levels", "4"], env=env, capture_output=True, text=True)
+    assert r.returncode == 0 and len(r.stdout.strip()) == 128
+    summary = json.loads(r.stderr)
+    assert summary["exit_code"] == 0 and "compute_band_stats" in summary["stages"]
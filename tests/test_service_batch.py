@@ -0,0 +1,49 @@
+import asyncio, json
+import httpx
+from qlx_exec import Executor
+from qlx_hfp_prototype import assemble_hfp
+import service_app
+
+def _post(path, body):
+    async def main():
+        transport = httpx.ASGITransport(app=service_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            r = await c.post(path, json=body)
+            return r.status_code, r.headers.get("content-type", ""), r.text
+    return asyncio.run(main())
+
+def test_batch_routes_stream_ndjson(monkeypatch):
+    monkeypatch.setattr(service_app, "_EXECUTOR", Executor(workers=0))
+    status, ctype, text = _post("/hfp/batch", [{"seed": "a"}, {"seed": "b", "levels": 3}, {"levels": 99}])
+    assert status == 200 and ctype.startswith("application/x-ndjson")
+    recs = {r["index"]: r for r in map(json.loads, text.splitlines())}
+    assert sorted(recs) == [0, 1, 2]
+    assert recs[0]["ok"] and recs[0]["result"]["fingerprint_hash"] == assemble_hfp("a", levels=5)["fingerprint_hash"]
+    assert recs[1]["result"]["levels"] == 3
+    assert not recs[2]["ok"] and recs[2]["status"] == 422
+
+    status, _, text = _post("/key/batch", [{"seed": "a", "kdf": "hkdf"}, {"seed": "a", "kdf": "scrypt", "length": 16}])
+    recs = sorted(map(json.loads, text.splitlines()), key=lambda r: r["index"])
+    assert [len(r["result"]["key_hex"]) for r in recs] == [64, 32]
+
+    status, _, text = _post("/envelope/batch", [{"seed": "a"}, {"seed": "b", "key_id": "dev-2"}])
+    recs = sorted(map(json.loads, text.splitlines()), key=lambda r: r["index"])
+    assert [r["result"]["signing"]["key_id"] for r in recs] == ["ctrl-01", "dev-2"]
+
+    monkeypatch.setenv("QLX_BATCH_MAX", "2")
+    assert _post("/hfp/batch", [{}, {}, {}])[0] == 413
+    service_app._EXECUTOR.shutdown()
+
+def test_hfp_levels_route(monkeypatch):
+    monkeypatch.setattr(service_app, "_EXECUTOR", Executor(workers=0))
+    status, _, text = _post("/hfp/levels", {"seed": "a", "levels": [3, 5, 3]})
+    assert status == 200
+    hfps = json.loads(text)["hfps"]
+    assert [h["levels"] for h in hfps] == [3, 5]
+    assert all(h["fingerprint_hash"] == assemble_hfp("a", levels=h["levels"])["fingerprint_hash"] for h in hfps)
+    assert len(hfps[1]["band_stats"]) == 6
+    status, _, text = _post("/hfp/levels", {"seed": "a"})
+    assert [h["levels"] for h in json.loads(text)["hfps"]] == list(range(1, 11))
+    assert _post("/hfp/levels", {"levels": [11]})[0] == 422
+    assert _post("/hfp/levels", {"levels": []})[0] == 422
+    service_app._EXECUTOR.shutdown()
@@ -0,0 +1,71 @@
+import asyncio, time
+import httpx
+import pytest
+from qlx_exec import Executor, Saturated
+import service_app
+
+def _sleep(s):
+    time.sleep(s)
+    return s
+
+def test_executor_queue_full_and_timeout():
+    async def main():
+        ex = Executor(workers=0, limits={"slow": (1, 1)}, queue_timeout_s=0.2)
+        first = asyncio.create_task(ex.run("slow", _sleep, 0.5))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(ex.run("slow", _sleep, 0.01))
+        await asyncio.sleep(0.05)
+        with pytest.raises(Saturated) as full:
+            await ex.run("slow", _sleep, 0.01)
+        assert full.value.status == 429 and full.value.retry_after >= 1
+        with pytest.raises(Saturated) as timed_out:
+            await second
+        assert timed_out.value.status == 503
+        assert await first == 0.5
+        assert ex.stats()["slow"]["rejected"] == 2
+        ex.shutdown()
+    asyncio.run(main())
+
+def test_routes_and_backpressure(monkeypatch):
+    monkeypatch.setattr(service_app, "_EXECUTOR", Executor(workers=0, limits={"sts": (1, 0)}))
+    async def main():
+        transport = httpx.ASGITransport(app=service_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            r = await c.post("/hfp", json={"seed": "s", "levels": 5})
+            assert r.status_code == 200 and len(r.json()["fingerprint_hash"]) == 128
+            r = await c.post("/key", json={"seed": "s", "kdf": "hkdf"})
+            assert r.status_code == 200 and len(r.json()["key_hex"]) == 64
+            r = await c.post("/envelope", json={"seed": "s"})
+            assert r.status_code == 200 and r.json()["signing"]["key_id"] == "ctrl-01"
+
+            heavy = asyncio.create_task(c.post("/sts", json={"seed": "s", "n_bits": 400_000}))
+            await asyncio.sleep(0.2)
+            r = await c.post("/sts", json={"seed": "s", "n_bits": 10_000})
+            assert r.status_code == 429 and int(r.headers["Retry-After"]) >= 1
+            assert (await heavy).status_code == 200
+    asyncio.run(main())
+    service_app._EXECUTOR.shutdown()
+
+def test_cheap_route_latency_stays_flat_while_heavy_routes_are_saturated(monkeypatch):
+    # one worker each, as docker-entrypoint.sh usually sizes it: /hfp must not wait behind /sts or /key
+    ex = Executor(workers=1, heavy_workers=1, start_method="fork", limits={"sts": (1, 4), "key": (1, 4)})
+    monkeypatch.setattr(service_app, "_EXECUTOR", ex)
+    async def main():
+        transport = httpx.ASGITransport(app=service_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t", timeout=120) as c:
+            async def hfp_latency():
+                t0 = time.perf_counter()
+                assert (await c.post("/hfp", json={"seed": "s", "levels": 5})).status_code == 200
+                return time.perf_counter() - t0
+            await hfp_latency()  # first call pays the worker's imports
+            idle = min([await hfp_latency() for _ in range(3)])
+            heavy = [asyncio.create_task(c.post("/sts", json={"seed": f"s{i}", "n_bits": 400_000})) for i in range(2)]
+            heavy += [asyncio.create_task(c.post("/key", json={"seed": f"k{i}", "kdf": "scrypt"})) for i in range(2)]
+            await asyncio.sleep(0.3)
+            busy = sorted([await hfp_latency() for _ in range(5)])
+            assert not any(t.done() for t in heavy[:2])  # the measurements overlapped a saturated heavy pool
+            assert ex.stats()["sts"]["running"] == 1 and ex.stats()["sts"]["waiting"] == 1
+            assert busy[2] < max(0.25, 10 * idle), (idle, busy)
+            assert all(r.status_code == 200 for r in await asyncio.gather(*heavy))
+    asyncio.run(main())
+    ex.shutdown()
@@ -0,0 +1,57 @@
+import random
+from qlx_sessions import SessionStore, TimingWheel
+
+T0 = 1_700_000_000_000  # 2023-11-14T22:13:20Z
+
+def _env(sid, at="2023-11-14T22:13:21Z", hfp="h1", ramp=10, hold=2000, ttl=10000):
+    return {"session_id": sid, "hfp_hash": hfp, "apply": {"at": at, "ramp_ms": ramp, "hold_ms": hold, "ttl_ms": ttl}}
+
+def test_wheel_fires_in_order_across_levels_and_overflow():
+    rng = random.Random(3)
+    w, now, pending = TimingWheel(12345), 12345, []
+    for step in range(40):
+        for _ in range(rng.randrange(30)):
+            t = now + rng.randrange(-3, rng.choice([50, 5000, 1 << 20, 1 << 40]))
+            pending.append((t, len(pending))); w.add(t, pending[-1][1])
+        now += rng.choice([0, 1, 127, 128, 4096, 1 << 22, 1 << 40])
+        out = w.pop_due(now)
+        assert sorted(out) == sorted(p for p in pending if p[0] <= now)
+        assert [t for t, _ in out] == sorted(t for t, _ in out)
+        pending = [p for p in pending if p[0] > now]
+        assert w.count == len(pending)
+
+def test_session_lifecycle_and_indexes():
+    st = SessionStore(now_ms=T0)
+    st.put(_env("a")); st.put(_env("b", ttl=1500)); st.put(_env("c", hfp="h2"))
+    assert {s.session_id for s in st.for_hfp("h1")} == {"a", "b"} and len(st) == 3
+    assert st.advance(T0 + 999) == []
+    assert [e[1:3] for e in st.advance(T0 + 1000)] == [("ramp_start", "a"), ("ramp_start", "b"), ("ramp_start", "c")]
+    assert st.get("a").state == "active"
+    assert st.advance(T0 + 2500) == [(T0 + 2500, "expire", "b", "h1")]  # ttl before hold_end
+    assert "b" not in st and [s.session_id for s in st.for_hfp("h1")] == ["a"]
+    assert [e[1] for e in st.advance(T0 + 3010)] == ["hold_end", "hold_end"] and st.get("c").state == "released"
+    st.put(_env("a", at="2023-11-14T22:13:25Z"))  # replaced: the old expire must not fire
+    assert [e[1:3] for e in st.advance(T0 + 11000)] == [("ramp_start", "a"), ("hold_end", "a"), ("expire", "c")]
+    assert st.get("a").state == "released" and st.stats()["stale_timers"] == 2  # b's hold_end, a's first expire
+    assert st.remove("a") and not st.remove("a") and st.advance(T0 + 60000) == [] and st.by_hfp == {}
+
+def test_journal_replay_reproduces_events(tmp_path):
+    path = str(tmp_path / "sessions.jsonl")
+    rng = random.Random(7)
+    seen = []
+    with SessionStore(now_ms=T0, journal=path) as st:
+        st.listeners.append(seen.append)
+        for i in range(200):
+            st.put(_env(f"s{i % 150}", at=f"2023-11-14T22:13:{20 + rng.randrange(10):02d}Z", hfp=f"h{i % 7}",
+                        hold=rng.choice([0, 500, 3000]), ttl=rng.choice([0, 4000, 20000])))
+            if i % 10 == 0:
+                st.advance(T0 + i * 50)
+            if i % 33 == 0:
+                st.remove(f"s{i // 2}")
+        st.advance(T0 + 15000)
+        state = {sid: s.state for sid, s in st.sessions.items()}
+    replayed = []
+    back = SessionStore.replay(path, on_event=replayed.append)
+    assert replayed == seen and {sid: s.state for sid, s in back.sessions.items()} == state
+    partial = SessionStore.replay(path, until_ms=T0 + 5000)
+    assert partial.now_ms == T0 + 5000 and partial.stats()["fired"]["ramp_start"] > 0
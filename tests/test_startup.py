@@ -0,0 +1,24 @@
+import os, sys, json, asyncio, subprocess
+import httpx
+from qlx_exec import Executor
+import service_app
+
+def test_import_is_light():
+    code = ("import sys, json, service_app; "
+            "print(json.dumps([m for m in ('numpy','cryptography','argon2','qlx_sts_min') if m in sys.modules]))")
+    env = dict(os.environ, PYTHONPATH="src")
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout) == []
+
+def test_readyz_tracks_warmup(monkeypatch):
+    monkeypatch.setattr(service_app, "_EXECUTOR", Executor(workers=0))
+    monkeypatch.setitem(service_app._WARM, "state", "pending")
+    async def main():
+        transport = httpx.ASGITransport(app=service_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            r = await c.get("/readyz")
+            assert r.status_code == 503 and r.json()["warm"] is False
+            await service_app.warmup()
+            r = await c.get("/readyz")
+            assert r.status_code == 200 and r.json()["warm"] is True and r.json()["warmup"] == "done"
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+import io, os, sys, json, subprocess
+import pytest
+import qlx_store
+from qlx_store import ArtifactStore, envelope_digest
+from qlx_batch import run_batch
+from qlx_hfp_prototype import assemble_hfp
+from qlx_photonic_control import photonic_map, make_envelope, sign_envelope_hmac
+
+def _envs(h, n):
+    return [sign_envelope_hmac(make_envelope(h, photonic_map(h["band_stats"])), key=b"k") for _ in range(n)]
+
+@pytest.mark.parametrize("codec", ["gzip", "lzma", "none"])
+def test_roundtrip_and_dedup(tmp_path, codec):
+    h = assemble_hfp("store-seed", levels=5)
+    envs = _envs(h, 3)
+    with ArtifactStore(tmp_path, codec=codec) as st:
+        with st.batch():
+            for _ in range(3):
+                assert st.put_hfp(h) == h["fingerprint_hash"]
+            digests = [st.put_envelope(e) for e in envs + envs]
+        assert digests[:3] == digests[3:] == [envelope_digest(e) for e in envs]
+        assert st.written == 4 and st.deduplicated == 5
+    with ArtifactStore(tmp_path) as st:  # reopen with another default codec
+        assert len(st) == 4 and h["fingerprint_hash"] in st
+        assert st.get_hfp(h["fingerprint_hash"]) == h
+        assert st.get(digests[1]) == envs[1]
+        with pytest.raises(KeyError):
+            st.get("0" * 64)
+
+def test_one_fsync_pair_per_batch(tmp_path, monkeypatch):
+    h = assemble_hfp("store-seed", levels=5)
+    calls = []
+    real = os.fsync
+    monkeypatch.setattr(qlx_store.os, "fsync", lambda fd: (calls.append(fd), real(fd)))
+    with ArtifactStore(tmp_path) as st:
+        with st.batch():
+            st.put_hfp(h)
+            for e in _envs(h, 20):
+                st.put_envelope(e)
+        assert len(calls) == 2  # pack, then index
+        with st.batch():
+            st.put_hfp(h)  # duplicate only: nothing to sync
+        assert len(calls) == 2
+
+def test_torn_index_and_unsynced_tail_are_ignored(tmp_path):
+    h = assemble_hfp("store-seed", levels=5)
+    env = _envs(h, 1)[0]
+    with ArtifactStore(tmp_path) as st:
+        st.put_hfp(h)
+        d = st.put_envelope(env)
+    with open(tmp_path / "index.jsonl", "ab") as f:
+        f.write(b'{"digest": "ab')  # crash mid-line
+    with open(tmp_path / "index.jsonl", "rb") as f:
+        last = f.read().splitlines()[1]
+    with open(tmp_path / "objects.pack", "r+b") as f:
+        f.truncate(json.loads(last)["offset"] + 1)  # envelope blob lost, index line survived
+    with ArtifactStore(tmp_path) as st:
+        assert h["fingerprint_hash"] in st and d not in st
+        assert st.put_envelope(env) == d
+    with ArtifactStore(tmp_path) as st:
+        assert st.get_envelope(d) == env and len(st) == 2
+
+def test_batch_writes_envelopes_to_store(tmp_path):
+    jobs = tmp_path / "jobs.jsonl"
+    jobs.write_text("".join(json.dumps(j) + "\n" for j in [
+        {"id": "h", "op": "hfp", "seed": "b", "full": True},
+        {"id": "e1", "op": "export", "seed": "b"},
+        {"id": "e2", "op": "export", "seed": "b"},
+    ]))
+    out = io.StringIO()
+    with ArtifactStore(tmp_path / "store") as st:
+        run_batch(str(jobs), out, workers=1, store=st)
+        recs = {r["id"]: r for r in map(json.loads, out.getvalue().splitlines())}
+        assert recs["h"]["result"]["stored"] and "band_stats" not in recs["h"]["result"]
+        assert st.get_hfp(recs["h"]["result"]["fingerprint_hash"])["levels"] == 5
+        env = st.get_envelope(recs["e1"]["result"]["envelope_digest"])
+        assert env["hfp_hash"] == recs["e1"]["result"]["fingerprint_hash"]
+        assert "envelope" not in recs["e2"]["result"] and len(st) == 3
+
+def test_batch_cli_failure_closes_store_and_keeps_the_error(tmp_path):
+    env = dict(os.environ, PYTHONPATH="src")
+    out = subprocess.run([sys.executable, "scripts/qlx.py", "batch", "--in", str(tmp_path / "missing.jsonl"),
+                          "--out", str(tmp_path / "out.jsonl"), "--store", str(tmp_path / "store")],
+                         capture_output=True, text=True, env=env)
+    assert out.returncode != 0 and "FileNotFoundError" in out.stderr and "UnboundLocalError" not in out.stderr
+    with ArtifactStore(tmp_path / "store") as st:
+        assert len(st) == 0
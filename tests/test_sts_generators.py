@@ -0,0 +1,31 @@
+import hashlib, json
+import numpy as np
+import pytest
+from qlx_sts_min import make_stream, psub_stream, default_stream, logistic_map, PSUB_K
+from qlx_tasks import sts_task
+from qlx_batch import run_job
+
+def test_logistic_v1_is_default_stream():
+    assert np.array_equal(make_stream("s", 5000), default_stream("s", 5000))
+    with pytest.raises(ValueError):
+        make_stream("s", 10, "nope")
+
+def test_psub_substreams_match_the_serial_map():
+    # column j of the lockstep run is logistic_map from substream j's seed, up to the global normalization
+    m = 200
+    got = psub_stream("s", m * PSUB_K, burn=0).reshape(m, PSUB_K)[:, 3]
+    h = hashlib.sha256(b"s/psub-v1/" + (3).to_bytes(4, "big")).digest()
+    serial = logistic_map(m, r=3.99, x0=0.2 + 0.6 * int.from_bytes(h[:4], "big") / 2**32, burn=1)
+    assert np.allclose(np.polyval(np.polyfit(serial, got, 1), serial), got, atol=1e-9)
+
+def test_psub_is_reproducible_and_passes():
+    a = psub_stream("seed-a", 100_000)
+    assert np.array_equal(a, psub_stream("seed-a", 100_000))
+    assert not np.array_equal(a, psub_stream("seed-b", 100_000))
+    rep = sts_task("seed-b", 50_000, 0.01, 256, "sha512", "psub-v1")
+    assert rep["generator"] == "psub-v1" and rep["summary"]["all_pass"]
+
+def test_batch_job_selects_generator():
+    rec = run_job({"id": "p", "op": "sts", "seed": "seed-a", "n_bits": 20_000, "generator": "psub-v1"})
+    assert rec["ok"] and rec["result"]["generator"] == "psub-v1"
+    assert rec["result"] == json.loads(json.dumps(sts_task("seed-a", 20_000, 0.01, 256, "sha512", "psub-v1")))
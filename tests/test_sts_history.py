@@ -0,0 +1,82 @@
+import os, sys, json, random, subprocess
+import pytest
+from qlx_sts_history import History, render_text, render_html
+
+TESTS = ["frequency_monobit", "runs_test"]
+DAY = 86400.0
+
+def _report(ps, alpha=0.01, n_bits=200000):
+    results = {t: {"p": p, "stat": 1.0} for t, p in zip(TESTS, ps)}
+    fails = [t for t, r in results.items() if r["p"] < alpha]
+    return {"suite": "qlx-sts-min", "alpha": alpha, "n_bits": n_bits, "block_M": 256, "results": results,
+            "summary": {"all_pass": not fails, "min_p": min(ps), "failures": fails}}
+
+@pytest.fixture
+def hist(tmp_path):
+    with History(str(tmp_path / "h.sqlite")) as h:
+        yield h
+
+def test_ingest_dedup_and_trend(hist):
+    assert hist.ingest(_report([0.5, 0.2]), ts=1 * DAY, whiten="sha512") is not None
+    assert hist.ingest(_report([0.5, 0.2]), ts=1 * DAY, whiten="sha512") is None  # same run again
+    hist.ingest(_report([0.4, 0.3]), ts=3 * DAY, whiten="vn")
+    hist.ingest(_report([0.3, 0.001]), ts=4 * DAY, whiten="sha512")
+    assert hist.tests() == sorted(TESTS)
+    assert hist.trend("runs_test") == [(1 * DAY, 0.2), (3 * DAY, 0.3), (4 * DAY, 0.001)]
+    assert hist.trend("runs_test", whiten="sha512", since=2 * DAY) == [(4 * DAY, 0.001)]
+    assert [r["whiten"] for r in hist.runs(limit=2)] == ["sha512", "vn"]
+    rates = hist.failure_rates(window_s=3 * DAY)
+    assert rates["runs_test"] == [{"start": 0.0, "runs": 1, "failures": 0, "rate": 0.0},
+                                  {"start": 3 * DAY, "runs": 2, "failures": 1, "rate": 0.5}]
+    with pytest.raises(ValueError):
+        hist.trend("runs_test", colour="red")
+
+def test_identical_reports_from_separate_runs_are_kept(hist, tmp_path):
+    # nightly runs on the fixed seed give byte-identical reports; each is still a run
+    assert hist.ingest(_report([0.5, 0.2]), ts=1 * DAY, source="nightly.json") is not None
+    assert hist.ingest(_report([0.5, 0.2]), ts=2 * DAY, source="nightly.json") is not None
+    assert hist.ingest(_report([0.5, 0.2]), ts=2 * DAY, source="nightly.json") is None  # same run again
+    assert hist.ingest(_report([0.5, 0.2]), ts=3 * DAY, source="nightly.json", run_id="42") is not None
+    assert hist.ingest(_report([0.5, 0.2]), ts=4 * DAY, source="nightly.json", run_id="42") is None
+    assert len(hist.trend("runs_test")) == 3 and len(hist.runs()) == 3
+
+def test_drift_flags_biased_recent_runs(hist):
+    rng = random.Random(5)
+    for i in range(300):
+        # monobit stays uniform; runs_test collapses toward small p-values for the last 100 runs
+        p_runs = rng.random() if i < 200 else rng.random() * 0.2
+        hist.ingest(_report([rng.random(), p_runs]), ts=i * 3600.0)
+    d = hist.drift(recent=100)
+    assert not d["frequency_monobit"]["drift"]
+    assert d["runs_test"]["drift"] and not d["runs_test"]["uniformity_ok"]
+    assert d["runs_test"]["runs"] == 100 and d["runs_test"]["baseline_runs"] == 200
+    s = hist.summary(recent=100)
+    assert s["runs"] == 300 and "DRIFT" in render_text(s) and "<table" in render_html(s)
+
+def test_cli_ingest_and_summary(tmp_path):
+    rep = tmp_path / "sts.json"
+    rep.write_text(json.dumps(_report([0.5, 0.6])))
+    db = tmp_path / "h.sqlite"
+    env = dict(os.environ, PYTHONPATH="src")
+    cmd = [sys.executable, "scripts/qlx.py", "sts-history", "--db", str(db), "--ingest", str(rep), "--json"]
+    out = subprocess.run(cmd, capture_output=True, text=True, env=env, check=True)
+    s = json.loads(out.stdout)
+    assert s["runs"] == 1 and s["latest"][0]["source"] == "sts.json"
+    again = subprocess.run(cmd, capture_output=True, text=True, env=env, check=True)
+    assert "already in history" in again.stderr and json.loads(again.stdout)["runs"] == 1
+
+def test_non_reports_are_rejected_and_rendering_tolerates_nulls(hist, tmp_path):
+    rollup = {"files": 3, "pass_rate": 1.0}  # what scripts/sts_summarize.py writes
+    for bad in (rollup, {"results": {}, "summary": None}, []):
+        with pytest.raises(ValueError, match="run_suite report"):
+            hist.ingest(bad, ts=1.0)
+    hist.ingest({"results": {}, "summary": {}}, ts=2.0, source="bare.json")  # minimal report: no n_bits or min_p
+    s = hist.summary()
+    assert s["runs"] == 1 and "n=-" in render_text(s) and "<td>-</td>" in render_html(s)
+
+    reps = [tmp_path / "sts_a.json", tmp_path / "sts_summary.json"]
+    reps[0].write_text(json.dumps(_report([0.5, 0.6]))); reps[1].write_text(json.dumps(rollup))
+    env = dict(os.environ, PYTHONPATH="src")
+    out = subprocess.run([sys.executable, "scripts/qlx.py", "sts-history", "--db", str(tmp_path / "c.sqlite"),
+                          "--ingest", *map(str, reps)], capture_output=True, text=True, env=env)
+    assert out.returncode == 0 and "skipped: " + str(reps[1]) in out.stderr and "1 runs" in out.stdout
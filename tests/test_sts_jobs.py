@@ -0,0 +1,89 @@
+import os, signal, asyncio, time
+import httpx, pytest
+from qlx_sts_min import default_stream, stream_to_bits, run_suite
+from qlx_sts_jobs import JobRunner, JobStore, run_job, STAGES
+import service_app
+
+PARAMS = {"seed": "seed-jobs", "n_bits": 20_000, "alpha": 0.01, "block_M": 256, "whiten": "sha512"}
+
+def _wait(runner, job_id, timeout=30):
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        job = runner.get(job_id)
+        if job["state"] in ("done", "error", "cancelled"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+def test_job_progress_report_and_expiry(tmp_path):
+    runner = JobRunner(root=tmp_path, workers=0, ttl_s=60)
+    job = _wait(runner, runner.submit(PARAMS)["id"])
+    x = default_stream(PARAMS["seed"], n=(20_000 + 511)//512 * 4096)
+    expected = {**run_suite(stream_to_bits(x, whiten="sha512")[:20_000]), "generator": "logistic-v1"}
+    assert job["state"] == "done" and job["report"] == expected
+    assert [s["name"] for s in job["stages"]] == STAGES
+    assert job["progress"]["done"] == len(STAGES) and set(job["partial"]) == set(expected["results"])
+    assert job["expires_at"] > time.time()
+    runner.shutdown(wait=True)
+
+    store = JobStore(tmp_path, ttl_s=0)
+    store.update(job["id"], expires_at=time.time() - 1)
+    assert store.get(job["id"]) is None
+
+def test_job_cancel(tmp_path):
+    store = JobStore(tmp_path)
+    job = store.create(PARAMS)
+    store.request_cancel(job["id"])
+    run_job(str(tmp_path), job["id"])
+    assert store.get(job["id"])["state"] == "cancelled"
+
+def test_job_routes(tmp_path, monkeypatch):
+    monkeypatch.setattr(service_app, "_JOBS", JobRunner(root=tmp_path, workers=0))
+    async def main():
+        transport = httpx.ASGITransport(app=service_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            r = await c.post("/sts/jobs", json={"seed": "s", "n_bits": 20_000})
+            assert r.status_code == 202
+            href = r.json()["href"]
+            for _ in range(500):
+                job = (await c.get(href)).json()
+                if job["state"] == "done":
+                    break
+                await asyncio.sleep(0.02)
+            assert job["report"]["n_bits"] == 20_000
+            assert (await c.delete(href)).json()["state"] == "done"
+            assert (await c.get("/sts/jobs/nope")).status_code == 404
+    asyncio.run(main())
+    service_app._JOBS.shutdown(wait=True)
+
+def test_oversized_job_is_rejected(tmp_path):
+    runner = JobRunner(root=tmp_path, workers=0, max_stream_mib=1)
+    with pytest.raises(ValueError, match="QLX_JOB_MAX_STREAM_MIB"):
+        runner.submit({**PARAMS, "n_bits": 20_000_000 // 512})  # 8 samples per bit under sha512
+    assert list(tmp_path.glob("*.json")) == []
+    assert _wait(runner, runner.submit({**PARAMS, "whiten": "none"})["id"])["state"] == "done"
+    runner.shutdown(wait=True)
+
+def test_dead_worker_fails_the_job_and_restarts_the_pool(tmp_path):
+    runner = JobRunner(root=tmp_path, workers=1, start_method="fork")
+    job = runner.submit({**PARAMS, "n_bits": 5_000_000})
+    for _ in range(500):
+        if runner.get(job["id"])["state"] == "running":
+            break
+        time.sleep(0.02)
+    for proc in list(runner._pool._processes.values()):
+        os.kill(proc.pid, signal.SIGKILL)  # what the OOM killer does
+    job = _wait(runner, job["id"])
+    assert job["state"] == "error" and "BrokenProcessPool" in job["error"] and job["expires_at"]
+    assert _wait(runner, runner.submit(PARAMS)["id"])["state"] == "done"
+    runner.shutdown(wait=True)
+
+def test_sync_sts_is_capped_too(monkeypatch):
+    monkeypatch.setenv("QLX_JOB_MAX_STREAM_MIB", "1")
+    async def main():
+        transport = httpx.ASGITransport(app=service_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            r = await c.post("/sts", json={"seed": "s", "n_bits": 100_000})
+            assert r.status_code == 413 and "QLX_JOB_MAX_STREAM_MIB" in r.json()["detail"]
+            assert (await c.post("/sts", json={"seed": "s", "n_bits": 10**9})).status_code == 422
+    asyncio.run(main())
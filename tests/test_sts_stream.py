@@ -0,0 +1,58 @@
+import io, json
+import numpy as np
+import pytest
+from qlx_sts_min import (run_suite, run_suite_stream, run_suite_file, iter_array_chunks, iter_bit_chunks,
+                         default_stream, stream_to_bits)
+from qlx_batch import run_batch
+
+N = 20000
+
+@pytest.fixture(scope="module")
+def bits():
+    return stream_to_bits(default_stream("stream-seed", n=N*8), whiten="sha512")[:N]
+
+def _same(a, b):
+    assert a["summary"] == b["summary"]
+    for test, r in a["results"].items():
+        for k, v in r.items():
+            assert b["results"][test][k] == pytest.approx(v, rel=1e-12, abs=1e-15), (test, k)
+
+@pytest.mark.parametrize("chunk", [N, 4096, 1000, 7])
+def test_stream_matches_run_suite(bits, chunk):
+    rep = run_suite_stream(iter_array_chunks(bits, chunk))
+    _same(run_suite(bits), rep)
+    assert rep["dft_bits"] == N and "note" not in rep["results"]["dft_spectral"]
+
+def test_file_formats(tmp_path, bits):
+    ref = run_suite(bits)
+    (tmp_path / "p.bin").write_bytes(b"HDR!" + np.packbits(bits).tobytes())
+    (tmp_path / "l.bin").write_bytes(np.packbits(bits, bitorder="little").tobytes())
+    (tmp_path / "b.bin").write_bytes(bits.tobytes())
+    (tmp_path / "a.txt").write_bytes(b"".join(b"1" if x else b"0" for x in bits))
+    _same(ref, run_suite_file(str(tmp_path / "p.bin"), offset=4, chunk_bits=5000))
+    _same(ref, run_suite_file(str(tmp_path / "l.bin"), bitorder="little", chunk_bits=5000))
+    _same(ref, run_suite_file(str(tmp_path / "b.bin"), fmt="bytes"))
+    _same(ref, run_suite_file(str(tmp_path / "a.txt"), fmt="ascii"))
+    _same(run_suite(bits[:12345]), run_suite_file(str(tmp_path / "b.bin"), fmt="bytes", n_bits=12345))
+    with pytest.raises(ValueError):
+        run_suite_file(str(tmp_path / "b.bin"), fmt="bytes", n_bits=N + 1)
+
+def test_dft_cap_is_noted(tmp_path, bits):
+    rep = run_suite_stream(iter_array_chunks(bits, 3000), dft_max_bits=8192)
+    assert rep["dft_bits"] == 8192 and rep["results"]["dft_spectral"]["note"] == f"first 8192 of {N} bits"
+    assert rep["results"]["frequency_monobit"] == run_suite(bits)["results"]["frequency_monobit"]
+
+def test_chunks_cover_file_once(tmp_path, bits):
+    path = tmp_path / "p.bin"
+    path.write_bytes(np.packbits(bits).tobytes())
+    got = np.concatenate(list(iter_bit_chunks(str(path), n_bits=N - 3, chunk_bits=1003)))
+    assert np.array_equal(got, bits[:N - 3])
+
+def test_batch_sts_job_on_bits_file(tmp_path, bits):
+    (tmp_path / "p.bin").write_bytes(np.packbits(bits).tobytes())
+    jobs = tmp_path / "jobs.jsonl"
+    jobs.write_text(json.dumps({"id": "f", "op": "sts", "bits_file": str(tmp_path / "p.bin")}) + "\n")
+    out = io.StringIO()
+    run_batch(str(jobs), out, workers=1)
+    rec = json.loads(out.getvalue())
+    assert rec["ok"] and rec["result"]["n_bits"] == N and rec["result"]["source"]["format"] == "packed"
@@ -0,0 +1,96 @@
+import json, time, base64, asyncio, threading, importlib.util
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import pytest
+
+pytest.importorskip("jinja2")
+pytest.importorskip("multipart")
+
+def _jwt(exp):
+    enc = lambda d: base64.urlsafe_b64encode(json.dumps(d).encode()).rstrip(b"=").decode()
+    return f"{enc({'alg': 'RS256'})}.{enc({'aud': 'x', 'exp': exp})}.sig"
+
+class StandIn:
+    """Local metadata server and upstream API on one port."""
+    def __init__(self):
+        self.token_fetches = 0
+        self.token_exp = time.time() + 3600
+        self.reject_next = False
+        self.seen = []
+        owner = self
+
+        class H(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            def log_message(self, *a): pass
+            def _send(self, code, body, ctype="application/json"):
+                data = body.encode()
+                self.send_response(code)
+                self.send_header("Content-Type", ctype); self.send_header("Content-Length", str(len(data)))
+                self.end_headers(); self.wfile.write(data)
+            def do_GET(self):
+                assert self.path.startswith("/computeMetadata/v1/instance/service-accounts/default/identity")
+                assert self.headers["Metadata-Flavor"] == "Google"
+                owner.token_fetches += 1
+                self._send(200, _jwt(owner.token_exp), "text/plain")
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                auth = self.headers.get("Authorization", "")
+                owner.seen.append((self.path, auth, self.client_address[1]))
+                if owner.reject_next:
+                    owner.reject_next = False
+                    return self._send(401, '{"detail":"expired"}')
+                self._send(200, json.dumps({"path": self.path, "echo": body}))
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), H)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+@pytest.fixture
+def proxy(monkeypatch):
+    up = StandIn()
+    monkeypatch.setenv("API_BASE", up.base)
+    monkeypatch.setenv("GCE_METADATA_HOST", up.base.removeprefix("http://"))
+    spec = importlib.util.spec_from_file_location("ui_proxy_app", "ui-proxy/app.py")
+    mod = importlib.util.module_from_spec(spec); spec.loader.exec_module(mod)
+    yield mod, up
+    up.server.shutdown()
+
+def _run(mod, coro_fn):
+    async def main():
+        transport = httpx.ASGITransport(app=mod.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ui") as c:
+            try:
+                return await coro_fn(c)
+            finally:
+                await mod.get_client().aclose(); mod._CLIENT = None
+    return asyncio.run(main())
+
+def test_token_cached_and_connections_pooled(proxy):
+    mod, up = proxy
+    async def calls(c):
+        rs = await asyncio.gather(*[c.post("/call/hfp", data={"seed": f"s{i}", "levels": "4"}) for i in range(8)])
+        for r in rs: r.raise_for_status()
+        r = await c.post("/call/envelope", data={"seed": "e"})
+        return rs + [r]
+    rs = _run(mod, calls)
+    assert rs[0].json()["echo"] == {"seed": "s0", "levels": 4} and rs[-1].json()["path"] == "/envelope"
+    assert up.token_fetches == 1
+    assert all(auth == f"Bearer {_jwt(up.token_exp)}" for _, auth, _ in up.seen)
+    assert len({port for *_, port in up.seen}) < len(up.seen)  # keep-alive reuse
+
+def test_token_refreshed_before_expiry_and_on_401(proxy):
+    mod, up = proxy
+    up.token_exp = time.time() + mod.TOKEN_REFRESH_MARGIN_S - 1  # already inside the refresh margin
+    async def calls(c):
+        (await c.post("/call/hfp", data={})).raise_for_status()
+        (await c.post("/call/hfp", data={})).raise_for_status()
+        assert up.token_fetches == 2
+        up.token_exp = time.time() + 3600
+        (await c.post("/call/hfp", data={})).raise_for_status()
+        (await c.post("/call/hfp", data={})).raise_for_status()
+        assert up.token_fetches == 3
+        up.reject_next = True
+        r = await c.post("/call/sts", data={"n_bits": "20000"})
+        assert r.status_code == 200 and r.json()["echo"]["n_bits"] == 20000
+        assert up.token_fetches == 4
+    _run(mod, calls)
@@ -0,0 +1,66 @@
+import copy
+import pytest
+from qlx_tasks import envelope_task
+from qlx_validate import check_envelope, fast_is_valid, validator, BOUNDS, PARAM_KEYS
+from qlx_photonic_control import PARAM_RANGES
+
+ENV = envelope_task("validate-seed", 5, 14, 64, "nearest")
+
+def test_shared_bounds_match_photonic_ranges():
+    assert BOUNDS == PARAM_RANGES and PARAM_KEYS == tuple(PARAM_RANGES)
+
+def test_valid_envelope_passes():
+    rep = check_envelope(ENV)
+    assert rep == {"ok": True, "checks": {"schema_ok": True, "lengths_ok": True, "ranges_ok": True}, "errors": []}
+
+@pytest.mark.parametrize("mutate, error", [
+    (lambda e: e["params"]["kappa"].pop(), "length: kappa"),
+    (lambda e: e["params"]["kappa"].__setitem__(0, 0.95), "range: kappa"),
+    (lambda e: e["params"]["alpha"].__setitem__(-1, 2.0), "range: alpha"),
+    (lambda e: e["params"]["phi_rad"].__setitem__(0, float("nan")), "range: phi_rad"),
+    (lambda e: e["params"]["tau_ps"].__setitem__(0, "100"), "schema: params/tau_ps/0"),
+    (lambda e: e["params"]["tau_ps"].__setitem__(0, True), "schema: params/tau_ps/0"),
+    (lambda e: e.__setitem__("hfp_hash", "zz"), "schema: hfp_hash"),
+    (lambda e: e["dac"].__setitem__("width_bits", 13), "schema: dac/width_bits"),
+    (lambda e: e.__setitem__("extra", 1), "schema: <root>"),
+])
+def test_rejections(mutate, error):
+    env = copy.deepcopy(ENV)
+    mutate(env)
+    rep = check_envelope(env)
+    assert not rep["ok"]
+    assert any(e.startswith(error) for e in rep["errors"]), rep["errors"]
+
+@pytest.mark.parametrize("schema", [True, False])
+@pytest.mark.parametrize("field, value, error", [
+    ("band_count", "x", "type: band_count"),
+    ("band_count", 5.5, "type: band_count"),
+    ("band_count", None, "type: band_count"),
+    ("params", [1, 2], "type: params must be an object"),
+    ("params", {"kappa": "0.5"}, "type: params.kappa"),
+    ("params", {"kappa": 0.5}, "type: params.kappa"),
+    ("dac", "14-bit", "type: dac must be an object"),
+    ("dac", {"width_bits": "14"}, "type: dac.width_bits"),
+])
+def test_wrong_structure_is_reported_not_raised(schema, field, value, error):
+    env = {**copy.deepcopy(ENV), field: value}
+    rep = check_envelope(env, schema=schema)
+    assert not rep["ok"] and any(e.startswith(error) for e in rep["errors"]), rep["errors"]
+    assert check_envelope([ENV], schema=schema)["errors"] == ["type: envelope is not an object"]
+
+def test_fast_path_agrees_with_jsonschema():
+    v, fast = validator(), fast_is_valid()
+    cases = [ENV, {}, [], {**ENV, "band_count": True}, {**ENV, "band_count": 5.0}, {**ENV, "mode": "x"},
+             {**ENV, "apply": {"ramp_ms": -1}}, {**ENV, "apply": {}}, {**ENV, "signing": {"alg": 1}},
+             {**ENV, "signing": {"alg": "x", "other": 1}}, {**ENV, "dac": {**ENV["dac"], "width_bits": 14.0}}]
+    for env in cases:
+        assert fast(env) == v.is_valid(env), env
+
+def test_range_edges_are_one_lsb_open():
+    lo, hi = BOUNDS["kappa"]
+    eps = (hi - lo) / ((1 << 14) - 1)
+    env = copy.deepcopy(ENV)
+    env["params"]["kappa"][0] = lo + eps
+    assert check_envelope(env)["ok"]
+    env["params"]["kappa"][0] = lo + eps / 2
+    assert not check_envelope(env)["ok"]
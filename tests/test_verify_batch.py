@@ -0,0 +1,64 @@
+import io, json
+from qlx_hfp_prototype import assemble_hfp
+from qlx_photonic_control import photonic_map, make_envelope, sign_envelope_hmac, sign_envelope_ed25519
+from qlx_verify_batch import verify_batch, default_keys
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives import serialization
+
+def _keypair():
+    p = Ed25519PrivateKey.generate()
+    priv = p.private_bytes(serialization.Encoding.Raw, serialization.PrivateFormat.Raw, serialization.NoEncryption()).hex()
+    pub = p.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw).hex()
+    return priv, pub
+
+def test_verify_batch_jsonl_and_dir(tmp_path):
+    priv, pub = _keypair()
+    hfp = assemble_hfp("seed-batch", levels=5)
+    params = photonic_map(hfp["band_stats"])
+    envs = []
+    for i in range(6):
+        env = make_envelope(hfp, params)
+        if i % 2:
+            envs.append(sign_envelope_ed25519(env, priv_hex=priv, key_id="ed-a"))
+        else:
+            envs.append(sign_envelope_hmac(env, key=b"k" * 16, key_id="hm-a"))
+    bad = dict(envs[0]); bad["params"] = dict(bad["params"]); bad["params"]["kappa"] = [0.5]
+    (tmp_path / "a.jsonl").write_text("".join(json.dumps(e) + "\n" for e in envs + [bad]) + "not json\n")
+    d = tmp_path / "tree" / "sub"; d.mkdir(parents=True)
+    (d / "one.json").write_text(json.dumps(envs[1]))
+
+    keys = {"ed-a": {"alg": "ed25519", "pub_hex": pub}, "hm-a": {"alg": "hmac", "key_hex": (b"k" * 16).hex()}}
+    for workers in (1, 2):
+        out = io.StringIO()
+        s = verify_batch([tmp_path / "a.jsonl", tmp_path / "tree"], keys=keys, workers=workers, chunk=2, out=out)
+        recs = [json.loads(l) for l in out.getvalue().splitlines()]
+        assert s["total"] == len(recs) == 9
+        assert s["ok"] == 7 and s["failed"] == 2 and s["load_errors"] == 1
+        assert s["sig_verified"] == 7
+
+    # missing keys are skipped unless required; a wrong fallback key fails
+    s = verify_batch([tmp_path / "tree"], keys={}, workers=1)
+    assert s["ok"] == 1 and s["sig_skipped"] == 1
+    s = verify_batch([tmp_path / "tree"], keys={}, workers=1, require_sig=True)
+    assert s["failed"] == 1
+    s = verify_batch([tmp_path / "tree"], keys=default_keys(ed25519_pub_hex=_keypair()[1]), workers=1)
+    assert s["failed"] == 1
+
+def test_malformed_records_are_reported_not_fatal(tmp_path):
+    hfp = assemble_hfp("seed-batch", levels=5)
+    good = sign_envelope_hmac(make_envelope(hfp, photonic_map(hfp["band_stats"])), key=b"k" * 16, key_id="hm-a")
+    broken = []
+    for field, value in (("band_count", "x"), ("params", [1, 2]), ("dac", "14-bit"), ("signing", "sig")):
+        e = json.loads(json.dumps(good)); e[field] = value
+        broken.append(e)
+    (tmp_path / "mixed.jsonl").write_text("".join(json.dumps(e) + "\n" for e in [good, *broken, good]))
+    (tmp_path / "latin1.json").write_bytes('{"session_id": "caf\xe9"}'.encode("latin-1"))
+    (tmp_path / "truncated.json").write_text(json.dumps(good)[:50])
+    keys = {"hm-a": {"alg": "hmac", "key_hex": (b"k" * 16).hex()}}
+    for workers in (1, 2):
+        out = io.StringIO()
+        s = verify_batch([tmp_path], keys=keys, workers=workers, chunk=2, out=out)
+        recs = {r["source"].rsplit("/", 1)[-1]: r for r in map(json.loads, out.getvalue().splitlines())}
+        assert s["total"] == 8 and s["ok"] == 2 and s["failed"] == 6
+        assert all(not recs[f"mixed.jsonl:{i}"]["ok"] and recs[f"mixed.jsonl:{i}"]["errors"] for i in range(2, 6))
+        assert not recs["latin1.json"]["ok"] and not recs["truncated.json"]["ok"]
@@ -1,4 +1,6 @@
-import os, json, requests
+import os, json, time, base64, asyncio
+import httpx
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Form, HTTPException
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
@@ -7,52 +9,129 @@ API_BASE = os.environ.get("API_BASE", "").rstrip("/")
 if not API_BASE:
     raise RuntimeError("Set API_BASE to your QLX API base URL, e.g. https://...run.app")
 
-app = FastAPI(title="QLX UI Proxy", version="0.1")
+METADATA_HOST = os.environ.get("GCE_METADATA_HOST", "metadata")
+TOKEN_REFRESH_MARGIN_S = float(os.environ.get("TOKEN_REFRESH_MARGIN_S", 300))  # refresh this long before exp
+UPSTREAM_TIMEOUT_S = float(os.environ.get("UPSTREAM_TIMEOUT_S", 30))
+UPSTREAM_MAX_CONNECTIONS = int(os.environ.get("UPSTREAM_MAX_CONNECTIONS", 32))
+
+# ---------- pooled client ----------
+# One keep-alive client per process, created on first use and closed on shutdown.
+_CLIENT = None
+
+def get_client() -> httpx.AsyncClient:
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = httpx.AsyncClient(
+            timeout=httpx.Timeout(UPSTREAM_TIMEOUT_S, connect=5.0),
+            limits=httpx.Limits(max_connections=UPSTREAM_MAX_CONNECTIONS,
+                                max_keepalive_connections=UPSTREAM_MAX_CONNECTIONS))
+    return _CLIENT
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.aclose(); _CLIENT = None
+
+app = FastAPI(title="QLX UI Proxy", version="0.2", lifespan=lifespan)
 templates = Jinja2Templates(directory="ui-proxy/templates")
 
-def _get_id_token(audience: str) -> str:
+# ---------- ID tokens ----------
+def _jwt_exp(token: str):
+    """exp claim of a JWT, without verifying it; None if it cannot be read."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except Exception:
+        return None
+
+class TokenCache:
+    """ID tokens per audience, reused until TOKEN_REFRESH_MARGIN_S before they expire. One fetch at a time per audience."""
+
+    def __init__(self, margin_s=TOKEN_REFRESH_MARGIN_S, fallback_ttl_s=600):
+        self.margin_s = margin_s
+        self.fallback_ttl_s = fallback_ttl_s
+        self._tokens = {}  # audience -> (token, exp)
+        self._locks = {}
+
+    def _fresh(self, audience):
+        hit = self._tokens.get(audience)
+        if hit and time.time() < hit[1] - self.margin_s:
+            return hit[0]
+        return None
+
+    async def get(self, audience: str) -> str:
+        tok = self._fresh(audience)
+        if tok:
+            return tok
+        lock = self._locks.setdefault(audience, asyncio.Lock())
+        async with lock:
+            tok = self._fresh(audience)  # another request may have refreshed it
+            if tok:
+                return tok
+            tok = await _fetch_id_token(audience)
+            exp = _jwt_exp(tok) or time.time() + self.margin_s + self.fallback_ttl_s
+            self._tokens[audience] = (tok, exp)
+            return tok
+
+    def invalidate(self, audience: str):
+        self._tokens.pop(audience, None)
+
+async def _fetch_id_token(audience: str) -> str:
     # 1) Prefer Cloud Run metadata (in-prod)
-    md_url = f"http://metadata/computeMetadata/v1/instance/service-accounts/default/identity?audience={audience}"
+    md_url = f"http://{METADATA_HOST}/computeMetadata/v1/instance/service-accounts/default/identity"
     try:
-        r = requests.get(md_url, headers={"Metadata-Flavor": "Google"}, timeout=3)
-        if r.ok and r.text:
+        r = await get_client().get(md_url, params={"audience": audience}, headers={"Metadata-Flavor": "Google"},
+                                   timeout=3)
+        if r.is_success and r.text:
             return r.text.strip()
-    except Exception:
+    except httpx.HTTPError:
         pass
-    # 2) Fallback to ADC (local dev) via google-auth if present
+    # 2) Fallback to ADC (local dev) via google-auth if present; it is blocking, so run it off the loop
     try:
         from google.auth.transport.requests import Request
         from google.oauth2.id_token import fetch_id_token
-        return fetch_id_token(Request(), audience)
+        return await asyncio.to_thread(fetch_id_token, Request(), audience)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not mint id_token: {e}")
 
-def _call_api(path: str, payload: dict):
+TOKENS = TokenCache()
+
+async def _call_api(path: str, payload: dict):
     aud = API_BASE
-    tok = _get_id_token(aud)
-    r = requests.post(f"{API_BASE}{path}",
-                      headers={"Authorization": f"Bearer {tok}",
-                               "Content-Type": "application/json"},
-                      data=json.dumps(payload), timeout=30)
-    if not r.ok:
-        raise HTTPException(status_code=r.status_code, detail=r.text)
-    return r.json()
+    for attempt in (0, 1):
+        tok = await TOKENS.get(aud)
+        try:
+            r = await get_client().post(f"{API_BASE}{path}", json=payload,
+                                        headers={"Authorization": f"Bearer {tok}"})
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail=f"upstream timeout after {UPSTREAM_TIMEOUT_S}s")
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"upstream error: {type(e).__name__}")
+        if r.status_code == 401 and attempt == 0:
+            TOKENS.invalidate(aud)  # revoked or clock-skewed token: mint a new one once
+            continue
+        if not r.is_success:
+            raise HTTPException(status_code=r.status_code, detail=r.text)
+        return r.json()
 
 @app.get("/", response_class=HTMLResponse)
-def home(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request, "api_base": API_BASE})
+async def home(request: Request):
+    return templates.TemplateResponse(request, "index.html", {"api_base": API_BASE})
 
 @app.post("/call/hfp")
-def call_hfp(seed: str = Form("qlx-demo-seed-phi369"), levels: int = Form(5)):
-    return JSONResponse(_call_api("/hfp", {"seed": seed, "levels": levels}))
+async def call_hfp(seed: str = Form("qlx-demo-seed-phi369"), levels: int = Form(5)):
+    return JSONResponse(await _call_api("/hfp", {"seed": seed, "levels": levels}))
 
 @app.post("/call/sts")
-def call_sts(seed: str = Form("qlx-demo-seed-phi369"), n_bits: int = Form(200000), whiten: str = Form("sha512")):
-    return JSONResponse(_call_api("/sts", {"seed": seed, "n_bits": n_bits, "whiten": whiten}))
+async def call_sts(seed: str = Form("qlx-demo-seed-phi369"), n_bits: int = Form(200000), whiten: str = Form("sha512")):
+    return JSONResponse(await _call_api("/sts", {"seed": seed, "n_bits": n_bits, "whiten": whiten}))
 
 @app.post("/call/envelope")
-def call_envelope(seed: str = Form("qlx-demo-seed-phi369"), levels: int = Form(5),
-                  dac_bits: int = Form(14), sample_gsa: int = Form(64), quant: str = Form("nearest")):
-    return JSONResponse(_call_api("/envelope", {
+async def call_envelope(seed: str = Form("qlx-demo-seed-phi369"), levels: int = Form(5),
+                        dac_bits: int = Form(14), sample_gsa: int = Form(64), quant: str = Form("nearest")):
+    return JSONResponse(await _call_api("/envelope", {
         "seed": seed, "levels": levels, "dac_bits": dac_bits, "sample_gsa": sample_gsa, "quant": quant
     }))